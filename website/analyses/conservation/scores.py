@@ -1,7 +1,9 @@
-from statistics import mean
-from typing import List, Dict, Tuple, Iterable
+from collections import defaultdict
+from multiprocessing import Pool
+from typing import List, Dict, Tuple, Iterable, NamedTuple
 from types import SimpleNamespace as Namespace
 
+from numpy import concatenate, float32, float64, ndarray, empty, stack
 from pandas import DataFrame
 import pyBigWig
 from tqdm import tqdm as progress_bar
@@ -15,7 +17,25 @@ class MismatchError(ValueError):
     pass
 
 
-def extract_track(protein_data: DataFrame, protein, chrom: str, bw) -> List[float]:
+class GenomicLocation(NamedTuple):
+    strand: str
+    cdsStart: int
+    cdsEnd: int
+    exonStarts: Tuple[int, ...]
+    exonEnds: Tuple[int, ...]
+
+
+class ProteinLocations(NamedTuple):
+    """Genomic locations of a protein, decoupled from the database (so it can be sent to other processes)"""
+    refseq: str
+    length: int
+    locations: List[GenomicLocation]
+
+    def __str__(self):
+        return self.refseq
+
+
+def extract_track(protein_data: GenomicLocation, protein, chrom: str, bw) -> ndarray:
     """Extract scores from given BigWig file for coding region of given protein.
 
     Scores for each nucleotide in the CDS will be returned,
@@ -27,7 +47,7 @@ def extract_track(protein_data: DataFrame, protein, chrom: str, bw) -> List[floa
         scores in CDS space of given protein, without the scores for stop codon
     """
 
-    protein_track = []
+    exons_tracks = []
 
     for exon_start, exon_end in zip(protein_data.exonStarts, protein_data.exonEnds):
         # it's not interesting yet!
@@ -46,10 +66,13 @@ def extract_track(protein_data: DataFrame, protein, chrom: str, bw) -> List[floa
 
         assert exon_start < exon_end
 
-        protein_track.extend(
-            bw.values(chrom, exon_start, exon_end)
+        exons_tracks.append(
+            bw.values(chrom, exon_start, exon_end, numpy=True)
         )
 
+    # the tracks are kept in single precision (as stored in BigWig files)
+    protein_track = concatenate(exons_tracks) if exons_tracks else empty(0, dtype=float32)
+
     # let's remove the STOP codon
     protein_track = protein_track[:-3]
 
@@ -63,83 +86,151 @@ def extract_track(protein_data: DataFrame, protein, chrom: str, bw) -> List[floa
     return protein_track[::direction]
 
 
-def convert_to_aa_scores(nucleotide_scores: List[float]) -> List[float]:
-    """Convert scores from CDS space into protein space, average scores per codon."""
+def convert_to_aa_scores(nucleotide_scores: ndarray) -> ndarray:
+    """Convert scores from CDS space into protein space, average scores per codon.
+
+    The means are computed (and returned) in double precision, so that
+    the rounding of the scores does not depend on the precision of the track.
+    """
 
     assert len(nucleotide_scores) % 3 == 0
 
-    scores = []
-    append = scores.append
+    return nucleotide_scores.reshape(-1, 3).mean(axis=1, dtype=float64)
+
+
+def group_locations_by_chromosome(proteins: Iterable, genes_data: DataFrame) -> Tuple[Dict[str, List[ProteinLocations]], set]:
+    """Find genomic locations of proteins with a single pass over the genes data.
+
+    Returns:
+        locations of proteins grouped by chromosome, proteins without genomic data
+    """
+    locations = defaultdict(list)
+
+    for (chrom, refseq), row in zip(genes_data.index, genes_data.itertuples(index=False)):
+        locations[chrom, refseq].append(
+            GenomicLocation(row.strand, row.cdsStart, row.cdsEnd, row.exonStarts, row.exonEnds)
+        )
+
+    by_chromosome = defaultdict(list)
+    no_genomic_data = set()
 
-    i, summed_score = 0, 0
-    for score in nucleotide_scores:
-        if i == 3:
-            append(summed_score / 3)
-            i = 0
-            summed_score = 0
-        i += 1
-        summed_score += score
-    assert i == 3
-    append(summed_score / 3)
+    for protein in proteins:
+        chrom = 'chr' + protein.gene.chrom
+        key = chrom, protein.refseq
 
-    return scores
+        if key not in locations:
+            no_genomic_data.add(protein.refseq)
+            continue
 
+        by_chromosome[chrom].append(ProteinLocations(protein.refseq, protein.length, locations[key]))
 
-def scores_for_proteins(proteins: Iterable, genes_data: DataFrame, big_wig_path: str) -> Tuple[Dict, Namespace]:
-    """Load conservation scores, average when needed, and transform into protein space."""
+    return by_chromosome, no_genomic_data
 
+
+def scores_for_chromosome(big_wig_path: str, chrom: str, proteins: List[ProteinLocations]):
+    """Extract scores for proteins from a single chromosome, using a dedicated BigWig handle.
+
+    Returns:
+        scores by refseq, skipped proteins (by reason) and proteins mapping to many locations
+    """
     bw = pyBigWig.open(big_wig_path)
 
     score_tracks = {}
-    skipped_premature = set()
     skipped_key_error = set()
-    mapping_to_many = set()
     skipped_track_mismatch = set()
+    mapping_to_many = set()
 
-    for protein in progress_bar(proteins):
+    try:
+        for protein in proteins:
 
-        if '*' in protein.sequence[:-1]:
-            skipped_premature.add(protein)
-            continue
+            protein_tracks = []
 
-        gene = protein.gene
-        chrom = 'chr' + gene.chrom
-        try:
-            protein_data = genes_data.loc[[(chrom, protein.refseq)]]
-        except KeyError:
-            skipped_key_error.add(protein)
-            continue
+            # transcript might map to more than one genomic locations
+            for genomic_location in protein.locations:
 
-        protein_tracks = []
+                try:
+                    track = extract_track(genomic_location, protein, chrom, bw)
+                except MismatchError:
+                    skipped_track_mismatch.add(protein.refseq)
+                    continue
+                except (TypeError, RuntimeError):
+                    skipped_key_error.add(protein.refseq)
+                    continue
 
-        # transcript might map to more than one genomic locations
-        for genomic_location in protein_data.itertuples(index=False):
+                protein_tracks.append(track)
 
-            try:
-                track = extract_track(genomic_location, protein, chrom, bw)
-            except MismatchError:
-                skipped_track_mismatch.add(protein)
-                continue
-            except TypeError:
-                skipped_key_error.add(protein)
+            protein_tracks = [track for track in protein_tracks if len(track)]
+
+            if not protein_tracks:
                 continue
+            elif len(protein_tracks) > 1:
+                mapping_to_many.add(protein.refseq)
+                protein_track = stack(protein_tracks).mean(axis=0, dtype=float64)
+            else:
+                protein_track = protein_tracks[0]
+
+            score_tracks[protein.refseq] = convert_to_aa_scores(protein_track)
+    finally:
+        bw.close()
+
+    return score_tracks, skipped_key_error, skipped_track_mismatch, mapping_to_many
+
 
-            protein_tracks.append(track)
+def _scores_for_chromosome(args):
+    return scores_for_chromosome(*args)
 
-        protein_tracks = [track for track in protein_tracks if track]
 
-        if not protein_tracks:
+def scores_for_proteins(
+    proteins: Iterable, genes_data: DataFrame, big_wig_path: str, processes=1
+) -> Tuple[Dict, Namespace]:
+    """Load conservation scores, average when needed, and transform into protein space.
+
+    Proteins are partitioned by chromosome; if more than one process is requested,
+    the chromosomes are processed in parallel, each worker using its own BigWig handle.
+
+    Returns:
+        scores (arrays) by protein, details on the skipped proteins
+    """
+    skipped_premature = set()
+    considered = []
+
+    for protein in proteins:
+        if '*' in protein.sequence[:-1]:
+            skipped_premature.add(protein)
             continue
-        elif len(protein_tracks) > 1:
-            mapping_to_many.add(protein)
-            protein_track = [
-                mean(scores)
-                for scores in zip(*protein_tracks)
-            ]
-        else:
-            protein_track = protein_tracks[0]
-
-        score_tracks[protein] = convert_to_aa_scores(protein_track)
+        considered.append(protein)
+
+    by_refseq = {protein.refseq: protein for protein in considered}
+
+    by_chromosome, no_genomic_data = group_locations_by_chromosome(considered, genes_data)
+
+    # the largest chromosomes first, so that these do not delay the completion
+    tasks = sorted(
+        ((big_wig_path, chrom, chrom_proteins) for chrom, chrom_proteins in by_chromosome.items()),
+        key=lambda task: len(task[2]),
+        reverse=True
+    )
+
+    if processes == 1:
+        results = map(_scores_for_chromosome, tasks)
+        results = progress_bar(results, total=len(tasks))
+        chromosomes_results = list(results)
+    else:
+        with Pool(processes) as pool:
+            results = pool.imap_unordered(_scores_for_chromosome, tasks)
+            chromosomes_results = list(progress_bar(results, total=len(tasks)))
+
+    score_tracks = {}
+    skipped_key_error = {by_refseq[refseq] for refseq in no_genomic_data}
+    skipped_track_mismatch = set()
+    mapping_to_many = set()
+
+    for scores, key_errors, mismatches, many in chromosomes_results:
+        for refseq, scores_track in scores.items():
+            score_tracks[by_refseq[refseq]] = scores_track
+        skipped_key_error.update(by_refseq[refseq] for refseq in key_errors)
+        skipped_track_mismatch.update(by_refseq[refseq] for refseq in mismatches)
+        mapping_to_many.update(by_refseq[refseq] for refseq in many)
 
     print(f'Averaged data for {len(mapping_to_many)} proteins mapping to more than one genomic location.')
     # print({protein.refseq for protein in mapping_to_many})
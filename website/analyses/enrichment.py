@@ -1,18 +1,20 @@
 import operator
-import random
 from collections import namedtuple, Counter, defaultdict
 from functools import reduce, partial
+from multiprocessing import Pool
 from statistics import median, mean
 from typing import List, NamedTuple, Mapping
 
-from numpy import NaN
+from numpy import (
+    NaN, argsort, asarray, concatenate, count_nonzero, flatnonzero, int64, maximum, minimum, ones, searchsorted,
+    unique,
+)
+from numpy.random import RandomState
 from sqlalchemy import and_, func, distinct, desc
 from sqlalchemy.orm import aliased
 from pandas import Series
 from tqdm import tqdm
 from scipy.stats import fisher_exact
-from interval import fpu
-from interval import interval
 
 from database import join_unique, db
 from models import (
@@ -38,7 +40,132 @@ def count_mutated_potential_sites():
     print(count, total_length, count/total_length*100)
 
 
-def test_enrichment_of_ptm_mutations_among_mutations_subset(subset_query, reference_query, iterations_count=100000, subset_size=None, subset_ptms=None):
+def draw_in_chunks(draw, args, iterations_count: int, seed=None, processes=1, chunk_size=10000):
+    """Call `draw(*args, chunk, chunk_seed)` for consecutive chunks of iterations.
+
+    Each chunk gets its own random state, seeded from `seed`, so that the
+    results are reproducible regardless of the number of processes used.
+
+    Returns:
+        concatenated results of all the chunks
+    """
+    chunks = [
+        min(chunk_size, iterations_count - start)
+        for start in range(0, iterations_count, chunk_size)
+    ]
+    seeds = RandomState(seed).randint(2 ** 32, size=len(chunks), dtype=int64)
+
+    tasks = [
+        (*args, chunk, int(chunk_seed))
+        for chunk, chunk_seed in zip(chunks, seeds)
+    ]
+
+    if processes == 1:
+        results = [draw(*task) for task in tasks]
+    else:
+        with Pool(processes) as pool:
+            results = pool.starmap(draw, tasks)
+
+    return concatenate(results) if results else asarray([], dtype=int64)
+
+
+def _draw_ptm_counts(ptm_count, non_ptm_count, sample_size, iterations_count, seed):
+    return RandomState(seed).hypergeometric(ptm_count, non_ptm_count, sample_size, size=iterations_count)
+
+
+def sample_ptm_counts(
+    reference_is_ptm, sample_size: int, iterations_count: int,
+    seed=None, processes=1, chunk_size=10000
+):
+    """Count PTM mutations in random samples (drawn without replacement) of reference mutations.
+
+    The number of PTM mutations in such a sample follows the hypergeometric
+    distribution, so instead of sampling the mutations, the counts are drawn
+    directly - in chunks of `chunk_size` iterations (see draw_in_chunks).
+
+    Args:
+        reference_is_ptm: boolean flags of reference mutations: is the mutation PTM-associated?
+        sample_size: number of mutations in each of the samples
+        iterations_count: number of samples to draw
+        seed: seed for reproducible results
+        processes: number of processes to draw the chunks in
+
+    Returns:
+        array with the counts of PTM mutations in each of the samples
+    """
+    reference_is_ptm = asarray(reference_is_ptm, dtype=bool)
+    ptm_count = int(count_nonzero(reference_is_ptm))
+    non_ptm_count = len(reference_is_ptm) - ptm_count
+
+    if sample_size > len(reference_is_ptm):
+        raise ValueError('Sample larger than the reference population')
+
+    return draw_in_chunks(
+        _draw_ptm_counts, (ptm_count, non_ptm_count, sample_size), iterations_count,
+        seed=seed, processes=processes, chunk_size=chunk_size
+    )
+
+
+def _draw_sums(values, probabilities, sample_size, iterations_count, seed):
+    return RandomState(seed).multinomial(sample_size, probabilities, size=iterations_count) @ values
+
+
+def sample_sums(values, sample_size: int, repeats: int, seed=None, processes=1, chunk_size=1000):
+    """Sum `sample_size` elements drawn (with replacement) from `values`, `repeats` times.
+
+    Equivalent to summing `numpy.random.choice(values, size=sample_size)` in each
+    repeat: the numbers of times each of the distinct values was drawn follow
+    the multinomial distribution, so only these numbers are drawn, in chunks
+    of `chunk_size` repeats (see draw_in_chunks). The memory usage is bounded
+    by the chunk size and the number of distinct values.
+
+    Returns:
+        array with the sum for each of the repeats
+    """
+    distinct_values, multiplicities = unique(values, return_counts=True)
+    probabilities = multiplicities / len(values)
+
+    return draw_in_chunks(
+        _draw_sums, (distinct_values, probabilities, sample_size), repeats,
+        seed=seed, processes=processes, chunk_size=chunk_size
+    )
+
+
+def merge_intervals(starts, ends):
+    """Merge closed intervals; overlapping and touching intervals are joined.
+
+    Returns:
+        sorted starts and ends of the disjoint intervals
+    """
+    order = argsort(starts, kind='mergesort')
+    starts = asarray(starts)[order]
+    ends = asarray(ends)[order]
+
+    reach = maximum.accumulate(ends)
+    is_new = ones(len(starts), dtype=bool)
+    is_new[1:] = starts[1:] > reach[:-1]
+
+    first_indices = flatnonzero(is_new)
+    return starts[first_indices], maximum.reduceat(ends, first_indices)
+
+
+def position_in_regions(position, starts, ends):
+    """Offset of the position counting from the beginning of the first of the merged regions.
+
+    The regions are treated as if concatenated; a position outside of
+    all regions is placed after the last of the regions.
+    """
+    sizes = ends - starts
+    i = searchsorted(starts, position, side='right') - 1
+    if i >= 0 and position <= ends[i]:
+        return int(sizes[:i].sum()) + position - 1 - int(starts[i])
+    return int(sizes.sum())
+
+
+def test_enrichment_of_ptm_mutations_among_mutations_subset(
+    subset_query, reference_query, iterations_count=100000, subset_size=None, subset_ptms=None,
+    seed=None, processes=1
+):
     """Perform tests according to proposed algorithm:
 
     1. Count the number of all ClinVar mutations as C, PTM-associated ClinVar mutations as D=27071
@@ -60,6 +187,10 @@ def test_enrichment_of_ptm_mutations_among_mutations_subset(subset_query, refere
             against (to be used as a reference distribution
             e.g. 1000 Genomes)
 
+        seed: seed of the random sampling (see sample_ptm_counts)
+
+        processes: number of processes to sample in
+
     Returns:
         namedtuple with:
             median,
@@ -68,9 +199,6 @@ def test_enrichment_of_ptm_mutations_among_mutations_subset(subset_query, refere
             enriched_ptm_muts_in_iterations: list of counts of PTM sites discovered in each of sampling iterations,
             expected_ptm_muts:  expected number of mutations associated with PTM sites
     """
-    ptm_enriched_absolute = 0
-    ptm_enriched_percentage = 0
-
     is_ptm = Mutation.precomputed_is_ptm
 
     # 1.
@@ -87,31 +215,23 @@ def test_enrichment_of_ptm_mutations_among_mutations_subset(subset_query, refere
     print('Counting enrichment in random subsets of background.')
     print('All: %s, PTM: %s, %%: %s' % (all_mutations, ptm_mutations, ptm_percentage))
 
-    all_reference_mutations = reference_query.all()
-
-    enriched_ptms = []
-    enriched_percentage = []
-
-    # 4.
-    for _ in tqdm(range(iterations_count)):
-        # 2.
-        random_reference = random.sample(all_reference_mutations, all_mutations)
-
-        # 3.
-        all_in_iteration = len(random_reference)
-        ptm_in_iteration = sum(1 for mutation in random_reference if mutation.precomputed_is_ptm)  # P
-        iteration_percentage = ptm_in_iteration / all_in_iteration * 100                           # Q
+    reference_is_ptm = [
+        bool(mutation_is_ptm)
+        for mutation_id, mutation_is_ptm in reference_query.with_entities(Mutation.id, is_ptm).distinct()
+    ]
 
-        assert all_in_iteration == all_mutations
+    # 2. - 4.
+    ptms_in_iterations = sample_ptm_counts(
+        reference_is_ptm, all_mutations, iterations_count, seed=seed, processes=processes
+    )                                                                   # P
+    percentages_in_iterations = ptms_in_iterations / all_mutations * 100  # Q
 
-        # 5.
-        if ptm_mutations > ptm_in_iteration:        # D > P
-            ptm_enriched_absolute += 1
-        if ptm_percentage > iteration_percentage:   # E > Q
-            ptm_enriched_percentage += 1
+    # 5.
+    ptm_enriched_absolute = int(count_nonzero(ptm_mutations > ptms_in_iterations))           # D > P
+    ptm_enriched_percentage = int(count_nonzero(ptm_percentage > percentages_in_iterations))  # E > Q
 
-        enriched_ptms.append(ptm_in_iteration)
-        enriched_percentage.append(iteration_percentage)
+    enriched_ptms = ptms_in_iterations.tolist()
+    enriched_percentage = percentages_in_iterations.tolist()
 
     median_ptms = median(enriched_ptms)
     median_percentage = median(enriched_percentage)
@@ -890,15 +1010,18 @@ def ptm_on_random(
     source=MC3Mutation, site_type='glycosylation',
     same_proteins=False, only_preferred=True, mode='occurrences',
     repeats=10000, ptm_proteins=False, same_ptm_proteins=False,
-    exclude_genes=None, mutation_filter=None, sample_ptm_muts=True
+    exclude_genes=None, mutation_filter=None, sample_ptm_muts=True,
+    seed=None, processes=1
 ):
     """"Compare frequencies of PTM mutations of given type with random proteome mutations
 
     from protein sequence regions of the same size as analysed PTM regions.
+
+    The repeats are drawn in chunks (see sample_sums), which can be spread
+    across `processes`; provide `seed` for reproducible results.
     """
     from numpy import sum
     from numpy import zeros
-    from numpy.random import choice
 
     assert mode in {'distinct', 'occurrences'}
     distinct = mode == 'distinct'
@@ -906,10 +1029,6 @@ def ptm_on_random(
     assert not (same_proteins and ptm_proteins)
     assert not (same_ptm_proteins and not ptm_proteins)
 
-    def measure(x):
-        """See https://github.com/taschini/pyinterval/issues/2"""
-        return int(fpu.up(lambda: sum((c.sup - c.inf for c in x), 0)))
-
     site_type = SiteType.query.filter_by(name=site_type).one()
     only_preferred = Protein.is_preferred_isoform if only_preferred else True
 
@@ -936,25 +1055,36 @@ def ptm_on_random(
 
     # region size
 
-    glyco_sequence_region_size = 0
-
-    intervals_by_protein = defaultdict(interval)
-
     sites = (
-        Site.query
+        db.session.query(Site.position, Protein)
+        .select_from(Site)
         .filter(SiteType.fuzzy_filter(site_type))
         .join(Protein)
         .filter(only_preferred)
     )
 
-    for site in tqdm(sites, total=sites.count()):
-        intervals_by_protein[site.protein] |= interval[
-            max(site.position - 7, 0),
-            min(site.position + 7, site.protein.length)
-        ]
+    sites_positions_by_protein = defaultdict(list)
+
+    for position, protein in tqdm(sites, total=sites.count()):
+        sites_positions_by_protein[protein].append(position)
 
-    for sequence_interval in intervals_by_protein.values():
-        glyco_sequence_region_size += measure(sequence_interval)
+    # regions (merged intervals of ±7 residues around the sites) as (starts, ends) arrays
+    intervals_by_protein = {}
+
+    for protein, positions in sites_positions_by_protein.items():
+        positions = asarray(positions)
+        starts = maximum(positions - 7, 0)
+        ends = minimum(positions + 7, protein.length)
+        intervals_by_protein[protein] = merge_intervals(minimum(starts, ends), maximum(starts, ends))
+
+    def measure(protein_interval):
+        starts, ends = protein_interval
+        return int((ends - starts).sum())
+
+    glyco_sequence_region_size = int(sum([
+        measure(protein_interval)
+        for protein_interval in intervals_by_protein.values()
+    ]))
 
     # ptm muts
 
@@ -985,12 +1115,7 @@ def ptm_on_random(
 
         for protein, protein_interval in tqdm(intervals_by_protein.items(), total=len(intervals_by_protein)):
             for mutation_details, mutation in ptm_muts_by_protein[protein]:
-                p = 0
-                for subinterval in protein_interval.components:
-                    if mutation.position in subinterval:
-                        p += mutation.position - 1 - int(subinterval[0].inf)  # position in interval
-                        break
-                    p += measure(subinterval)
+                p = position_in_regions(mutation.position, *protein_interval)
 
                 if distinct:
                     ptm_mutations_array[pos + p] += 1
@@ -998,9 +1123,9 @@ def ptm_on_random(
                     ptm_mutations_array[pos + p] += mutation_details.count
             pos += measure(protein_interval)
 
-        ptm_counts = []
-        for repeat in tqdm(range(repeats), total=repeats):
-            ptm_counts.append(sum(choice(ptm_mutations_array, size=glyco_sequence_region_size)))
+        ptm_counts = sample_sums(
+            ptm_mutations_array, glyco_sequence_region_size, repeats, seed=seed, processes=processes
+        ).tolist()
         print(Series(ptm_counts).describe())
         ptm_muts_count = mean(ptm_counts)
     else:
@@ -1046,11 +1171,11 @@ def ptm_on_random(
                 raise
         pos += protein.length
 
-    counts = []
-    append = counts.append
-
-    for repeat in tqdm(range(repeats), total=repeats):
-        append(sum(choice(mutations_array, size=glyco_sequence_region_size)))
+    # use a different seed than for sampling of the PTM mutations
+    counts = sample_sums(
+        mutations_array, glyco_sequence_region_size, repeats,
+        seed=seed + 1 if seed is not None else None, processes=processes
+    ).tolist()
 
     p_value = sum(1 for count in counts if count > ptm_muts_count) / repeats
     count_of_sampled_muts = mean(counts)
@@ -1,11 +1,14 @@
 import re
 from collections import defaultdict, ChainMap
-from typing import Iterable, Mapping, Union, List, NamedTuple
+from functools import lru_cache
+from multiprocessing import Pool
+from typing import Iterable, Mapping, Union, List, NamedTuple, Pattern, Dict
 
 from flask_sqlalchemy import BaseQuery
 from tqdm import tqdm
 
 from analyses.active_driver import ActiveDriverResult
+from database import db
 from models import Site, SiteType, Mutation, MutationSource, Protein, Gene, and_, or_, SiteMotif
 
 
@@ -41,8 +44,20 @@ def get_all_motifs():
     }
 
 
+MotifName = str
+
+
+@lru_cache(maxsize=None)
+def compile_motif(motif: str) -> Pattern:
+    return re.compile(motif)
+
+
 def has_motif(site_sequence: str, motif: str) -> bool:
-    return re.search(motif, site_sequence) is not None
+    return compile_motif(motif).search(site_sequence) is not None
+
+
+def substitute(sequence: str, position: int, residue: str) -> str:
+    return sequence[:position] + residue + sequence[position + 1:]
 
 
 def mutate_sequence(site: Site, mutation: Mutation, offset: int) -> str:
@@ -51,12 +66,108 @@ def mutate_sequence(site: Site, mutation: Mutation, offset: int) -> str:
 
     assert sequence[relative_position] == mutation.ref
 
-    sequence = sequence[:relative_position] + mutation.alt + sequence[relative_position + 1:]
+    return substitute(sequence, relative_position, mutation.alt)
 
-    return sequence
 
+def _search_motifs(motifs: Dict[str, Pattern], sequences: List[str]) -> Dict[str, List[bool]]:
+    return {
+        name: [motif.search(sequence) is not None for sequence in sequences]
+        for name, motif in motifs.items()
+    }
 
-MotifName = str
+
+class MotifsEngine:
+    """Evaluates motifs (regular expressions) on sequences of sites and of their mutated versions.
+
+    The motifs are compiled once. Sequences of sites (±7 residues, as in
+    Site.sequence) are retrieved in bulk and kept in a single packed string,
+    where each of the sites occupies a fixed-width slot. All substitutions
+    of residues (in any of the sites) are evaluated in one batch, optionally
+    split across multiple processes.
+    """
+
+    offset = 7
+    width = 2 * offset + 1
+
+    def __init__(self, motifs: Mapping[MotifName, str], processes=1, chunk_size=10000):
+        self.motifs = {
+            name: compile_motif(motif)
+            for name, motif in motifs.items()
+        }
+        self.processes = processes
+        self.chunk_size = chunk_size
+        self.packed_sequences = ''
+        self.slot_by_site_id = {}
+
+    def load_sites(self, sites: Iterable[Site], batch_size=1000):
+        """Retrieve sequences of the (persisted) sites which were not loaded yet."""
+        ids = list({
+            site.id for site in sites
+            if site.id is not None and site.id not in self.slot_by_site_id
+        })
+        sequences = []
+
+        for start in range(0, len(ids), batch_size):
+            query = (
+                db.session.query(Site.id, Site.sequence)
+                .select_from(Site)
+                .join(Protein)
+                .filter(Site.id.in_(ids[start:start + batch_size]))
+            )
+            for site_id, sequence in query:
+                # the sequences are read back by offsets, so each has to fill exactly one slot
+                assert len(sequence) == self.width
+                self.slot_by_site_id[site_id] = len(self.slot_by_site_id)
+                sequences.append(sequence)
+
+        self.packed_sequences += ''.join(sequences)
+
+    def sequence(self, site: Site) -> str:
+        slot = self.slot_by_site_id.get(site.id)
+        if slot is None:
+            return site.sequence
+        start = slot * self.width
+        return self.packed_sequences[start:start + self.width]
+
+    def sites_with_motifs(self, sites: Iterable[Site]) -> Mapping[MotifName, set]:
+        sites_with_motif = defaultdict(set)
+
+        for site in sites:
+            sequence = self.sequence(site)
+            for name, motif in self.motifs.items():
+                if motif.search(sequence):
+                    sites_with_motif[name].add(site)
+
+        return sites_with_motif
+
+    def mutated_sequence(self, site: Site, mutation: Mutation) -> str:
+        sequence = self.sequence(site)
+        relative_position = mutation.position - site.position + self.offset
+
+        assert sequence[relative_position] == mutation.ref
+
+        return substitute(sequence, relative_position, mutation.alt)
+
+    def search(self, sequences: List[str]) -> Dict[MotifName, List[bool]]:
+        """Test which of the sequences have each of the motifs.
+
+        Returns:
+            mapping: motif name -> list of flags, one for each of the sequences
+        """
+        if self.processes == 1 or len(sequences) <= self.chunk_size:
+            return _search_motifs(self.motifs, sequences)
+
+        chunks = [
+            (self.motifs, sequences[start:start + self.chunk_size])
+            for start in range(0, len(sequences), self.chunk_size)
+        ]
+        with Pool(self.processes) as pool:
+            results = pool.starmap(_search_motifs, chunks)
+
+        return {
+            name: [flag for result in results for flag in result[name]]
+            for name in self.motifs
+        }
 
 
 class MotifsRelatedCounts(NamedTuple):
@@ -91,7 +202,7 @@ class NoKnownMotifs(Exception):
 
 class MotifsCounter:
 
-    def __init__(self, site_type: SiteType, mode='broken_motif', motifs_db=get_all_motifs):
+    def __init__(self, site_type: SiteType, mode='broken_motif', motifs_db=get_all_motifs, processes=1):
         self.site_type = site_type
         self.motifs_db = motifs_db() if callable(motifs_db) else motifs_db
         self.mode = mode
@@ -101,19 +212,20 @@ class MotifsCounter:
         except KeyError:
             raise NoKnownMotifs(f'No known motifs for {site_type} in {motifs_db}')
 
+        self.engine = MotifsEngine(self.site_specific_motifs, processes=processes)
+
         self.breaking_modes = {
             'change_of_motif': self.change_of_motif,
             'broken_motif': self.broken_motif
         }
 
     @staticmethod
-    def change_of_motif(mutated_seq, motif):
-        return not has_motif(mutated_seq, motif)
+    def change_of_motif(motifs_present: Mapping[MotifName, bool], motif_name):
+        return not motifs_present[motif_name]
 
-    def broken_motif(self, mutated_seq, _):
-        return not any(
-            has_motif(mutated_seq, motif) for motif in self.site_specific_motifs.values()
-        )
+    @staticmethod
+    def broken_motif(motifs_present: Mapping[MotifName, bool], _):
+        return not any(motifs_present.values())
 
     def gather_muts_and_sites(
         self, mutations: BaseQuery, sites: BaseQuery,
@@ -131,6 +243,10 @@ class MotifsCounter:
         else:
             accepted_sites = sites.all()
 
+        engine = self.engine
+        engine.load_sites(accepted_sites)
+        accepted_sites = set(accepted_sites)
+
         mutations_affecting_sites = mutations.filter(
             Mutation.affected_sites.any(Site.types.contains(self.site_type))
         )
@@ -140,7 +256,7 @@ class MotifsCounter:
 
         sites_with_broken_motif = defaultdict(set)
 
-        sites_with_motif = select_sites_with_motifs(accepted_sites, self.site_specific_motifs)
+        sites_with_motif = engine.sites_with_motifs(accepted_sites)
 
         if occurrences_in:
             def mutation_count(mut: Mutation):
@@ -158,6 +274,9 @@ class MotifsCounter:
             ptm_muts = mutations_affecting_sites.count()
             mutations_affecting_sites = tqdm(mutations_affecting_sites, total=ptm_muts)
 
+        # (site, mutation, count, names of motifs of the site)
+        substitutions = []
+
         for mutation in mutations_affecting_sites:
             sites = mutation.affected_sites
 
@@ -165,16 +284,34 @@ class MotifsCounter:
                 if site not in accepted_sites:
                     continue
 
-                for motif_name, motif in self.site_specific_motifs.items():
-                    if site in sites_with_motif[motif_name]:
-                        count = mutation_count(mutation)
-                        muts_around_sites_with_motif[motif_name][mutation] = count
+                motifs_of_site = [
+                    motif_name
+                    for motif_name in self.site_specific_motifs
+                    if site in sites_with_motif[motif_name]
+                ]
+                if not motifs_of_site:
+                    continue
+
+                count = mutation_count(mutation)
+                for motif_name in motifs_of_site:
+                    muts_around_sites_with_motif[motif_name][mutation] = count
 
-                        mutated_sequence = mutate_sequence(site, mutation, offset=7)
+                substitutions.append((site, mutation, count, motifs_of_site))
 
-                        if is_affected(mutated_sequence, motif):
-                            sites_with_broken_motif[motif_name].add(site)
-                            muts_breaking_sites_motif[motif_name][mutation] = count
+        motifs_present = engine.search([
+            engine.mutated_sequence(site, mutation)
+            for site, mutation, count, motifs_of_site in substitutions
+        ])
+
+        for i, (site, mutation, count, motifs_of_site) in enumerate(substitutions):
+            present_in_mutated = {
+                motif_name: flags[i]
+                for motif_name, flags in motifs_present.items()
+            }
+            for motif_name in motifs_of_site:
+                if is_affected(present_in_mutated, motif_name):
+                    sites_with_broken_motif[motif_name].add(site)
+                    muts_breaking_sites_motif[motif_name][mutation] = count
 
         return MotifsData(
             sites_with_motif=sites_with_motif,
@@ -187,6 +324,11 @@ class MotifsCounter:
 
         data = self.gather_muts_and_sites(*args, **kwargs)
 
+        return self.summarize(data)
+
+    @staticmethod
+    def summarize(data: MotifsData) -> MotifsRelatedCounts:
+
         return MotifsRelatedCounts(
             sites_with_motif=defaultdict(int, {
                 motif: len(sites)
@@ -226,20 +368,48 @@ def count_by_sources(
     if not by_genes:
         return counter.count_muts_and_sites(base_query, sites,  **kwargs)
 
-    counts_by_genes = {}
-
     if not genes:
         genes = Gene.query.all()
+        preferred_isoforms = db.session.query(Gene.preferred_isoform_id)
+    else:
+        preferred_isoforms = [gene.preferred_isoform_id for gene in genes]
+
+    # gather the data of all the genes at once, then split these by gene
+    data = counter.gather_muts_and_sites(
+        base_query.filter(Mutation.protein_id.in_(preferred_isoforms)),
+        sites.filter(Site.protein_id.in_(preferred_isoforms)),
+        **kwargs
+    )
+    data_by_protein = split_by_protein(data)
+    no_data = MotifsData(*[{} for _ in MotifsData._fields])
 
-    for gene in tqdm(genes):
+    return {
+        gene.name: counter.summarize(data_by_protein.get(gene.preferred_isoform_id, no_data))
+        for gene in genes
+    }
 
-        query = base_query.filter(Mutation.protein == gene.preferred_isoform)
-        gene_sites = sites.filter(Site.protein == gene.preferred_isoform)
-        counts_by_genes[gene.name] = counter.count_muts_and_sites(
-            query, gene_sites, show_progress=False, **kwargs
-        )
 
-    return counts_by_genes
+def split_by_protein(data: MotifsData) -> Dict[int, MotifsData]:
+    """Split gathered motifs data into separate data for each of the proteins."""
+    by_protein = defaultdict(lambda: MotifsData(*[defaultdict(dict) for _ in MotifsData._fields]))
+
+    for motif_name, sites in data.sites_with_motif.items():
+        for site in sites:
+            by_protein[site.protein_id].sites_with_motif.setdefault(motif_name, set()).add(site)
+
+    for motif_name, sites in data.sites_with_broken_motif.items():
+        for site in sites:
+            by_protein[site.protein_id].sites_with_broken_motif.setdefault(motif_name, set()).add(site)
+
+    for motif_name, counts in data.muts_around_sites_with_motif.items():
+        for mutation, count in counts.items():
+            by_protein[mutation.protein_id].muts_around_sites_with_motif[motif_name][mutation] = count
+
+    for motif_name, counts in data.muts_breaking_sites_motif.items():
+        for mutation, count in counts.items():
+            by_protein[mutation.protein_id].muts_breaking_sites_motif[motif_name][mutation] = count
+
+    return dict(by_protein)
 
 
 def count_by_active_driver(
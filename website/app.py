@@ -200,6 +200,7 @@ def register_jinja_functions(app):
     jinja_globals['is_debug_mode'] = app.debug
 
     from stats import STORES
+    from stats.store import LazyStore
 
     def rename_mutations(df):
 
@@ -213,11 +214,10 @@ def register_jinja_functions(app):
             df['MutationType'] = df['MutationType'].apply(lambda code_name: mutation_to_label.get(code_name, code_name))
         return df
 
-    jinja_globals['datasets'] = {
+    jinja_globals['datasets'] = LazyStore(lambda: {
         key: rename_mutations(value)
         for key, value in STORES['Datasets'].items()
-    }
-    print(STORES['Datasets'].keys())
+    })
 
     register_ggplot_functions(jinja_globals)
 
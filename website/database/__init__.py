@@ -58,15 +58,38 @@ def fast_count(query):
     ).scalar()
 
 
-def yield_objects(base_query, step_size=1000):
-    done = False
-    step = 0
-    while not done:
-        obj = None
-        for obj in base_query.limit(step_size).offset(step * step_size):
-            yield obj
-        step += 1
-        done = not obj
+def stream_objects(base_query, batch_size=1000, options=(), key=None):
+    """Iterate over all objects of given query, fetching them in batches.
+
+    Rather than paging with OFFSET (which makes the database re-scan all
+    preceding rows for every batch), each batch seeks past the primary key
+    of the last retrieved object, so the cost of a batch does not grow with
+    its distance from the beginning of the table.
+
+    Args:
+        base_query: query with a mapped entity as the first selected item;
+            its ordering is replaced by the ordering on `key`
+        batch_size: number of objects to retrieve per query
+        options: loader options (e.g. `joinedload(...)`) applied to every batch
+        key: a unique, orderable column; defaults to the primary key
+    """
+    entities = base_query.column_descriptions
+    mapper = inspect(entities[0]['entity'])
+    if key is None:
+        key, = mapper.primary_key
+    attribute = mapper.get_property_by_column(key).key
+
+    query = base_query.options(*options).order_by(None).order_by(key)
+    last = None
+
+    while True:
+        batch_query = query if last is None else query.filter(key > last)
+        batch = batch_query.limit(batch_size).all()
+        yield from batch
+        if len(batch) < batch_size:
+            break
+        last_row = batch[-1]
+        last = getattr(last_row[0] if len(entities) > 1 else last_row, attribute)
 
 
 def query_joins(query):
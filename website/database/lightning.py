@@ -1,18 +1,89 @@
+import os
+import threading
+
 import lmdb
 
 
 class LightningInterface:
-    """Minimal, pythonic interface for lmdb"""
+    """Minimal, pythonic interface for lmdb
+
+    If the database is opened in readonly mode, the read transactions are
+    persistent: each thread (of each process) keeps its own pair of read
+    transactions (one returning bytes, one returning buffers), which are
+    re-used by all subsequent lookups rather than opened and closed on every
+    call. As there are no writers, such transactions never see stale data.
+    """
 
-    def __init__(self, path, **kwargs):
+    def __init__(self, path, persistent_reads=None, **kwargs):
         self.path = path
         self.env = lmdb.Environment(str(self.path), max_dbs=1, **kwargs)
+        if persistent_reads is None:
+            persistent_reads = kwargs.get('readonly', False)
+        self.persistent_reads = persistent_reads
+        self._local = threading.local()
+        self._generation = 0
+
+    def _read_transaction(self, buffers=False) -> lmdb.Transaction:
+        """Get the persistent read transaction of the current thread.
+
+        Transactions are never shared between threads and are re-created
+        in forked processes (e.g. Celery workers) or after re-opening.
+        """
+        local = self._local
+        pid = os.getpid()
+
+        if getattr(local, 'pid', None) != pid or local.generation != self._generation:
+            local.pid = pid
+            local.generation = self._generation
+            local.transactions = {}
+
+        try:
+            return local.transactions[buffers]
+        except KeyError:
+            transaction = self.env.begin(buffers=buffers)
+            local.transactions[buffers] = transaction
+            return transaction
 
-    def get(self, key, default=None):
+    def get(self, key, default=None, buffers=False):
+        """Get value for given key.
+
+        Args:
+            key: the key
+            default: value to return if the key is absent
+            buffers: should memoryview buffers be returned instead of bytes;
+                zero-copy buffers are only returned with persistent reads
+                (otherwise those would not outlive the transaction).
+        """
+        if self.persistent_reads:
+            return self._read_transaction(buffers).get(key, default=default)
         with self.env.begin() as transaction:
             return transaction.get(key, default=default)
 
+    def get_many(self, keys, default=None, buffers=False):
+        """Retrieve values for all `keys` within a single read transaction.
+
+        Returns:
+            dict mapping each of the keys to the value (or `default`)
+        """
+        if self.persistent_reads:
+            get = self._read_transaction(buffers).get
+            return {
+                key: get(key, default=default)
+                for key in keys
+            }
+        with self.env.begin() as transaction:
+            get = transaction.get
+            return {
+                key: get(key, default=default)
+                for key in keys
+            }
+
     def items(self):
+        if self.persistent_reads:
+            with self._read_transaction().cursor() as cursor:
+                for k, v in cursor:
+                    yield k, v
+            return
         with self.env.begin() as transaction:
             cursor = transaction.cursor()
             for k, v in cursor:
@@ -23,17 +94,19 @@ class LightningInterface:
             return transaction.put(key, value)
 
     def __getitem__(self, item):
-        with self.env.begin() as transaction:
-            return transaction.get(item)
+        return self.get(item)
 
     def __len__(self):
+        if self.persistent_reads:
+            return self._read_transaction().stat()['entries']
         with self.env.begin() as transaction:
             return transaction.stat()['entries']
 
     def __contains__(self, item):
         indicator = object()
-        with self.env.begin() as transaction:
-            return transaction.get(item, default=indicator) is not indicator
+        return self.get(item, default=indicator) is not indicator
 
     def close(self):
+        # transactions of all threads will be invalidated by closing the environment
+        self._generation += 1
         self.env.close()
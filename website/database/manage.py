@@ -20,9 +20,13 @@ def raw_delete_all(model):
 
 
 def remove_model(model, delete_func=raw_delete_all, autoincrement_func=restart_autoincrement):
+    from models import DataVersion
+
     print('Removing %s:' % model.__name__)
     try:
         count = delete_func(model)
+        # let the processes caching the data know that these were removed
+        DataVersion.bump(model)
         db.session.commit()
     except SQLAlchemyError:
         db.session.rollback()
@@ -47,6 +47,40 @@ def set_unique_checks(engine, active=True):
     return True
 
 
+def migrate_protein_tracks_to_binary(batch_size=1000):
+    """Encode disorder and conservation of proteins into the binary tracks.
+
+    Only the proteins which lack a binary track (but have the text data)
+    are converted; the changes are committed after each batch.
+
+    Returns:
+        count of converted proteins
+    """
+    from sqlalchemy import and_, or_
+    from sqlalchemy.orm import load_only
+    from database import stream_objects
+    from models import Protein, DataVersion
+
+    query = Protein.query.filter(or_(
+        and_(Protein.disorder_track == None, Protein.disorder_map != None),
+        and_(Protein.conservation_track == None, Protein.conservation != None)
+    ))
+    columns = load_only('id', 'disorder_map', 'disorder_track', 'conservation', 'conservation_track')
+
+    converted = 0
+
+    for protein in stream_objects(query, batch_size=batch_size, options=[columns]):
+        protein.update_tracks()
+        converted += 1
+        if converted % batch_size == 0:
+            db.session.commit()
+
+    if converted:
+        DataVersion.bump(Protein)
+    db.session.commit()
+    return converted
+
+
 def get_column_names(table):
     return set((i.name for i in table.c))
 
@@ -38,9 +38,18 @@ HDB_READONLY = False
 # counting everything in the database in order to prepare statistics might be
 # quite slow. It is helpful to turn stats generation off to speed up debugging.
 LOAD_STATS = True
+# statistics are loaded on the first use; set to True to load all of them on the start
+# (e.g. in production, where the application is loaded before forking the workers)
+PRELOAD_STATS = False
 CONTACT_LIST = ['some_maintainer@domain.org', 'other_maintainer@domain.org']
 LOGS_PATH = 'logs/app.log'
 
+# Representations of proteins (needleplots, tracks) are cached in memory of each
+# process (up to REPRESENTATION_CACHE_SIZE entries); set the path to additionally
+# keep these on disk (shared between processes; use manage.py prewarm_cache)
+REPRESENTATION_CACHE_SIZE = 256
+REPRESENTATION_CACHE_PATH = None
+
 # Should the system load local copies of third party dependencies or use content delivery networks?
 #
 USE_CONTENT_DELIVERY_NETWORK = True
@@ -2,9 +2,10 @@ import os
 from collections import OrderedDict
 
 from sqlalchemy import and_
+from sqlalchemy.orm import joinedload, selectinload
 from tqdm import tqdm
 
-from database import fast_count, yield_objects
+from database import fast_count, stream_objects
 from imports import MutationImportManager
 from models import (
     Gene, InheritedMutation, MC3Mutation, ExomeSequencingMutation, The1000GenomesMutation, Mutation,
@@ -44,7 +45,9 @@ def file_exporter(default_path):
 def primary_isoforms(f):
     """A list of primary isoforms of all genes in the database."""
 
-    for gene in tqdm(Gene.query.filter(Gene.preferred_isoform).all()):
+    query = Gene.query.filter(Gene.preferred_isoform)
+    genes = stream_objects(query, options=[joinedload(Gene.preferred_isoform)])
+    for gene in tqdm(genes, total=fast_count(query)):
         f.write(gene.name + '\t' + gene.preferred_isoform.refseq + '\n')
 
 
@@ -56,7 +59,8 @@ def sequences_ac(f):
     Should be parsable by Active Driver's `read_fasta()`.
     """
 
-    for gene in tqdm(Gene.query.all()):
+    genes = stream_objects(Gene.query, options=[joinedload(Gene.preferred_isoform)])
+    for gene in tqdm(genes, total=fast_count(Gene.query)):
         preferred_isoform: Protein = gene.preferred_isoform
         if not preferred_isoform:
             continue
@@ -71,7 +75,8 @@ def disorder_ac(f):
     """Disorder data as needed for Active Driver input.
     Includes only data from primary (preferred) isoforms."""
 
-    for gene in tqdm(Gene.query.all()):
+    genes = stream_objects(Gene.query, options=[joinedload(Gene.preferred_isoform)])
+    for gene in tqdm(genes, total=fast_count(Gene.query)):
         if not gene.preferred_isoform:
             continue
         f.write('>' + gene.name + '\n')
@@ -88,7 +93,16 @@ def sites_ac(f):
     ]
 
     f.write('\t'.join(header) + '\n')
-    for site in tqdm(Site.query.all()):
+    sites = stream_objects(
+        Site.query,
+        options=[
+            joinedload(Site.protein).joinedload(Protein.gene),
+            selectinload(Site.types),
+            selectinload(Site.kinases),
+            selectinload(Site.sources),
+        ]
+    )
+    for site in tqdm(sites, total=fast_count(Site.query)):
         if not site.protein or not site.protein.is_preferred_isoform:
             continue
         sequence = site.get_nearby_sequence(offset=7)
@@ -120,7 +134,11 @@ def site_specific_network_of_kinases_and_targets(f):
     ]
 
     f.write('\t'.join(header) + '\n')
-    for protein in tqdm(Protein.query, total=fast_count(Protein.query)):
+    proteins = stream_objects(
+        Protein.query,
+        options=[selectinload(Protein.sites).selectinload(Site.kinases)]
+    )
+    for protein in tqdm(proteins, total=fast_count(Protein.query)):
         for site in protein.sites:
             for kinase in site.kinases:
 
@@ -153,7 +171,17 @@ def mutations_affecting_ptm_sites(f, sources):
     for source in sources:
         mutation_details_model = source
 
-        for mut_details in tqdm(yield_objects(mutation_details_model.query), total=fast_count(mutation_details_model.query)):
+        query = mutation_details_model.query
+        all_details = stream_objects(
+            query,
+            options=[
+                joinedload(mutation_details_model.mutation)
+                .joinedload(Mutation.protein)
+                .joinedload(Protein.gene)
+            ]
+        )
+
+        for mut_details in tqdm(all_details, total=fast_count(query)):
             mutation = mut_details.mutation
             if mutation.is_ptm():
                 for site in mutation.get_affected_ptm_sites():
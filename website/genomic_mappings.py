@@ -1,7 +1,18 @@
-from typing import List
+import re
+from collections import defaultdict
+from struct import Struct
+from typing import List, Dict, Iterable, Tuple, Iterator
 
 from hash_set_db import HashSetWithCache
 
+# Values in the binary format start with a NUL byte (which never appears in
+# values encoded with `encode_csv`) followed by a single byte of version.
+BINARY_FORMAT_VERSION = 1
+BINARY_HEADER = bytes((0, BINARY_FORMAT_VERSION))
+
+# strand, ref and alt (one char each), cdna_pos, exon, protein_id, is_ptm
+binary_record = Struct('<3sIHI?')
+
 
 class GenomicMappings(HashSetWithCache):
 
@@ -12,12 +23,70 @@ class GenomicMappings(HashSetWithCache):
         it for full-database imports as it *may* be hugely inefficient.
         """
         snv = make_snv_key(chrom, dna_pos, dna_ref, dna_alt)
-        csv = encode_csv(
+        fields = (
             strand, aa_mut.ref, aa_mut.alt, cdna_pos_from_aa(aa_mut.position),
             exon, aa_mut.protein.id, is_ptm
         )
 
-        self.add(snv, csv)
+        key = bytes(snv, 'utf-8')
+        old_value = self.db.get(key)
+
+        if old_value and is_binary(old_value):
+            records = set(split_binary_records(old_value))
+            records.add(encode_csv_binary(*fields))
+            self.db[key] = BINARY_HEADER + b''.join(sorted(records))
+        else:
+            self.add(snv, encode_csv(*fields))
+
+    def decoded_values(self) -> Iterator[List[dict]]:
+        """Yields lists of decoded Coding Sequence Variants, one list per snv.
+
+        Both text and binary values are supported.
+        """
+        for key, value in self.db.items():
+            yield decode_value(value)
+
+    def migrate_to_binary(self, batch_size=100000):
+        """Re-encode all text values into the binary format.
+
+        The values are converted in batches of `batch_size` keys,
+        each batch being written within a separate transaction;
+        values already in the binary format are left untouched.
+
+        Returns:
+            count of converted values
+        """
+        env = self.db.env
+        converted = 0
+        last_key = None
+
+        while True:
+            batch = []
+            with env.begin() as transaction:
+                cursor = transaction.cursor()
+
+                if last_key is None:
+                    has_next = cursor.first()
+                else:
+                    has_next = cursor.set_range(last_key) and (cursor.key() != last_key or cursor.next())
+
+                while has_next and len(batch) < batch_size:
+                    batch.append((cursor.key(), cursor.value()))
+                    has_next = cursor.next()
+
+            if not batch:
+                break
+
+            last_key = batch[-1][0]
+
+            with env.begin(write=True) as transaction:
+                for key, value in batch:
+                    if is_binary(value):
+                        continue
+                    transaction.put(key, encode_value_binary(decode_value(value)))
+                    converted += 1
+
+        return converted
 
     def get_genomic_muts(self, chrom, dna_pos, dna_ref, dna_alt) -> List['SearchResult']:
         """Returns aminoacid mutations meeting provided criteria.
@@ -43,10 +112,7 @@ class GenomicMappings(HashSetWithCache):
 
         snv = make_snv_key(chrom, dna_pos, dna_ref, dna_alt)
 
-        items = [
-            decode_csv(item)
-            for item in self[snv]
-        ]
+        items = decode_value(self.db.get(bytes(snv, 'utf-8'), buffers=True))
 
         # this could be speed up by: itemgetters, accumulative queries and so on
         results = []
@@ -73,12 +139,106 @@ class GenomicMappings(HashSetWithCache):
 
         return results
 
+    def get_genomic_muts_many(
+        self, snvs: Iterable[Tuple[str, str, str, str]], query_chunk_size=500
+    ) -> Dict[Tuple[str, str, str, str], List['SearchResult']]:
+        """Batched version of `get_genomic_muts`.
+
+        All the mappings are retrieved from the hash database within a single
+        read transaction; proteins and already known mutations are fetched
+        with `IN` queries (in chunks of `query_chunk_size`), instead of
+        issuing separate queries for every single item.
+
+        Args:
+            snvs: iterable of (chrom, dna_pos, dna_ref, dna_alt) tuples
+            query_chunk_size: maximal number of values in a single `IN` clause
+
+        Returns:
+            dict mapping each of the provided snvs to a list of search results,
+            exactly as would be returned by `get_genomic_muts` for that snv
+        """
+        from search.mutation_result import SearchResult
+
+        from models import Protein, Mutation
+
+        keys = {snv: bytes(make_snv_key(*snv), 'utf-8') for snv in snvs}
+        values = self.db.get_many(keys.values(), buffers=True)
+
+        items_by_snv = {
+            snv: decode_value(values[key])
+            for snv, key in keys.items()
+        }
+
+        positions_by_protein = defaultdict(set)
+        for items in items_by_snv.values():
+            for item in items:
+                positions_by_protein[item['protein_id']].add(item['pos'])
+
+        protein_ids = list(positions_by_protein)
+        proteins = {}
+        known_mutations = {}
+
+        for i in range(0, len(protein_ids), query_chunk_size):
+            ids_chunk = protein_ids[i:i + query_chunk_size]
+            for protein in Protein.query.filter(Protein.id.in_(ids_chunk)):
+                proteins[protein.id] = protein
+
+            positions = set().union(*(positions_by_protein[protein_id] for protein_id in ids_chunk))
+            positions = list(positions)
+
+            for j in range(0, len(positions), query_chunk_size):
+                mutations = Mutation.query.filter(
+                    Mutation.protein_id.in_(ids_chunk),
+                    Mutation.position.in_(positions[j:j + query_chunk_size])
+                )
+                for mutation in mutations:
+                    known_mutations[mutation.protein_id, mutation.position, mutation.alt] = mutation
+
+        novel_mutations = {}
+        results = {}
+
+        for snv, items in items_by_snv.items():
+            snv_results = []
+
+            for item in items:
+                protein = proteins[item['protein_id']]
+                key = (protein.id, item['pos'], item['alt'])
+
+                mutation = known_mutations.get(key)
+                created = mutation is None
+
+                if created:
+                    # the same aminoacid change may result from different snvs;
+                    # if so, reuse the Mutation object created for the first one
+                    if key not in novel_mutations:
+                        novel_mutations[key] = Mutation(
+                            protein=protein,
+                            protein_id=protein.id,
+                            position=item['pos'],
+                            alt=item['alt']
+                        )
+                    mutation = novel_mutations[key]
+
+                snv_results.append(
+                    SearchResult(
+                        protein=protein,
+                        mutation=mutation,
+                        is_mutation_novel=created,
+                        type='genomic',
+                        **item
+                    )
+                )
+
+            results[snv] = snv_results
+
+        return results
+
     def iterate_known_muts(self):
         from models import Mutation
         from tqdm import tqdm
 
-        for value in tqdm(self.values(), total=len(self.db)):
-            for item in map(decode_csv, value):
+        for items in tqdm(self.decoded_values(), total=len(self.db)):
+            for item in items:
 
                 mutation = Mutation.query.filter_by(
                     protein_id=item['protein_id'],
@@ -151,3 +311,85 @@ def encode_csv(strand, ref, alt, cdna_pos, exon, protein_id, is_ptm):
     """
     return strand + ref + alt + ('1' if is_ptm else '0') + ':'.join((
         '%x' % int(cdna_pos), exon, '%x' % protein_id))
+
+
+def exon_number(exon: str) -> int:
+    """Extract the number of exon from identifiers like '2', 'exon2' or 'EX2'."""
+    match = re.search(r'\d+$', exon)
+    if not match:
+        raise ValueError(f'Exon identifier "{exon}" does not end with a number')
+    return int(match.group())
+
+
+def encode_csv_binary(strand, ref, alt, cdna_pos, exon, protein_id, is_ptm) -> bytes:
+    """Encode a Coding Sequence Variant into a fixed-width binary record.
+
+    Accepts the same arguments as `encode_csv`; note that only the number
+    of an exon is stored, so the exon will be decoded as a numeric string.
+    """
+    return binary_record.pack(
+        bytes(strand + ref + alt, 'ascii'),
+        int(cdna_pos), exon_number(exon), protein_id, bool(is_ptm)
+    )
+
+
+def decode_csv_binary(record) -> dict:
+    """Decode Coding Sequence Variant data from a record made by encode_csv_binary()."""
+    return record_to_dict(binary_record.unpack(record))
+
+
+def record_to_dict(record: tuple) -> dict:
+    residues, cdna_pos, exon, protein_id, is_ptm = record
+    strand, ref, alt = residues.decode('ascii')
+    return {
+        'strand': strand, 'ref': ref, 'alt': alt, 'pos': (cdna_pos - 1) // 3 + 1,
+        'cdna_pos': cdna_pos, 'exon': str(exon), 'protein_id': protein_id, 'is_ptm': is_ptm
+    }
+
+
+def is_binary(value) -> bool:
+    return value[:1] == BINARY_HEADER[:1]
+
+
+def split_binary_records(value) -> List[bytes]:
+    size = binary_record.size
+    return [
+        bytes(value[i:i + size])
+        for i in range(len(BINARY_HEADER), len(value), size)
+    ]
+
+
+def encode_value_binary(items: Iterable[dict]) -> bytes:
+    """Encode a set of decoded Coding Sequence Variants into a binary value."""
+    return BINARY_HEADER + b''.join(sorted(
+        encode_csv_binary(
+            item['strand'], item['ref'], item['alt'], item['cdna_pos'],
+            item['exon'], item['protein_id'], item['is_ptm']
+        )
+        for item in items
+    ))
+
+
+def decode_value(value) -> List[dict]:
+    """Decode all Coding Sequence Variants from a raw database value.
+
+    Both the text ('|'-separated `encode_csv` strings) and the versioned
+    binary format are supported; `None` (missing key) gives an empty list.
+    """
+    if not value:
+        return []
+
+    if is_binary(value):
+        version = value[1]
+        if version != BINARY_FORMAT_VERSION:
+            raise ValueError(f'Unsupported binary format version: {version}')
+        return [
+            record_to_dict(record)
+            for record in binary_record.iter_unpack(memoryview(value)[len(BINARY_HEADER):])
+        ]
+
+    return [
+        decode_csv(item)
+        for item in bytes(value).decode().split('|')
+        if item
+    ]
@@ -101,6 +101,33 @@ class HashSet:
             lambda new_set: self.__setitem__(key, new_set)
         )
 
+    @require_open
+    def get_many(self, keys: Iterable[str]) -> dict:
+        """Return a dict of `key: list of items` for all given keys.
+
+        All the keys are retrieved in a single read transaction,
+        which is much faster than using `__getitem__` repeatedly.
+        Keys absent in the database are mapped to empty lists.
+        """
+        encoded_keys = {bytes(key, 'utf-8'): key for key in keys}
+        values = self.db.get_many(encoded_keys)
+
+        decode = bytes.decode
+        split = str.split
+        results = {}
+
+        for encoded_key, value in values.items():
+            if value:
+                items = filter(bool, split(decode(value), '|'))
+                if self.integer_values:
+                    items = map(int, items)
+                items = list(items)
+            else:
+                items = []
+            results[encoded_keys[encoded_key]] = items
+
+        return results
+
     def items(self):
         """Yields (key, iterator over items from value set) tuples.
 
@@ -1,5 +1,8 @@
+from collections import OrderedDict
 from pathlib import Path
-from typing import Callable
+from threading import Lock
+from time import monotonic
+from typing import Callable, Hashable
 from warnings import warn
 
 from diskcache import Cache as DiskCache
@@ -19,9 +22,80 @@ class Cache(DiskCache):
         self.caches.append(self)
 
 
+class TieredCache:
+    """Least-recently-used in-memory cache with an optional on-disk tier.
+
+    Values are looked up in the memory first and then (if a directory was
+    given) in the disk cache, which outlives the process and is shared
+    between all workers of the application. If `ttl` (in seconds) is given,
+    values expire after that time.
+    """
+
+    caches = []
+
+    def __init__(self, max_size=128, directory=None, ttl=None, **disk_kwargs):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.memory = OrderedDict()
+        self.lock = Lock()
+        self.disk = Cache(directory, **disk_kwargs) if directory else None
+        self.caches.append(self)
+
+    def get(self, key: Hashable, default=None):
+        with self.lock:
+            if key in self.memory:
+                expires, value = self.memory[key]
+                if expires is None or expires > monotonic():
+                    self.memory.move_to_end(key)
+                    return value
+                del self.memory[key]
+        if self.disk is not None:
+            value = self.disk.get(key, default)
+            if value is not default:
+                self._remember(key, value)
+            return value
+        return default
+
+    def set(self, key: Hashable, value):
+        self._remember(key, value)
+        if self.disk is not None:
+            self.disk.set(key, value, expire=self.ttl)
+
+    def get_or_create(self, key: Hashable, create: Callable):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = create()
+            self.set(key, value)
+        return value
+
+    def _remember(self, key, value):
+        expires = monotonic() + self.ttl if self.ttl else None
+        with self.lock:
+            self.memory[key] = expires, value
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_size:
+                self.memory.popitem(last=False)
+
+    def __contains__(self, key):
+        missing = object()
+        return self.get(key, missing) is not missing
+
+    def __len__(self):
+        return len(self.memory)
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
 def purge_all_caches():
     for cache in Cache.caches:
         cache.clear()
+    for cache in TieredCache.caches:
+        cache.clear()
 
 
 def cache_decorator(cache: Cache) -> Callable:
@@ -2,6 +2,8 @@ import operator
 from functools import lru_cache
 from types import MethodType
 
+import numpy
+
 from helpers.utilities import is_iterable_but_not_str
 
 
@@ -173,6 +175,7 @@ class BasicFilter:
         self.multiple = multiple
         self.nullable = nullable
         self._value = None
+        self._compiled = None
         self.manager = None
 
     @property
@@ -297,6 +300,93 @@ class BasicFilter:
 
         return compare
 
+    vectorised_comparators = {'ge', 'le', 'gt', 'lt', 'eq', 'ne'}
+
+    def compiled_compare(self):
+        """Comparison function with the current value and comparator bound.
+
+        Unlike the functions from `get_compare_func`, the returned function
+        does not re-evaluate the (mapped) value of the filter on each call.
+        It is cached until the value or the comparator of the filter changes.
+        """
+        state = (self.comparator, repr(self.value))
+
+        if not self._compiled or self._compiled[0] != state:
+            self._compiled = state, self._compile_compare()
+
+        return self._compiled[1]
+
+    def _compile_compare(self):
+        comparator_function = self.allowed_comparators[self.comparator]
+        multiple_test = self.get_multiple_function()
+        mapped_value = self.mapped_value
+
+        # as in get_compare_func, values which cannot be compared
+        # (e.g. x in None or y > "tree") are let through the filter
+        if multiple_test:
+            def compare(value):
+                try:
+                    comparator_function(value, value)
+                except TypeError:
+                    return True
+                return multiple_test(
+                    comparator_function(value, sub_value)
+                    for sub_value in mapped_value
+                )
+            return compare
+
+        def compare(value):
+            try:
+                comparator_function(value, value)
+            except TypeError:
+                return True
+            return comparator_function(value, mapped_value)
+
+        return compare
+
+    def compiled_getter(self, itemgetter=None):
+        attr_get = self.attr_getter()
+        if itemgetter:
+            def get(element):
+                return attr_get(itemgetter(element))
+            return get
+        return attr_get
+
+    def compiled_test(self, itemgetter=None):
+        """Return a function testing if an element passes this filter."""
+        attr_get = self.compiled_getter(itemgetter)
+        compare = self.compiled_compare()
+
+        def test(element):
+            return compare(attr_get(element))
+
+        return test
+
+    def test_column(self, elements, itemgetter=None):
+        """Test all elements at once, returning a sequence of booleans.
+
+        The values of the attribute are extracted first; if those are all
+        numbers (and so is the value of the filter), the comparison
+        is performed on a numpy array in a single, vectorised operation.
+        """
+        attr_get = self.compiled_getter(itemgetter)
+        values = [attr_get(element) for element in elements]
+
+        comparator = self.comparator
+        mapped_value = self.mapped_value
+
+        if (
+            comparator in self.vectorised_comparators
+            and self.allowed_comparators[comparator] is self.possible_comparators[comparator]
+            and isinstance(mapped_value, (int, float))
+        ):
+            array = numpy.asarray(values)
+            if array.dtype.kind in 'biuf':
+                return self.allowed_comparators[comparator](array, mapped_value)
+
+        compare = self.compiled_compare()
+        return [compare(value) for value in values]
+
     @lru_cache(maxsize=1)
     def attr_getter(self):
         """Attribute getter that passes a value to an method-attribute if needed"""
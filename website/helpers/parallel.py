@@ -0,0 +1,54 @@
+from contextlib import contextmanager
+from multiprocessing import get_context
+
+
+def dispose_engines():
+    """Drop pooled connections of all database engines.
+
+    Connections must not be shared between processes; disposing the engines
+    before forking makes each of the child processes open its own ones.
+    In-memory SQLite databases (as used in tests) live only as long as their
+    connection, so these are kept - each child will work on its own copy.
+    """
+    from flask import current_app
+    from database import get_engine
+
+    for bind_key in current_app.config['SQLALCHEMY_BINDS']:
+        engine = get_engine(bind_key)
+        if engine.url.drivername == 'sqlite' and engine.url.database in (None, '', ':memory:'):
+            continue
+        engine.dispose()
+
+
+@contextmanager
+def database_safe_pool(processes=None, initializer=None, initargs=()):
+    """Create a pool of forked worker processes which may query the database.
+
+    The pending changes are committed and the connections pools emptied
+    before the workers are started; the workers inherit the application
+    context of the calling process, so the models can be used as usual.
+    Workers should only read from the database, leaving writes to the parent.
+    """
+    from database import db
+
+    db.session.commit()
+    dispose_engines()
+
+    with get_context('fork').Pool(processes, initializer, initargs) as pool:
+        yield pool
+
+
+@contextmanager
+def database_safe_imap(function, iterable, processes=1):
+    """Lazily map function over iterable, yielding the results in order.
+
+    A single process maps in the calling process, without forking;
+    otherwise the function is applied by `database_safe_pool` workers
+    (`processes=None` uses as many workers as there are CPUs).
+    """
+    if processes == 1:
+        yield map(function, iterable)
+        return
+
+    with database_safe_pool(processes) as pool:
+        yield pool.imap(function, iterable)
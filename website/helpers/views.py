@@ -2,12 +2,13 @@ from copy import copy
 
 from flask import jsonify
 from flask import request
-from sqlalchemy import and_
+from sqlalchemy import and_, or_
 from sqlalchemy import asc
 from sqlalchemy import desc
 from sqlalchemy.exc import StatementError
 from sqlalchemy.ext.associationproxy import AssociationProxy
 from database import db, fast_count
+from helpers.cache import TieredCache
 from helpers.filters.manager import joined_query
 
 ordering_functions = {
@@ -33,6 +34,72 @@ class ModelCounter:
         return self
 
 
+def query_fingerprint(query):
+    """Hashable representation of the SQL statement and parameters of a query."""
+    if isinstance(query, ModelCounter):
+        query = query.query
+    compiled = query.statement.compile()
+    return compiled.string, tuple(sorted(
+        (name, repr(value))
+        for name, value in compiled.params.items()
+    ))
+
+
+class Keyset:
+    """Describes how to seek through the results sorted by a column.
+
+    Rather than skipping `offset` rows (which requires the database to
+    produce and discard all the preceding rows), the next page starts
+    right after the (sort value, id) key of the last row of the previous page.
+
+    Args:
+        id_column: unique column (e.g. primary key) breaking the ties of the sort
+        get_id: function returning the value of id_column for a result row
+        get_value: function returning the value of the sorted column
+            for a result row, given the row and the name of the sort column
+        aggregated: should the seek condition be placed in HAVING
+            (as required when sorting by aggregates, referred to by labels)
+    """
+
+    def __init__(self, id_column, get_id, get_value, aggregated=False):
+        self.id_column = id_column
+        self.get_id = get_id
+        self.get_value = get_value
+        self.aggregated = aggregated
+
+    def key(self, row, sort_name):
+        return self.get_value(row, sort_name), self.get_id(row)
+
+    def seek(self, query, sort_column, order, key):
+        """Continue after the given key; sort_column has to be the same expression
+        which the query is ordered by (as returned by `prepare_for_sorting`)."""
+        value, last_id = key
+
+        if order == 'desc':
+            condition = or_(
+                sort_column < value,
+                and_(sort_column == value, self.id_column < last_id),
+                # NULLs are sorted last in descending order
+                sort_column.is_(None)
+            )
+        else:
+            condition = or_(
+                sort_column > value,
+                and_(sort_column == value, self.id_column > last_id)
+            )
+
+        if self.aggregated:
+            return query.having(condition)
+        return query.filter(condition)
+
+
+# totals of filtered tables, keyed by the SQL of count query (which includes the filters and the search phrase)
+totals_cache = TieredCache(max_size=1024, ttl=60)
+
+# keys of the last rows of served pages, allowing to seek to the next page
+page_boundaries = TieredCache(max_size=4096, ttl=600)
+
+
 class AjaxTableView:
     """View returning data in JSON format, compatible with Bootstrap-Table.
 
@@ -63,6 +130,11 @@ class AjaxTableView:
             query=lambda filters, joins: joined_query(model.query, joins),
             prepare_for_sorting=prepare_for_sorting,
             count_query=lambda filters, joins: ModelCounter(model),
+            keyset=Keyset(
+                id_column=model.id,
+                get_id=lambda element: element.id,
+                get_value=getattr
+            ),
             **kwargs
         )
 
@@ -71,7 +143,7 @@ class AjaxTableView:
         query, count_query=None,
         results_mapper=json_results_mapper, filters_class=None,
         search_filter=None, search_sort=None,
-        prepare_for_sorting=None, **kwargs
+        prepare_for_sorting=None, keyset=None, **kwargs
     ):
         """Create TableView from an sqlalchemy query object.
 
@@ -99,6 +171,12 @@ class AjaxTableView:
                 and boolean indication if the query was modified.
             prepare_for_sorting:
                 hook to modify query and sort key (sort column)
+            keyset:
+                if given, pages following an already served page will
+                be retrieved by seeking after its last row (see Keyset)
+                rather than with OFFSET; this applies to tables sorted
+                by a column (but not by relevance to a search phrase),
+                as returned by `prepare_for_sorting` (which is required)
 
         Keyword Args:
             sort, search, order, offset and limit will be used
@@ -160,7 +238,7 @@ class AjaxTableView:
 
             sorted_by_search = False
 
-            sort_key = args['sort']
+            sort_name = sort_key = args['sort']
 
             if sort_key and prepare_for_sorting:
                 query, sort_key = prepare_for_sorting(query, sort_key)
@@ -168,10 +246,18 @@ class AjaxTableView:
             if phrase and search_sort:
                 query, sorted_by_search = search_sort(query, phrase, sort_key, ordering_function)
 
+            # seeking requires the actual sorted expression rather than the name of a field
+            use_keyset = (
+                keyset and prepare_for_sorting
+                and sort_key is not None and not sorted_by_search
+            )
+
             if not sorted_by_search and sort_key:
                 query = query.order_by(
                     ordering_function(sort_key)
                 )
+                if use_keyset:
+                    query = query.order_by(ordering_function(keyset.id_column))
 
             if callable(predefined_count_query):
                 count_query = predefined_count_query(sql_filters, required_joins)
@@ -185,10 +271,34 @@ class AjaxTableView:
                 query = query.filter(filters_conjunction)
                 count_query = count_query.filter(filters_conjunction)
 
+            offset = int(args['offset'])
+            limit = int(args['limit'])
+
             try:
-                count = count_query.count()
-                query = query.limit(args['limit']).offset(args['offset'])
-                elements = query
+                count = totals_cache.get_or_create(
+                    query_fingerprint(count_query),
+                    count_query.count
+                )
+
+                if use_keyset:
+                    pages_key = (query_fingerprint(query), args['order'])
+                    boundary = page_boundaries.get((pages_key, offset)) if offset else None
+
+                    if boundary is not None:
+                        query = keyset.seek(query, sort_key, args['order'], boundary)
+                    else:
+                        query = query.offset(offset)
+
+                    elements = query.limit(limit).all()
+
+                    # remember where the next page starts
+                    if elements:
+                        last_key = keyset.key(elements[-1], sort_name)
+                        if last_key[0] is not None:
+                            page_boundaries.set((pages_key, offset + len(elements)), last_key)
+                else:
+                    query = query.limit(limit).offset(offset)
+                    elements = query
             except StatementError as e:
                 db.session.rollback()
                 print('Statement Error detected!', e)
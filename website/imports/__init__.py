@@ -1,4 +1,5 @@
 from database import db
+from models import Protein
 from imports.mutations import MutationImporter
 
 from .importer import AbstractImporter, BioImporter, CMSImporter
@@ -12,7 +13,7 @@ from . import cms
 def import_all():
     print('Preparing to whole database import...')
 
-    bio_import_manager = ImportManager(BioImporter, ignore=MutationImporter.subclassess)
+    bio_import_manager = ImportManager(BioImporter, ignore=MutationImporter.subclassess, revised_models=[Protein])
     bio_import_manager.import_all()
 
     # mutations need protein information
@@ -1,4 +1,5 @@
 from abc import ABCMeta, abstractmethod
+from functools import wraps
 from typing import Type, Callable
 
 from sqlalchemy.util import classproperty
@@ -50,7 +51,9 @@ def simple_importer(importer_abstract_class: Type[AbstractImporter], requires=No
 
         class FunctionImporter(importer_abstract_class):
 
+            # wrapped, so that the arguments of func can be inspected
             @staticmethod
+            @wraps(func)
             def load(*args, **kwargs):
                 return func(*args, **kwargs)
 
@@ -1,12 +1,20 @@
+from inspect import signature
 from typing import Type, List
 
 from database import db
+from models import DataVersion
 from imports import AbstractImporter
 
 
 class ImportManager:
 
-    def __init__(self, importer_abstract_class: Type[AbstractImporter], ignore=None):
+    def __init__(self, importer_abstract_class: Type[AbstractImporter], ignore=None, revised_models=()):
+        """
+        Args:
+            revised_models: models of which revisions (see DataVersion.bump)
+                should be bumped after each of the imports
+        """
+        self.revised_models = revised_models
         self.importers = [
             importer
             for importer in importer_abstract_class.registry
@@ -21,7 +29,12 @@ class ImportManager:
     def import_all(self):
         self.import_selected(importers_subset=self.ordered_importers)
 
-    def import_selected(self, importers_subset: List[str] = None):
+    def import_selected(self, importers_subset: List[str] = None, **kwargs):
+        """Run the chosen importers.
+
+        Keyword arguments are passed to those of the importers which accept
+        them; arguments set to None are not passed, leaving the defaults.
+        """
 
         if not importers_subset:
             print('Importing all')
@@ -30,11 +43,18 @@ class ImportManager:
         for importer_name in importers_subset:
             importer = self.importers_by_name[importer_name]()
             print(f'Running {importer_name}:')
-            results = importer.load()
+            accepted = signature(importer.load).parameters
+            results = importer.load(**{
+                key: value
+                for key, value in kwargs.items()
+                if key in accepted and value is not None
+            })
             if results:
                 print(f'Got {len(results)} results.')
                 print(f'Adding {importer.name} results to the session...')
                 db.session.add_all(results)
+            if self.revised_models:
+                DataVersion.bump(*self.revised_models)
             print('Committing changes...')
             db.session.commit()
             print(f'Success: {importer.name} done!')
@@ -45,13 +45,16 @@ class MIMPImporter(ChunkedMutationImporter):
         return count_lines_tsv(path)
 
     def parse_chunk(self, path, chunk_start, chunk_size):
-        mimps = []
+        return self.parse_preparsed(self.preparse_chunk(path, chunk_start, chunk_size))
+
+    def preparse_chunk(self, path, chunk_start, chunk_size):
+        preparsed = []
         site_type = SiteType.query.filter_by(name=self.site_type).one()
         skipped_predictions = 0
         mismatched_sequences = 0
 
         def parser(line):
-            nonlocal mimps, skipped_predictions, mismatched_sequences
+            nonlocal skipped_predictions, mismatched_sequences
 
             refseq = line[0]
             mut = line[1]
@@ -72,9 +75,6 @@ class MIMPImporter(ChunkedMutationImporter):
 
             assert line[13] in ('gain', 'loss')
 
-            # MIMP mutations are always hardcoded PTM mutations
-            mutation_id = self.get_or_make_mutation(pos, protein.id, alt, True)
-
             psite_pos = int(psite_pos)
 
             affected_sites = [
@@ -99,15 +99,17 @@ class MIMPImporter(ChunkedMutationImporter):
 
             site_id = affected_sites[0].id
 
-            mimps.append(
+            preparsed.append(
                 (
-                    mutation_id,
-                    int(line[3]),
-                    1 if line[13] == 'gain' else 0,
-                    line[9],
-                    line[10],
-                    float(line[12]),
-                    site_id
+                    (pos, protein.id, alt),
+                    (
+                        int(line[3]),
+                        1 if line[13] == 'gain' else 0,
+                        line[9],
+                        line[10],
+                        float(line[12]),
+                        site_id
+                    )
                 )
             )
 
@@ -115,12 +117,19 @@ class MIMPImporter(ChunkedMutationImporter):
             parser(line)
 
         if skipped_predictions:
-            ratio = skipped_predictions / (skipped_predictions + len(mimps))
+            ratio = skipped_predictions / (skipped_predictions + len(preparsed))
             print(f'In this chunk skipped {skipped_predictions} MIMP predictions ({ratio * 100}%)')
 
         print(f'Skipped {mismatched_sequences} mismatched sequences')
 
-        return mimps
+        return preparsed
+
+    def parse_preparsed(self, preparsed):
+        # MIMP mutations are always hardcoded PTM mutations
+        return [
+            (self.get_or_make_mutation(pos, protein_id, alt, True), *values)
+            for (pos, protein_id, alt), values in preparsed
+        ]
 
     def insert_details(self, mimps):
 
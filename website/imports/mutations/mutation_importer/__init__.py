@@ -1,7 +1,7 @@
 import gc
 import gzip
 from abc import abstractmethod
-from collections import defaultdict
+from collections import defaultdict, deque
 from typing import List, Iterable
 
 from sqlalchemy.orm import load_only
@@ -9,11 +9,12 @@ from sqlalchemy.util import classproperty
 from werkzeug.utils import cached_property
 
 from database import db, create_key_model_dict
-from database.bulk import bulk_orm_insert, restart_autoincrement
+from database.bulk import bulk_orm_insert, bulk_native_insert, restart_autoincrement
 from database.manage import raw_delete_all, remove_model
 from helpers.bioinf import decode_mutation, is_sequence_broken
+from helpers.parallel import database_safe_pool
 from helpers.patterns import abstract_property
-from models import Protein, Mutation
+from models import Protein, Mutation, DataVersion
 
 from ...importer import BioImporter
 from .base_importer import BaseMutationsImporter
@@ -30,6 +31,9 @@ class MutationImporter(BioImporter, MutationExporter):
     default_path = None
     insert_keys = None
     model = None
+    # should the rows be inserted with native bulk-loading (LOAD DATA on MySQL)
+    # rather than with ORM bulk inserts; see `database.bulk.bulk_native_insert`
+    native_bulk_insert = False
 
     def __init__(self, proteins=None):
         self.mutations_details_pointers_grouped_by_unique_mutations = defaultdict(list)
@@ -38,7 +42,7 @@ class MutationImporter(BioImporter, MutationExporter):
 
         # used to save 'cores of mutations': Mutation objects which have
         # columns like 'position', 'alt', 'protein' and no other details.
-        self.base_importer = BaseMutationsImporter()
+        self.base_importer = BaseMutationsImporter(native_bulk_insert=self.native_bulk_insert)
 
     @cached_property
     def proteins(self):
@@ -69,7 +73,7 @@ class MutationImporter(BioImporter, MutationExporter):
             raise Exception('path is required when no default_path is set')
         return path
 
-    def load(self, path=None, update=False, **kwargs):
+    def load(self, path=None, update=False, preload_mutations=False, **kwargs):
         """Load, parse and insert mutations from given path.
 
         If update is True, old mutations will be updated and new added.
@@ -80,13 +84,24 @@ class MutationImporter(BioImporter, MutationExporter):
         without removing old mutations in the first place.
 
         Long story short: when importing mutations to clean/new database - use
-        update=False. For updates use update=True and expect long runtime."""
+        update=False. For updates use update=True and expect long runtime.
+
+        If preload_mutations is True, identifiers of the existing mutations
+        are bulk-loaded into memory once, before the first batch is parsed."""
         print(f'Loading {self.model_name}:')
 
         path = self.choose_path(path)
 
+        if preload_mutations:
+            self.base_importer.preload(
+                protein.id for protein in self.proteins.values()
+            )
+
         self._load(path, update, **kwargs)
 
+        DataVersion.bump(Mutation, self.model)
+        self.commit()
+
         if self.broken_seq:
             report_file = 'broken_seq_' + self.model_name + '.log'
 
@@ -280,7 +295,8 @@ class MutationImporter(BioImporter, MutationExporter):
             raise Exception(
                 'To use insert_list, you have to specify insert_keys'
             )
-        bulk_orm_insert(self.model, self.insert_keys, data)
+        insert = bulk_native_insert if self.native_bulk_insert else bulk_orm_insert
+        insert(self.model, self.insert_keys, data)
 
     def raw_delete_all(self, model):
         """In subclasses you can overwrite this function
@@ -398,13 +414,26 @@ class MutationImporter(BioImporter, MutationExporter):
         self.mutations_details_pointers_grouped_by_unique_mutations[mutation_id].append(new_pointer)
 
 
+# importer used by the worker processes of ChunkedMutationImporter
+_worker_importer = None
+
+
+def _set_worker_importer(importer):
+    global _worker_importer
+    _worker_importer = importer
+
+
+def _preparse_chunk(path, chunk_start, chunk_size):
+    return _worker_importer.preparse_chunk(path, chunk_start, chunk_size)
+
+
 class ChunkedMutationImporter(MutationImporter):
 
     # if the input file is so large that it needs to be processed in chunks
     # (and the importer is able to handle chunk-by-chunk processing), what
     # should be the size of each chunk (in number of lines)
     chunk_size = None
-    parse_kwargs = ['chunk_start', 'chunk_size']
+    parse_kwargs = ['chunk_start', 'chunk_size', 'preparsed']
 
     @abstractmethod
     def count_lines(self, path) -> int:
@@ -414,10 +443,28 @@ class ChunkedMutationImporter(MutationImporter):
     def parse_chunk(self, path, chunk_start, chunk_size):
         pass
 
-    def parse(self, path, chunk_start, chunk_size):
+    @abstractmethod
+    def preparse_chunk(self, path, chunk_start, chunk_size):
+        """Parse a chunk without assigning identifiers to the mutations.
+
+        Required for parallel import: it is run in worker processes,
+        so it must not modify the database nor use `get_or_make_mutation`;
+        returned data has to be picklable and accepted by `parse_preparsed`.
+        """
+
+    @abstractmethod
+    def parse_preparsed(self, preparsed):
+        """Assign mutation identifiers to data returned by `preparse_chunk`.
+
+        Returns data as accepted by `insert_details`.
+        """
+
+    def parse(self, path, chunk_start, chunk_size, preparsed=None):
+        if preparsed is not None:
+            return self.parse_preparsed(preparsed)
         return self.parse_chunk(path, chunk_start, chunk_size)
 
-    def _load(self, path, update, chunk=None, **kwargs):
+    def _load(self, path, update, chunk=None, processes=None, **kwargs):
         total = self.count_lines(path)
         chunks = (
             list(range(0, total, self.chunk_size))
@@ -427,6 +474,43 @@ class ChunkedMutationImporter(MutationImporter):
         if chunk is not None:
             print(f'Limiting imported chunks to {chunk+1}-th chunk out of {len(chunks)}')
             chunks = [chunks[chunk]]
+
+        if processes and processes > 1 and len(chunks) > 1:
+            return self._load_in_parallel(path, update, chunks, total, processes)
+
         for chunk_start in chunks:
             print(f'Importing chunk from {chunk_start/total*100:.2f} to {(chunk_start + self.chunk_size)/total*100:.2f}:')
             super()._load(path, update, chunk_start=chunk_start, chunk_size=self.chunk_size)
+
+    def _load_in_parallel(self, path, update, chunks, total, processes):
+        """Pre-parse chunks in worker processes, inserting them in this process.
+
+        Identifiers of mutations are assigned (and rows inserted) only by this
+        process, in order of the chunks, so `get_highest_id` stays consistent.
+        At most `processes` parsed chunks are kept in memory awaiting insertion.
+        """
+        print(f'Parsing chunks with {processes} processes')
+
+        # make sure that the proteins are loaded before forking
+        self.proteins
+
+        def insert(chunk_start, pending_result):
+            print(f'Importing chunk from {chunk_start/total*100:.2f} to {(chunk_start + self.chunk_size)/total*100:.2f}:')
+            MutationImporter._load(
+                self, path, update, chunk_start=chunk_start, chunk_size=self.chunk_size,
+                preparsed=pending_result.get()
+            )
+
+        with database_safe_pool(processes, initializer=_set_worker_importer, initargs=(self,)) as pool:
+            pending = deque()
+
+            for chunk_start in chunks:
+                pending.append((
+                    chunk_start,
+                    pool.apply_async(_preparse_chunk, (path, chunk_start, self.chunk_size))
+                ))
+                if len(pending) > processes:
+                    insert(*pending.popleft())
+
+            while pending:
+                insert(*pending.popleft())
@@ -1,16 +1,95 @@
+from typing import Dict, Iterable
+
 from sqlalchemy.orm.exc import NoResultFound
 
 from database import db
-from database.bulk import get_highest_id
+from database.bulk import get_highest_id, bulk_native_insert
 from helpers.parsers import chunked_list
 from models import Mutation
 
 
+class MutationsIndex:
+    """In-memory index of identifiers of existing mutations, sharded by protein.
+
+    Each shard maps a packed `(position, alt)` integer key to the mutation id;
+    shards of proteins which were not preloaded are fetched (with a single
+    query per protein) on the first lookup.
+    """
+
+    def __init__(self, query_chunk_size=500):
+        self.shards: Dict[int, Dict[int, int]] = {}
+        self.query_chunk_size = query_chunk_size
+
+    @staticmethod
+    def pack(pos, alt) -> int:
+        return pos << 8 | ord(alt)
+
+    def load(self, protein_ids: Iterable[int]):
+        """Bulk-load shards for all given proteins."""
+        protein_ids = [
+            protein_id
+            for protein_id in set(protein_ids)
+            if protein_id not in self.shards
+        ]
+        for chunk in chunked_list(protein_ids, self.query_chunk_size):
+            self._load_shards(chunk)
+
+    def _load_shards(self, protein_ids):
+        shards = {protein_id: {} for protein_id in protein_ids}
+        pack = self.pack
+
+        query = (
+            db.session.query(Mutation.protein_id, Mutation.position, Mutation.alt, Mutation.id)
+            .filter(Mutation.protein_id.in_(protein_ids))
+            .yield_per(10000)
+        )
+        for protein_id, pos, alt, mutation_id in query:
+            shards[protein_id][pack(pos, alt)] = mutation_id
+
+        self.shards.update(shards)
+
+    def get(self, pos, protein_id, alt):
+        """Return id of mutation or None if the mutation is not in the database."""
+        try:
+            shard = self.shards[protein_id]
+        except KeyError:
+            self._load_shards([protein_id])
+            shard = self.shards[protein_id]
+        return shard.get(self.pack(pos, alt))
+
+    def add(self, pos, protein_id, alt, mutation_id):
+        """Record a newly inserted mutation.
+
+        Shards which were not loaded yet are skipped: these will
+        be fetched (with the new mutation) on the first lookup.
+        """
+        shard = self.shards.get(protein_id)
+        if shard is not None:
+            shard[self.pack(pos, alt)] = mutation_id
+
+
 class BaseMutationsImporter:
     """Imports 'cores of mutations' - data used to build 'Mutation' instances
     so columns common for different metadata like: 'position', 'alt' etc."""
 
+    def __init__(self, native_bulk_insert=False):
+        self.native_bulk_insert = native_bulk_insert
+        # by default the database is queried for each new mutation
+        self.index = None
+
+    def preload(self, protein_ids: Iterable[int]):
+        """Bulk-load identifiers of existing mutations of given proteins.
+
+        The in-memory index is kept for all the subsequent batches
+        (and updated with the mutations inserted by these), so this
+        should be called once per import, before the first `prepare`.
+        """
+        print('Preloading existing mutations:')
+        self.index = MutationsIndex()
+        self.index.load(protein_ids)
+
     def prepare(self):
+        """Prepare for import of a new batch of mutations."""
         # reset base_mutations
         self.mutations = {}
 
@@ -28,9 +107,12 @@ class BaseMutationsImporter:
             return self.mutations[key][0]
         else:
 
-            mutation_id = db.session.query(Mutation.id).filter_by(
-                position=pos, protein_id=protein_id, alt=alt
-            ).scalar()
+            if self.index is not None:
+                mutation_id = self.index.get(pos, protein_id, alt)
+            else:
+                mutation_id = db.session.query(Mutation.id).filter_by(
+                    position=pos, protein_id=protein_id, alt=alt
+                ).scalar()
 
             if mutation_id is None:
                 self.highest_base_id += 1
@@ -40,6 +122,21 @@ class BaseMutationsImporter:
             return mutation_id
 
     def insert(self):
+        if self.index is not None:
+            for (pos, protein_id, alt), (mutation_id, is_ptm) in self.mutations.items():
+                self.index.add(pos, protein_id, alt, mutation_id)
+
+        if self.native_bulk_insert:
+            bulk_native_insert(
+                Mutation,
+                ('id', 'precomputed_is_ptm', 'position', 'protein_id', 'alt'),
+                (
+                    (data[0], data[1], *mutation)
+                    for mutation, data in self.mutations.items()
+                )
+            )
+            return
+
         for chunk in chunked_list(self.mutations.items()):
             db.session.bulk_insert_mappings(
                 Mutation,
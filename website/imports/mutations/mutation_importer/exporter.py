@@ -6,7 +6,7 @@ from pandas import DataFrame
 from sqlalchemy.orm import load_only
 from tqdm import tqdm
 
-from database import db
+from database import db, stream_objects
 from helpers.patterns import abstract_property
 from models import Gene, Protein, Mutation
 
@@ -71,7 +71,7 @@ class MutationExporter:
 
         total = query.count()
 
-        for mutation_details, mut in tqdm(query, total=total):
+        for mutation_details, mut in tqdm(stream_objects(query), total=total):
 
             protein = mut.protein
 
@@ -21,6 +21,7 @@ class The1000GenomesImporter(MutationImporter):
         'maf_eur',
         'maf_sas',
     )
+    native_bulk_insert = True
 
     @staticmethod
     # TODO: there are some issues with this function
@@ -4,18 +4,21 @@ from pathlib import Path
 from typing import Callable, Type
 from warnings import warn
 
+from numpy import array, int64, searchsorted, sort
 from pandas import read_table
+from sqlalchemy.orm import joinedload, selectinload
 from tqdm import tqdm
 from database import db, create_key_model_dict
 from database import get_or_create
 from helpers.bioinf import aa_symbols
+from helpers.parallel import database_safe_imap
 from helpers.parsers import parse_fasta_file, iterate_tsv_gz_file
 from helpers.parsers import parse_tsv_file
 from helpers.parsers import parse_text_file
 from imports.importer import simple_importer, BioImporter
 from models import (
     Domain, UniprotEntry, MC3Mutation, InheritedMutation, Mutation, SiteType,
-    SiteMotif, PCAWGMutation
+    SiteMotif, PCAWGMutation, Site, DataVersion, AffectedMotif
 )
 from models.bio.drug import DrugGroup, DrugType, Drug, DrugTarget
 from models import Gene
@@ -487,7 +490,7 @@ def select_preferred_isoforms():
 
 
 @simple_bio_importer(requires=[proteins_and_genes])
-def conservation(path='data/hg19.100way.phyloP100way.bw', ref_gene_path='data/refGene.txt.gz'):
+def conservation(path='data/hg19.100way.phyloP100way.bw', ref_gene_path='data/refGene.txt.gz', processes=1):
     from helpers.bioinf import read_genes_data
     from analyses.conservation.scores import scores_for_proteins
 
@@ -503,7 +506,7 @@ def conservation(path='data/hg19.100way.phyloP100way.bw', ref_gene_path='data/re
 
     proteins = get_proteins()
 
-    phylo_p_tracks, phylo_details = scores_for_proteins(proteins.values(), genes_data, path)
+    phylo_p_tracks, phylo_details = scores_for_proteins(proteins.values(), genes_data, path, processes=processes)
 
     del genes_data
 
@@ -513,6 +516,8 @@ def conservation(path='data/hg19.100way.phyloP100way.bw', ref_gene_path='data/re
             for score in scores
         )
 
+    DataVersion.bump(Protein)
+
 
 @simple_bio_importer(requires=[proteins_and_genes])
 def disorder(path='data/all_RefGene_disorder.fa'):
@@ -545,6 +550,8 @@ def disorder(path='data/all_RefGene_disorder.fa'):
             warn(f'Trimming the disorder track to {protein.length}')
             protein.disorder_map = protein.disorder_map[:protein.length]
 
+    DataVersion.bump(Protein)
+
 
 @simple_bio_importer(requires=[proteins_and_genes])
 def domains(path='data/domains.tsv'):
@@ -1324,17 +1331,95 @@ def active_pathways_lists(
     return pathways_lists
 
 
+def _ptm_status_of_mutations(proteins_range):
+    """Find confirmed mutations (of proteins within given, inclusive id range) with outdated `precomputed_is_ptm`.
+
+    Returns:
+        (ids of mutations to mark as PTM-related, ids of mutations to mark as not related)
+    """
+    first, last = proteins_range
+    distance = 7
+
+    sites = array(
+        db.session.query(Site.protein_id, Site.position)
+        .filter(Site.protein_id.between(first, last))
+        .all(),
+        dtype=int64
+    ).reshape(-1, 2)
+    mutations = (
+        db.session.query(Mutation.id, Mutation.protein_id, Mutation.position, Mutation.precomputed_is_ptm)
+        .filter(Mutation.is_confirmed == True)
+        .filter(Mutation.protein_id.between(first, last))
+        .all()
+    )
+    if not mutations:
+        return [], []
+
+    ids, proteins, positions, precomputed = map(array, zip(*mutations))
+    proteins = proteins.astype(int64)
+    positions = positions.astype(int64)
+
+    # encode (protein, position) pairs so that positions in different proteins are never close
+    longest = max(positions.max(), sites[:, 1].max() if len(sites) else 0)
+    stride = int(longest) + 2 * distance + 1
+
+    sites = sort(sites[:, 0] * stride + sites[:, 1])
+    encoded = proteins * stride + positions
+
+    left = searchsorted(sites, encoded - distance, side='left')
+    right = searchsorted(sites, encoded + distance, side='right')
+    is_ptm = right > left
+
+    known = array([value is not None for value in precomputed], dtype=bool)
+    previous = array([bool(value) for value in precomputed], dtype=bool)
+    outdated = ~known | (previous != is_ptm)
+
+    return ids[outdated & is_ptm].tolist(), ids[outdated & ~is_ptm].tolist()
+
+
 @simple_bio_importer(requires=[proteins_and_genes, *site_importers])
-def precompute_ptm_mutations():
-    print('Counting mutations...')
-    total = Mutation.query.filter_by(is_confirmed=True).count()
+def precompute_ptm_mutations(first_protein_id=None, last_protein_id=None, chunk_size=1000, processes=1):
+    """Precompute if the confirmed mutations are PTM-related (i.e. have a site within ±7 residues).
+
+    The proteins are processed in chunks (of `chunk_size` proteins each),
+    optionally by parallel worker processes; only the outdated values are
+    updated, in bulk. The changes are committed after each chunk, so an
+    interrupted run can be resumed by providing the range of the proteins
+    which are left to process.
+    """
+    proteins = db.session.query(Protein.id).order_by(Protein.id)
+    if first_protein_id is not None:
+        proteins = proteins.filter(Protein.id >= first_protein_id)
+    if last_protein_id is not None:
+        proteins = proteins.filter(Protein.id <= last_protein_id)
+
+    proteins_ids = [protein_id for protein_id, in proteins]
+    chunks = [
+        (chunk[0], chunk[-1])
+        for chunk in (
+            proteins_ids[start:start + chunk_size]
+            for start in range(0, len(proteins_ids), chunk_size)
+        )
+    ]
+
     mismatch = 0
-    for mutation in tqdm(Mutation.query.filter_by(is_confirmed=True), total=total):
-        pos = mutation.position
-        is_ptm_related = mutation.protein.has_sites_in_range(pos - 7, pos + 7)
-        if is_ptm_related != mutation.precomputed_is_ptm:
-            mismatch += 1
-            mutation.precomputed_is_ptm = is_ptm_related
+
+    with database_safe_imap(_ptm_status_of_mutations, chunks, processes) as results:
+
+        for (first, last), (ptm_related, not_ptm_related) in tqdm(zip(chunks, results), total=len(chunks)):
+            for ids, value in [(ptm_related, True), (not_ptm_related, False)]:
+                if ids:
+                    Mutation.query.filter(Mutation.id.in_(ids)).update(
+                        {Mutation.precomputed_is_ptm: value},
+                        synchronize_session=False
+                    )
+            db.session.commit()
+            mismatch += len(ptm_related) + len(not_ptm_related)
+
+    if mismatch:
+        DataVersion.bump(Mutation)
+        db.session.commit()
+
     print(f'Precomputed values of {mismatch} mutations has been computed and updated')
     return []
 
@@ -1457,3 +1542,82 @@ def sites_motifs(data=None):
         motif.generate_pseudo_logo(sequences)
 
     return new_motifs
+
+
+def _affected_motifs_of_mutations(mutations_ids):
+    """Find (mutation id, site id, motif id) triples of motifs broken by given mutations."""
+    mutations = (
+        Mutation.query
+        .filter(Mutation.id.in_(mutations_ids))
+        .options(
+            joinedload(Mutation.protein),
+            selectinload(Mutation.affected_sites).selectinload(Site.types).selectinload(SiteType.motifs)
+        )
+    )
+    return mutations_ids, [
+        (mutation.id, site.id, motif.id)
+        for mutation in mutations
+        for site, motif in mutation.find_broken_motifs()
+    ]
+
+
+@simple_bio_importer(requires=[sites_motifs, precompute_ptm_mutations])
+def precompute_affected_motifs(processes=1, chunk_size=1000):
+    """Precompute motifs affected by the confirmed mutations.
+
+    Only the PTM-proximal mutations can affect a motif; the remaining
+    ones are just marked as precomputed (and their affected motifs,
+    if any were found by a previous run, are removed). The motifs are
+    computed chunk by chunk (optionally in parallel processes) and
+    the rows of the previous run are replaced in bulk.
+    """
+    confirmed = Mutation.query.filter_by(is_confirmed=True)
+    not_ptm_related = confirmed.filter(Mutation.precomputed_is_ptm == False)
+
+    print('Marking mutations which are not PTM-proximal...')
+    AffectedMotif.query.filter(
+        AffectedMotif.mutation_id.in_(not_ptm_related.with_entities(Mutation.id).subquery())
+    ).delete(synchronize_session=False)
+    not_ptm_related.update(
+        {Mutation.were_affected_motifs_precomputed: True},
+        synchronize_session=False
+    )
+
+    ids = [
+        mutation_id
+        for mutation_id, in (
+            confirmed
+            .filter(Mutation.precomputed_is_ptm == True)
+            .with_entities(Mutation.id)
+            .order_by(Mutation.id)
+        )
+    ]
+    chunks = [ids[start:start + chunk_size] for start in range(0, len(ids), chunk_size)]
+
+    print(f'Computing affected motifs of {len(ids)} PTM-proximal mutations...')
+    affected_count = 0
+
+    with database_safe_imap(_affected_motifs_of_mutations, chunks, processes) as results:
+
+        for mutations_ids, rows in tqdm(results, total=len(chunks)):
+            # rows from a previous run are replaced
+            AffectedMotif.query.filter(
+                AffectedMotif.mutation_id.in_(mutations_ids)
+            ).delete(synchronize_session=False)
+            if rows:
+                db.session.bulk_insert_mappings(AffectedMotif, [
+                    {'mutation_id': mutation_id, 'site_id': site_id, 'motif_id': motif_id}
+                    for mutation_id, site_id, motif_id in rows
+                ])
+            Mutation.query.filter(Mutation.id.in_(mutations_ids)).update(
+                {Mutation.were_affected_motifs_precomputed: True},
+                synchronize_session=False
+            )
+            db.session.commit()
+            affected_count += len(rows)
+
+    DataVersion.bump(Mutation)
+    db.session.commit()
+
+    print(f'Found {affected_count} (mutation, affected motif) pairs')
+    return []
@@ -16,7 +16,7 @@ from imports.protein_data import kinase_mappings, proteins_and_genes
 # those should be moved somewhere else
 from imports.protein_data import get_preferred_gene_isoform
 from imports.sites.site_mapper import SiteMapper
-from models import KinaseGroup, Kinase, Protein, Site, SiteType, BioModel, SiteSource, Gene
+from models import KinaseGroup, Kinase, Protein, Site, SiteType, BioModel, SiteSource, Gene, DataVersion
 
 
 def show_warning(message, category, filename, lineno, file=None, line=None):
@@ -131,6 +131,9 @@ class SiteImporter(BioImporter):
 
         objects = self.load_sites(*args, **kwargs) + self.novel_site_types + [self.source]
 
+        # types, sources and kinases of the already known sites might have been updated in place
+        DataVersion.bump(Site)
+
         for issue, count in self.issues_counter.items():
             print(f'Encountered {count} issues: "{issue}".')
 
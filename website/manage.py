@@ -12,7 +12,10 @@ from database import bdb, get_engine
 from database import bdb_refseq
 from database import db
 from database.manage import remove_model, reset_relational_db
-from database.migrate import basic_auto_migrate_relational_db, set_foreign_key_checks, set_unique_checks, set_autocommit
+from database.migrate import (
+    basic_auto_migrate_relational_db, set_foreign_key_checks, set_unique_checks, set_autocommit,
+    migrate_protein_tracks_to_binary
+)
 from exports.protein_data import EXPORTERS
 from helpers.commands import CommandTarget
 from helpers.commands import argument
@@ -25,7 +28,7 @@ from imports.mappings import import_aminoacid_mutation_refseq_mappings
 from imports.mappings import import_genome_proteome_mappings
 from imports.mutations import MutationImportManager, MutationImporter
 from imports.mutations import get_proteins
-from models import Model
+from models import Model, Protein
 
 
 muts_import_manager = MutationImportManager()
@@ -47,10 +50,38 @@ def calc_statistics(args, app=None):
         for store_name in args.groups:
             store_class = stores_map[store_name]
             store = store_class()
-            store.calc_all(limit_to=args.limit_to)
+            store.calc_all(limit_to=args.limit_to, processes=args.processes, only_stale=args.only_stale)
         db.session.commit()
 
 
+def prewarm_cache(args, app=None):
+    from tqdm import tqdm
+
+    if not app:
+        app = create_app(config_override={**CONFIG, 'LOAD_VIEWS': True})
+
+    if not app.config.get('REPRESENTATION_CACHE_PATH'):
+        print(
+            'REPRESENTATION_CACHE_PATH is not set: the prewarmed representations'
+            ' would be kept in memory of this process only.'
+        )
+        return
+
+    with app.app_context():
+        from models import Protein
+        from website.views.sequence import SequenceViewFilters, cached_sequence_representation
+
+        query = Protein.query.filter(Protein.is_preferred_isoform)
+        if args.refseqs:
+            query = query.filter(Protein.refseq.in_(args.refseqs))
+
+        for protein in tqdm(query.all()):
+            with app.test_request_context(f'/sequence/representation_data/{protein.refseq}'):
+                filter_manager = SequenceViewFilters(protein, custom_datasets_ids=[])
+                cached_sequence_representation(protein, filter_manager)
+            db.session.expunge_all()
+
+
 def automigrate(args, app=None):
     if not app:
         app = create_app(config_override=CONFIG)
@@ -118,7 +149,8 @@ class CMS(CommandTarget, ImportersMixin):
 
 class ProteinRelated(CommandTarget, ImportersMixin):
 
-    import_manager = ImportManager(BioImporter, ignore=MutationImporter.subclassess)
+    # protein-related imports invalidate the data cached by the application (see DataVersion)
+    import_manager = ImportManager(BioImporter, ignore=MutationImporter.subclassess, revised_models=[Protein])
     description = (
         'should chosen by the User part of biological database'
         'be {command}ed'
@@ -126,12 +158,50 @@ class ProteinRelated(CommandTarget, ImportersMixin):
 
     @command
     def load(self, args):
-        self.import_manager.import_selected(args.importers)
+        self.import_manager.import_selected(
+            args.importers,
+            processes=args.processes,
+            first_protein_id=args.first_protein_id,
+            last_protein_id=args.last_protein_id
+        )
 
     @load.argument
     def importers(self):
         return self.importers_choice(self.import_manager.importers_by_name)
 
+    @load.argument
+    def processes(self):
+        return argument_parameters(
+            '--processes',
+            type=int,
+            default=None,
+            help=(
+                'Number of worker processes for the importers which support parallel processing'
+                ' (e.g. precompute_ptm_mutations). By default a single process is used.'
+            )
+        )
+
+    @load.argument
+    def first_protein_id(self):
+        return argument_parameters(
+            '--first_protein_id',
+            type=int,
+            default=None,
+            help=(
+                'Start from the protein with given id; allows to resume an interrupted run'
+                ' of the importers which support it (e.g. precompute_ptm_mutations).'
+            )
+        )
+
+    @load.argument
+    def last_protein_id(self):
+        return argument_parameters(
+            '--last_protein_id',
+            type=int,
+            default=None,
+            help='Stop at the protein with given id (inclusive); see --first_protein_id.'
+        )
+
     @command
     def export(self, args):
         exporters = EXPORTERS
@@ -172,6 +242,21 @@ class ProteinRelated(CommandTarget, ImportersMixin):
             help='A path(s) for export file(s)',
         )
 
+    @command
+    def update(self, args):
+        print('Migrating disorder and conservation of proteins to the binary format...')
+        converted = migrate_protein_tracks_to_binary(batch_size=args.batch_size)
+        print(f'Migration of protein tracks completed; {converted} proteins were converted.')
+
+    @update.argument
+    def batch_size(self):
+        return argument_parameters(
+            '--batch_size',
+            type=int,
+            default=1000,
+            help='How many proteins should be converted in a single transaction'
+        )
+
     @command
     def remove_all(self, args):
         reset_relational_db(current_app, bind='bio')
@@ -264,6 +349,21 @@ class Mappings(CommandTarget):
             help='A path to dir where mappings dbs should be created'
         )
 
+    @command
+    def update(self, args):
+        print('Migrating genome-proteome mappings to the binary format...')
+        converted = bdb.migrate_to_binary(batch_size=args.batch_size)
+        print(f'Migration of mappings completed; {converted} values were converted.')
+
+    @update.argument
+    def batch_size(self):
+        return argument_parameters(
+            '--batch_size',
+            type=int,
+            default=100000,
+            help='How many values should be converted in a single transaction'
+        )
+
     @command
     def remove(self, args):
         print('Removing mappings database...')
@@ -366,6 +466,33 @@ class Mutations(CommandTarget):
             help='Limit import to n-th chunk, starts with 0. By default None.'
         )
 
+    @load.argument
+    def preload_mutations(self):
+        return argument_parameters(
+            '-p',
+            '--preload_mutations',
+            action='store_true',
+            help=(
+                'Bulk-load identifiers of existing mutations into memory before the import,'
+                ' instead of querying the database for every parsed mutation.'
+                ' Requires more memory, but is much faster for large imports.'
+            )
+        )
+
+    @load.argument
+    def processes(self):
+        return argument_parameters(
+            '-n',
+            '--processes',
+            type=int,
+            default=None,
+            help=(
+                'Number of processes used to parse chunks in parallel,'
+                ' for importers supporting chunked, parallel parsing (e.g. mimp).'
+                ' By default chunks are parsed sequentially.'
+            )
+        )
+
     @load.argument
     def disable_constraints(self):
         return argument_parameters(
@@ -526,6 +653,24 @@ def create_parser():
         default=None
     )
 
+    calc_stats.add_argument(
+        '-p',
+        '--processes',
+        type=int,
+        default=1,
+        help='number of processes to calculate the statistics in'
+    )
+
+    calc_stats.add_argument(
+        '-s',
+        '--only_stale',
+        action='store_true',
+        help=(
+            'recalculate only the statistics which depend on data changed since'
+            ' the last calculation (or which do not declare their dependencies)'
+        )
+    )
+
     shell_parser = new_subparser(
         subparsers,
         'shell',
@@ -567,6 +712,24 @@ def create_parser():
         default='png'
     )
 
+    prewarm_parser = new_subparser(
+        subparsers,
+        'prewarm_cache',
+        prewarm_cache,
+        help=(
+            'prepare (cache) representations of preferred isoforms'
+            ' for the sequence view, using default filters'
+        )
+    )
+
+    prewarm_parser.add_argument(
+        '-r',
+        '--refseqs',
+        type=str,
+        nargs='*',
+        help='limit to proteins with given refseq identifiers'
+    )
+
     migrate_parser = new_subparser(
         subparsers,
         'migrate',
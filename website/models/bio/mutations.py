@@ -14,8 +14,8 @@ from database.types import ScalarSet
 from helpers.models import generic_aggregator
 
 from .diseases import ClinicalData
-from .model import BioModel, make_association_table
-from .sites import Site, SiteMotif
+from .model import BioModel
+from .sites import Site, SiteMotif, SitesIndex
 
 
 class MutationDetailsManager(UserList, metaclass=ABCMeta):
@@ -769,45 +769,74 @@ source_manager = Sources([
 ])
 
 
+class AffectedMotif(BioModel):
+    """Motif of a site broken by a mutation, as precomputed by `precompute_affected_motifs`."""
+
+    mutation_id = db.Column(db.Integer, db.ForeignKey('mutation.id', ondelete='cascade'), index=True)
+    site_id = db.Column(db.Integer, db.ForeignKey(Site.id, ondelete='cascade'))
+    motif_id = db.Column(db.Integer, db.ForeignKey(SiteMotif.id, ondelete='cascade'))
+
+    site = db.relationship(Site)
+    motif = db.relationship(SiteMotif)
+
+
 class MutatedMotifs:
 
     were_affected_motifs_precomputed = db.Column(db.Boolean, default=False)
 
     @declared_attr
     def precomputed_affected_motifs(self):
-        mutation_motif_table = make_association_table(f'{self.__tablename__}.id', SiteMotif.id)
-        return db.relationship(
-            SiteMotif,
-            secondary=mutation_motif_table,
-            collection_class=set,
-            backref='mutations'
-        )
+        return db.relationship(AffectedMotif, order_by=AffectedMotif.id)
 
     def affected_motifs(self, sites: Iterable[Site]=None):
+        """Find motifs of the (given or all affected) sites which are broken by this mutation.
+
+        Returns:
+            list of (motif, position of the mutation relative to the motif) tuples
+        """
         if self.were_affected_motifs_precomputed:
-            return self.precomputed_affected_motifs
+            return [
+                (affected.motif, self.position - affected.site.position + 7)
+                for affected in self.precomputed_affected_motifs
+                if not sites or affected.site in sites
+            ]
+
+        return [
+            (motif, self.position - site.position + 7)
+            for site, motif in self.find_broken_motifs(sites)
+        ]
 
-        from analyses.motifs import mutate_sequence
-        from analyses.motifs import has_motif
+    def find_broken_motifs(self, sites: Iterable[Site]=None):
+        """Find (site, motif) pairs of motifs of the (given or all affected) sites broken by this mutation."""
+        from analyses.motifs import compile_motif, substitute
 
-        affected_motifs = []
+        broken_motifs = []
 
         if not sites:
             sites = self.affected_sites
 
         for site in sites:
+            # the window of the site and its mutated version are computed once for all the motifs
+            sequence = site.sequence
+            relative_position = self.position - site.position + 7
+            mutated_sequence = None
+
             for site_type in site.types:
 
                 for motif in site_type.motifs:
 
-                    if site.has_motif(motif.pattern):
-                        # todo: make it a method of mutation? "self.mutate_sequence()" ?
+                    pattern = compile_motif(motif.pattern)
+
+                    if pattern.match(sequence):
 
-                        mutated_sequence = mutate_sequence(site, self, offset=7)
-                        if not has_motif(mutated_sequence, motif.pattern):
-                            affected_motifs.append((motif, self.position - site.position + 7))
+                        if mutated_sequence is None:
+                            assert sequence[relative_position] == self.ref
+                            mutated_sequence = substitute(sequence, relative_position, self.alt)
 
-        return affected_motifs
+                        if not pattern.search(mutated_sequence):
+                            broken_motifs.append((site, motif))
+
+        return broken_motifs
 
 
 class Mutation(BioModel, MutatedMotifs):
@@ -956,51 +985,16 @@ class Mutation(BioModel, MutatedMotifs):
         # otherwise it's a novel mutation - let's check proximity
         return self.is_close_to_some_site(7, 7)
 
-    def get_affected_ptm_sites(self, site_filter=lambda x: x):
+    def get_affected_ptm_sites(self, site_filter=None):
         """Get PTM sites that might be affected by this mutation,
 
         when taking into account -7 to +7 spans of each PTM site.
         """
-        sites = site_filter(self.protein.sites)
-        pos = self.position
-        a = 0
-        b = len(sites)
-        sites_affected = set()
-
-        while a != b:
-            pivot = (b - a) // 2 + a
-            site_pos = sites[pivot].position
-            if site_pos - 7 <= pos <= site_pos + 7:
-                hit = pivot
-                sites_affected.add(sites[pivot])
-                break
-            if pos > site_pos:
-                a = pivot + 1
-            else:
-                b = pivot
+        if site_filter is None:
+            index = self.protein.sites_index
         else:
-            return tuple()
-
-        def cond():
-            try:
-                site_pos = sites[pivot].position
-                return site_pos - 7 <= pos <= site_pos + 7
-            except IndexError:
-                return tuple()
-
-        # go to right from found site, check if there is more overlapping sites
-        pivot = hit + 1
-        while cond():
-            sites_affected.add(sites[pivot])
-            pivot += 1
-
-        # and then go to the left
-        pivot = hit - 1
-        while cond():
-            sites_affected.add(sites[pivot])
-            pivot -= 1
-
-        return sorted(sites_affected, key=lambda site: site.position)
+            index = SitesIndex.from_sites(site_filter(self.protein.sites))
+        return index.close_sites(self.position, 7, 7)
 
     def impact_on_specific_ptm(self, site: Site, ignore_mimp=False):
         if self.position == site.position:
@@ -1016,13 +1010,18 @@ class Mutation(BioModel, MutatedMotifs):
         else:
             return 'none'
 
-    def impact_on_ptm(self, site_filter=None):
+    def impact_on_ptm(self, site_filter=None, affected_sites=None):
         """How intense might be an impact of the mutation on a PTM site.
 
         It describes impact on the closest PTM site or on a site chosen by
         MIMP algorithm (so it applies only when 'network-rewiring' is returned)
+
+        If (already filtered) affected sites are known, these can be passed
+        as `affected_sites` and the `site_filter` will not be used.
         """
-        if site_filter is None:
+        if affected_sites is not None:
+            sites = affected_sites
+        elif site_filter is None:
             sites = self.sites
         else:
             sites = site_filter(self.sites)
@@ -1041,22 +1040,7 @@ class Mutation(BioModel, MutatedMotifs):
 
     def find_closest_sites(self, distance=7, site_filter=lambda x: x):
         # TODO: implement site type filter
-        pos = self.position
-
-        sites = Site.query.filter(
-            and_(
-                Site.protein_id == self.protein_id,
-                Site.position.between(pos - distance, pos + distance)
-            )
-        ).order_by(func.abs(Site.position - pos)).limit(2).all()
-
-        if(
-            len(sites) == 2 and
-            abs(sites[0].position - pos) != abs(sites[1].position - pos)
-        ):
-            return sites[:1]
-        else:
-            return sites
+        return self.protein.sites_index.closest_sites(self.position, distance)
 
     @hybrid_method
     def is_close_to_some_site(self, left, right, sites=None):
@@ -1065,25 +1049,12 @@ class Mutation(BioModel, MutatedMotifs):
         Arguments define span around each site to be checked:
         (site_pos - left, site_pos + right)
         site_pos is the position of a site
-
-        Algorithm is based on bisection and an assumption,
-        that sites are sorted by position in the database.
         """
         if sites is None:
-            sites = self.protein.sites
-        pos = self.position
-        a = 0
-        b = len(sites)
-        while a != b:
-            p = (b - a) // 2 + a
-            site_pos = sites[p].position
-            if site_pos - left <= pos <= site_pos + right:
-                return True
-            if pos > site_pos:
-                a = p + 1
-            else:
-                b = p
-        return False
+            index = self.protein.sites_index
+        else:
+            index = SitesIndex.from_sites(sites)
+        return index.is_close(self.position, left, right)
 
     @is_close_to_some_site.expression
     def is_close_to_some_site(self, left, right):
@@ -1,8 +1,13 @@
 from typing import List
 
+from numpy import (
+    array, column_stack, concatenate, diff, flatnonzero, float32, frombuffer, iinfo, int8, int16, isnan,
+    nan, ndarray, rint, uint8,
+)
 from sqlalchemy import select, case, exists, and_, func, distinct
 from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import validates
 from werkzeug.utils import cached_property
 
 from database import db, client_side_defaults, fast_count
@@ -10,7 +15,51 @@ from database import db, client_side_defaults, fast_count
 from .diseases import Cancer, Disease, ClinicalData
 from .model import BioModel, make_association_table
 from .mutations import Mutation, InheritedMutation
-from .sites import Site
+from .sites import Site, SitesIndex, protein_sites_index
+
+
+# conservation scores are quantised to hundredths (the precision of the text
+# representation) and stored as little-endian, signed 16-bit integers
+CONSERVATION_SCALE = 100
+CONSERVATION_MISSING = iinfo(int16).min
+conservation_dtype = '<i2'
+
+# disorder regions are stored as (1-based start, length) pairs of unsigned 32-bit integers
+disorder_dtype = '<u4'
+
+
+def encode_conservation(conservation: str) -> bytes:
+    """Quantise semicolon-separated conservation scores into the binary track."""
+    if conservation is None:
+        return None
+    if not conservation:
+        return b''
+    scores = array([float(score or 0) for score in conservation.split(';')])
+    quantised = rint(scores * CONSERVATION_SCALE).clip(CONSERVATION_MISSING + 1, iinfo(int16).max)
+    quantised[isnan(scores)] = CONSERVATION_MISSING
+    return quantised.astype(conservation_dtype).tobytes()
+
+
+def decode_conservation(track: bytes) -> ndarray:
+    quantised = frombuffer(track, dtype=conservation_dtype)
+    scores = quantised.astype(float32) / CONSERVATION_SCALE
+    scores[quantised == CONSERVATION_MISSING] = nan
+    return scores
+
+
+def encode_disorder(disorder_map: str) -> bytes:
+    """Run-length encode the binary disorder map into (start, length) pairs of disordered regions."""
+    if disorder_map is None:
+        return None
+    is_disordered = frombuffer(disorder_map.encode(), dtype=uint8) == ord('1')
+    # the boundaries of regions are where the disorder status changes
+    changes = flatnonzero(diff(concatenate([[0], is_disordered.view(int8), [0]])))
+    starts, ends = changes[::2], changes[1::2]
+    return column_stack([starts + 1, ends - starts]).astype(disorder_dtype).tobytes()
+
+
+def decode_disorder(track: bytes) -> List[List[int]]:
+    return frombuffer(track, dtype=disorder_dtype).reshape(-1, 2).tolist()
 
 
 class EnsemblPeptide(BioModel):
@@ -126,8 +175,15 @@ class Protein(BioModel):
     # should be no longer than the sequence (defined above)
     disorder_map = db.Column(db.Text, default='')
 
-    # conservation scores as defined by PhyloP - a semicolon separated list
-    conservation = db.Column(db.Text, default='')
+    # disordered regions, run-length encoded from disorder_map (see `disorder_regions`)
+    disorder_track = db.Column(db.LargeBinary(length=2 ** 24))
+
+    # conservation scores as defined by PhyloP - a semicolon separated list;
+    # not loaded by default, as `conservation_scores` use the binary track
+    conservation = db.deferred(db.Column(db.Text, default=''))
+
+    # conservation scores quantised to hundredths (see `conservation_scores`)
+    conservation_track = db.Column(db.LargeBinary(length=2 ** 24))
 
     # transcription start/end coordinates
     tx_start = db.Column(db.Integer)
@@ -168,6 +224,30 @@ class Protein(BioModel):
     def __repr__(self):
         return f'<Protein {self.refseq} with seq of {self.length} aa from {self.gene.name if self.gene else "-"} gene>'
 
+    @validates('disorder_map')
+    def validate_disorder_map(self, key, disorder_map):
+        self.disorder_track = encode_disorder(disorder_map)
+        return disorder_map
+
+    @validates('conservation')
+    def validate_conservation(self, key, conservation):
+        self.conservation_track = encode_conservation(conservation)
+        return conservation
+
+    def update_tracks(self):
+        """Re-encode binary tracks from the text representation of disorder and conservation."""
+        self.disorder_track = encode_disorder(self.disorder_map)
+        self.conservation_track = encode_conservation(self.conservation)
+
+    @cached_property
+    def conservation_scores(self) -> ndarray:
+        """Per-residue conservation scores (NaN where unknown); empty if there are no scores."""
+        track = self.conservation_track
+        if track is None:
+            # the track was not migrated yet
+            track = encode_conservation(self.conservation) or b''
+        return decode_conservation(track)
+
     @hybrid_property
     def has_ptm_mutations(self):
         # TODO
@@ -303,7 +383,7 @@ class Protein(BioModel):
     @cached_property
     def disorder_length(self):
         """How many residues are disordered."""
-        return self.disorder_map.count('1')
+        return sum(length for start, length in self.disorder_regions)
 
     @cached_property
     def disorder_regions(self):
@@ -312,22 +392,11 @@ class Protein(BioModel):
         Each span is represented by a tuple: (start, length).
         The coordinates are 1-based.
         """
-
-        disorder_regions = []
-        inside_region = False
-
-        for i in range(len(self.disorder_map)):
-            residue = int(self.disorder_map[i])
-            if inside_region:
-                if not residue:
-                    inside_region = False
-                    disorder_regions[-1][1] = i - disorder_regions[-1][0]
-            else:
-                if residue:
-                    disorder_regions += [[i + 1, 1]]
-                    inside_region = True
-
-        return disorder_regions
+        track = self.disorder_track
+        if track is None:
+            # the track was not migrated yet
+            track = encode_disorder(self.disorder_map or '')
+        return decode_disorder(track)
 
     @hybrid_property
     def kinases(self):
@@ -364,27 +433,21 @@ class Protein(BioModel):
     def would_affect_any_sites(self, mutation_pos):
         return mutation_pos in self.sites_affecting_positions
 
-    def has_sites_in_range(self, left, right):
-        """Test if there are any sites in given range defined as <left, right>, inclusive.
+    @property
+    def sites_index(self) -> SitesIndex:
+        """Sorted positions of sites of this protein, for proximity queries.
 
-        Algorithm is based on bisection and an assumption,
-        that sites are sorted by position in the database.
+        The index is cached per protein (until sites are added or removed)
+        so it does not require the sites collection to be loaded.
         """
-        assert left < right
-
-        sites = self.sites
-
-        for i, site in enumerate(sites):
-            if site.position >= left:
-                start = i
-                break
-        else:
-            return False
+        if self.id is None:
+            return SitesIndex.from_sites(self.sites)
+        return protein_sites_index(self.id)
 
-        for i, site in enumerate(reversed(sites)):
-            if site.position <= right:
-                return start <= len(sites) - i - 1
-        return False
+    def has_sites_in_range(self, left, right):
+        """Test if there are any sites in given range defined as <left, right>, inclusive."""
+        assert left < right
+        return self.sites_index.has_any_in_range(left, right)
 
     @property
     def disease_names_by_id(self):
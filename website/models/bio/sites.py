@@ -5,7 +5,8 @@ from pathlib import Path
 from sys import float_info
 from typing import List
 
-from sqlalchemy import func, case
+from numpy import argsort, asarray, int32, int64
+from sqlalchemy import func, case, event
 from sqlalchemy.ext.hybrid import hybrid_property, hybrid_method
 
 from database import db, client_side_defaults
@@ -14,6 +15,7 @@ from database.types import ScalarSet
 from exceptions import ValidationError
 from helpers.plots import sequence_logo
 
+from ..cms import DataVersion
 from .model import BioModel, make_association_table
 
 
@@ -244,7 +246,7 @@ class Site(BioModel):
         )
         left_padding = func.substr('-------', 1, greatest(-left, 0))
         right_padding = func.substr('-------', 1, greatest(
-            cls.position + 8 - func.length(Protein.sequence), 0)
+            cls.position + 7 - func.length(Protein.sequence), 0)
         )
         return left_padding.concat(sequence).concat(right_padding)
 
@@ -356,6 +358,131 @@ class Site(BioModel):
         return data
 
 
+class SitesIndex:
+    """Sorted positions of PTM sites of a single protein.
+
+    Proximity queries are answered by bisection over a compact vector
+    of positions (rather than over the ORM objects); the Site objects
+    are only retrieved for the sites which are actually matched.
+
+    A site at position `p` is considered close to a position `x` if
+    `p - left <= x <= p + right` (i.e. `x - right <= p <= x + left`).
+    """
+
+    def __init__(self, positions, ids, sites=None):
+        order = argsort(positions, kind='stable')
+        self.positions = asarray(positions, dtype=int32)[order]
+        self.ids = asarray(ids, dtype=int64)[order] if sites is None else None
+        self.sites = [sites[i] for i in order] if sites is not None else None
+
+    @classmethod
+    def from_sites(cls, sites: List['Site']):
+        """Build a transient index for given (possibly filtered) Site objects."""
+        return cls([site.position for site in sites], None, sites=sites)
+
+    @classmethod
+    def from_database(cls, protein_id: int):
+        rows = (
+            db.session.query(Site.position, Site.id)
+            .filter(Site.protein_id == protein_id)
+            .all()
+        )
+        return cls([position for position, site_id in rows], [site_id for position, site_id in rows])
+
+    def __len__(self):
+        return len(self.positions)
+
+    def bounds(self, positions, left, right):
+        """Return (starts, ends) slices of sites close to each of given positions."""
+        positions = asarray(positions)
+        starts = self.positions.searchsorted(positions - right, side='left')
+        ends = self.positions.searchsorted(positions + left, side='right')
+        return starts, ends
+
+    def is_close(self, position: int, left: int, right: int) -> bool:
+        start, end = self.bounds(position, left, right)
+        return bool(end > start)
+
+    def are_close(self, positions, left: int, right: int):
+        """Batch version of `is_close`: returns a vector of booleans."""
+        starts, ends = self.bounds(positions, left, right)
+        return ends > starts
+
+    def has_any_in_range(self, left: int, right: int) -> bool:
+        """Test if there are any sites in <left, right> range, inclusive."""
+        return self.is_close(left, right - left, 0)
+
+    def close_sites(self, position: int, left: int, right: int) -> List['Site']:
+        start, end = self.bounds(position, left, right)
+        return self.resolve(range(start, end))
+
+    def close_sites_many(self, positions, left: int, right: int) -> List[List['Site']]:
+        """Batch version of `close_sites`, retrieving matched sites at once."""
+        starts, ends = self.bounds(positions, left, right)
+        slices = [range(start, end) for start, end in zip(starts.tolist(), ends.tolist())]
+        sites = self.resolve([i for indices in slices for i in indices])
+
+        close_sites = []
+        offset = 0
+        for indices in slices:
+            close_sites.append(sites[offset:offset + len(indices)])
+            offset += len(indices)
+        return close_sites
+
+    def closest_sites(self, position: int, distance: int) -> List['Site']:
+        """Return the site closest to the position (or both if there is a tie
+        between the two closest sites), considering only sites within the distance.
+        """
+        start, end = self.bounds(position, distance, distance)
+        distances = abs(self.positions[start:end] - position)
+        closest = distances.argsort(kind='stable')[:2]
+        if len(closest) == 2 and distances[closest[0]] != distances[closest[1]]:
+            closest = closest[:1]
+        return self.resolve(start + closest)
+
+    def resolve(self, indices) -> List['Site']:
+        """Retrieve the sites at given indices, with a single query."""
+        if self.sites is not None:
+            return [self.sites[i] for i in indices]
+        ids = [int(self.ids[i]) for i in indices]
+        if not ids:
+            return []
+        by_id = {
+            site.id: site
+            for site in Site.query.filter(Site.id.in_(set(ids)))
+        }
+        # sites removed since the index was built are skipped
+        return [by_id[site_id] for site_id in ids if site_id in by_id]
+
+
+@lru_cache(maxsize=4096)
+def _protein_sites_index(protein_id: int, revision: str) -> SitesIndex:
+    return SitesIndex.from_database(protein_id)
+
+
+cache_store.append(_protein_sites_index)
+
+
+def protein_sites_index(protein_id: int) -> SitesIndex:
+    """Get cached index of sites of given protein.
+
+    The indices are cached per revision of sites, so that an import
+    of sites (bumping the revision) invalidates indices cached by all
+    processes, not only by the one which performed the import.
+    """
+    revision, = DataVersion.current_revisions([Site])
+    return _protein_sites_index(protein_id, revision)
+
+
+def invalidate_sites_indices(*args):
+    """Discard cached indices of sites, e.g. after addition of new sites in this process."""
+    _protein_sites_index.cache_clear()
+
+
+for sites_change in ['after_insert', 'after_update', 'after_delete']:
+    event.listen(Site, sites_change, invalidate_sites_indices)
+
+
 class SiteMotif(BioModel):
     name = db.Column(db.String(32))
     pattern = db.Column(db.String(32))
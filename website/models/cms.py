@@ -17,6 +17,7 @@ from database import db, update
 from database.types import MediumPickle, DataFrameStore
 from database.functions import utc_now, utc_days_after
 from exceptions import ValidationError
+from helpers.cache import TieredCache
 from .model import Model
 
 
@@ -53,6 +54,66 @@ class VennDiagram(CMSModel):
     value = db.Column(db.PickleType)
 
 
+# revisions recently read by this process, see DataVersion.current_revisions
+revisions_cache = TieredCache(max_size=256, ttl=10)
+
+
+class DataVersion(CMSModel):
+    """Version of the data which a stored statistic (count, plot, etc) was computed from.
+
+    The name is composed of the store name and the counter name, the version
+    is a fingerprint of all the models which the counter depends on.
+    """
+    name = db.Column(db.String(254), unique=True)
+    version = db.Column(db.Text)
+
+    @staticmethod
+    def revision_name(model):
+        return f'revision:{model.__tablename__}'
+
+    @classmethod
+    def bump(cls, *models):
+        """Record that the data of given models changed in place.
+
+        Bulk updates keep the count and the identifiers of the rows intact,
+        so these have to be announced explicitly to invalidate statistics
+        and representations computed from the data of such models.
+        """
+        for model in models:
+            name = cls.revision_name(model)
+            revision = cls.query.filter_by(name=name).first()
+            if not revision:
+                revision = cls(name=name, version='0')
+                db.session.add(revision)
+            revision.version = str(int(revision.version) + 1)
+        revisions_cache.clear()
+
+    @classmethod
+    def revisions(cls, models) -> dict:
+        """Get revisions (bumped with each in-place change) of given models."""
+        names = {cls.revision_name(model): model for model in models}
+        stored = dict(
+            db.session.query(cls.name, cls.version).filter(cls.name.in_(names.keys()))
+        )
+        return {
+            model: stored.get(name, '0')
+            for name, model in names.items()
+        }
+
+    @classmethod
+    def current_revisions(cls, models) -> tuple:
+        """Revisions of given models (in order), re-read at most every few seconds.
+
+        Suitable for frequent checks whether the data cached by a long-running
+        process (e.g. a web or Celery worker) were changed by another process.
+        """
+        models = tuple(models)
+        return revisions_cache.get_or_create(
+            tuple(model.__tablename__ for model in models),
+            lambda: tuple(cls.revisions(models)[model] for model in models)
+        )
+
+
 class BadWord(CMSModel):
     """Model for words which should be filtered out"""
 
@@ -1,6 +1,6 @@
 from collections import defaultdict
 from operator import attrgetter
-from typing import List
+from typing import List, Tuple
 
 from werkzeug.datastructures import FileStorage
 
@@ -15,7 +15,7 @@ from .protein_mutations import get_protein_muts
 
 class MutationSearch:
 
-    def __init__(self, vcf_file=None, text_query=None, filter_manager=None):
+    def __init__(self, vcf_file=None, text_query=None, filter_manager=None, vcf_chunk_size=1000):
         """Performs search for known and novel mutations from provided VCF file and/or text query.
 
         Stop codon mutations are not considered.
@@ -27,6 +27,8 @@ class MutationSearch:
                  - a protein mutation (e.g. STAT6 W737C)
                 Entries from both VCF file and text input will be merged.
             filter_manager: FilterManager instance used to filter out unwanted mutations
+            vcf_chunk_size: number of VCF lines to be resolved together, using
+                batched genomic mappings lookup, filtering and progress update
         """
         self.query = ''
         self.results = {}
@@ -36,6 +38,7 @@ class MutationSearch:
         self.hidden_results_cnt = 0
         self._progress = 0
         self._total = 0
+        self.vcf_chunk_size = vcf_chunk_size
         if vcf_file:
             if type(vcf_file) is FileStorage:
                 # as bad as it can be, but usually the vcf file will be a list of lines already
@@ -67,8 +70,8 @@ class MutationSearch:
         # like filter_manager so any instance of this class can be pickled.
         self.data_filter = None
 
-    def progress(self):
-        self._progress += 1
+    def progress(self, step=1):
+        self._progress += step
         if celery.current_task:
             celery.current_task.update_state(
                 state='PROGRESS',
@@ -79,11 +82,26 @@ class MutationSearch:
 
         self.progress()
 
+        if items:
+            filtered_items = self.data_filter(items)
+        else:
+            filtered_items = []
+
+        return self.add_filtered_items(items, filtered_items, query_line)
+
+    def add_filtered_items(self, items: List[SearchResult], filtered_items: List[SearchResult], query_line: str):
+        """Store results for given query line, once the filters were already applied.
+
+        Args:
+            items: all results found for the query line
+            filtered_items: results which passed the filters
+            query_line: the query line
+        """
         if not items:
             self.without_mutations.append(query_line)
             return False
 
-        items = self.data_filter(items)
+        items = filtered_items
 
         if not items:
             self.hidden_results_cnt += 1
@@ -107,8 +125,17 @@ class MutationSearch:
             self.results[query_line] = items
 
     def parse_vcf(self, vcf_file):
+        """Parse VCF file in chunks of `vcf_chunk_size` lines.
+
+        Mappings for all variants from a chunk are retrieved with a single
+        batched lookup; filters are applied and the progress is reported
+        once per chunk.
+        """
+        chunk = []
+        lines_in_chunk = 0
 
         for line in vcf_file:
+            lines_in_chunk += 1
             line = line.strip()
             if line.startswith('#') or line.startswith('Chr	Start'):
                 continue
@@ -125,20 +152,41 @@ class MutationSearch:
             if chrom.startswith('chr'):
                 chrom = chrom[3:]
 
-            alts = alts.split(',')
-            for alt in alts:
-
-                items = bdb.get_genomic_muts(chrom, pos, ref, alt)
-
-                chrom = 'chr' + chrom
-                parsed_line = ' '.join((chrom, pos, ref, alt)) + '\n'
-
-                self.add_mutation_items(items, parsed_line)
+            for alt in alts.split(','):
 
                 # we don't have queries in our format for vcf files:
                 # those need to be built this way
+                parsed_line = ' '.join(('chr' + chrom, pos, ref, alt)) + '\n'
                 self.query += parsed_line
 
+                chunk.append(((chrom, pos, ref, alt), parsed_line))
+
+            if lines_in_chunk >= self.vcf_chunk_size:
+                self.add_vcf_chunk(chunk, lines_in_chunk)
+                chunk = []
+                lines_in_chunk = 0
+
+        self.add_vcf_chunk(chunk, lines_in_chunk)
+
+    def add_vcf_chunk(self, chunk: List[Tuple[Tuple[str, str, str, str], str]], lines_count: int):
+        """Resolve and store results for a chunk of (snv, query line) tuples."""
+        items_by_snv = bdb.get_genomic_muts_many(snv for snv, parsed_line in chunk)
+
+        all_items = [
+            item
+            for items in items_by_snv.values()
+            for item in items
+        ]
+        accepted = set(map(id, self.data_filter(all_items))) if all_items else set()
+
+        for snv, parsed_line in chunk:
+            items = items_by_snv[snv]
+            filtered_items = [item for item in items if id(item) in accepted]
+            self.add_filtered_items(items, filtered_items, parsed_line)
+
+        if lines_count:
+            self.progress(step=lines_count)
+
     def parse_text(self, text_query):
         complement_prefix = 'Complement of '
 
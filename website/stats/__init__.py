@@ -3,6 +3,7 @@ from collections import defaultdict, Counter
 from flask import current_app
 
 from .plots import Plots, Datasets
+from .store import LazyStore
 from .stats import Statistics
 from .venn import VennDiagrams
 
@@ -39,12 +40,24 @@ def hypermutated_samples(path, sample_column: int, threshold=900):
 store_classes = [Statistics, VennDiagrams, Plots, Datasets]
 
 
+def lazy_store(store_class) -> LazyStore:
+    return LazyStore(lambda: store_class().get_all())
+
+
+def preload_stores():
+    """Load values of all the stores at once (e.g. before forking the workers)."""
+    for store in STORES.values():
+        store.preload()
+
+
 if current_app.config['LOAD_STATS']:
-    print('Loading statistics')
     STORES = {
-        counter.__name__: counter().get_all()
-        for counter in store_classes
+        store_class.__name__: lazy_store(store_class)
+        for store_class in store_classes
     }
+    if current_app.config.get('PRELOAD_STATS'):
+        print('Loading statistics')
+        preload_stores()
 else:
     print('Skipping loading statistics')
     STORES = defaultdict(dict)
@@ -8,14 +8,14 @@ import models
 from database import db, fast_count
 from models import Mutation, are_details_managed, MC3Mutation, source_manager, MutationSource, UserUploadedMutation
 
-from .store import counter
+from .store import counter, depends_on
 from .store.store import CountStore
 
 
 def models_counter(model, name=None):
     def count(self):
         return self.count(model)
-    return counter(count, name)
+    return counter(count, name, depends_on=[model])
 
 
 def mutations_counter(func):
@@ -93,7 +93,9 @@ class Statistics(CountStore):
                 print(source)
                 return self.count_by_sources([source])
 
-            self.register(counter(partial(muts_counter, source=source_model), name=name))
+            self.register(
+                counter(partial(muts_counter, source=source_model), name=name, depends_on=[source_model])
+            )
 
         for source_model in filter(lambda model: are_details_managed(model), source_manager.all):
             name = f'mutations_{source_model.name}_annotations'
@@ -103,17 +105,20 @@ class Statistics(CountStore):
             )
 
     @mutations_counter
+    @depends_on(Mutation)
     def all(self):
         """Either confirmed or not."""
         return self.count(Mutation)
 
     @mutations_counter
+    @depends_on(Mutation, *source_manager.confirmed)
     def all_confirmed(self):
         return Mutation.query.filter_by(
             is_confirmed=True
         ).count()
 
     @mutations_counter
+    @depends_on(Mutation, models.Site, *source_manager.confirmed)
     def confirmed_in_ptm_sites(self):
         return Mutation.query.filter_by(
             is_confirmed=True,
@@ -121,6 +126,7 @@ class Statistics(CountStore):
         ).count()
 
     @mutations_counter
+    @depends_on(Mutation, models.MIMPMutation, *source_manager.confirmed)
     def confirmed_with_mimp(self):
         return Mutation.query.filter(
             and_(
@@ -166,10 +172,12 @@ class Statistics(CountStore):
         )
 
     @counter
+    @depends_on(models.Protein)
     def proteins(self):
         return self.count(models.Protein)
 
     @counter
+    @depends_on(models.Site, models.SiteType)
     def glycosylations_with_subtype(self):
         from models import Site, SiteType
 
@@ -184,6 +192,7 @@ class Statistics(CountStore):
         return Site.query.filter(site_filter).count()
 
     @counter
+    @depends_on(models.Site, models.SiteType)
     def glycosylations_without_subtype_ratio(self):
         from models import Site, SiteType
         glycosylation = SiteType.query.filter_by(name='glycosylation').one()
@@ -209,14 +218,17 @@ class Statistics(CountStore):
         return self.count(models.MIMPMutation) + self.mappings()
 
     @counter
+    @depends_on(models.Kinase, models.Site)
     def kinases_covered(self):
         return fast_count(db.session.query(models.Kinase).filter(models.Kinase.sites.any()))
 
     @counter
+    @depends_on(models.KinaseGroup, models.Site)
     def kinase_groups_covered(self):
         return fast_count(db.session.query(models.KinaseGroup).filter(models.KinaseGroup.sites.any()))
 
     @counter
+    @depends_on(models.Kinase, models.KinaseGroup, models.Site)
     def interactions(self):
         return (
             fast_count(db.session.query(models.Site).join(models.Kinase, models.Site.kinases)) +
@@ -224,6 +236,7 @@ class Statistics(CountStore):
         )
 
     @counter
+    @depends_on(models.Kinase, models.KinaseGroup, models.Site)
     def proteins_covered(self):
         return (
             db.session.query(
@@ -1,5 +1,5 @@
-from .objects import Counter, CasesDecorator
-from .store import CountStore
+from .objects import Counter, CasesDecorator, depends_on
+from .store import CountStore, LazyStore
 
 counter = Counter
 cases = CasesDecorator
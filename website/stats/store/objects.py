@@ -6,9 +6,13 @@ from types import FunctionType
 
 class StoreObject:
 
-    def __init__(self, func: callable, static=False):
+    def __init__(self, func: callable, static=False, depends_on=None):
         self.func = func
         self.static = static
+        if depends_on is None:
+            depends_on = getattr(func, 'depends_on', None)
+        # None means that the dependencies are unknown
+        self.dependencies = tuple(depends_on) if depends_on is not None else None
 
     def __call__(self, store_context=None):
         func = self.func
@@ -30,12 +34,32 @@ class StoreObject:
 
 class Counter(StoreObject):
 
-    def __init__(self, func: FunctionType, name=None, cache=True, static=False):
+    def __init__(self, func: FunctionType, name=None, cache=True, static=False, depends_on=None):
+        if depends_on is None:
+            depends_on = getattr(func, 'depends_on', None)
         if cache:
             func = lru_cache(maxsize=1)(func)
         if name:
             func.name = name
-        super().__init__(func, static)
+        super().__init__(func, static, depends_on)
+
+
+def depends_on(*models):
+    """Declare models from which the data of a counter (or case generator) are derived.
+
+    Counters with declared dependencies are recalculated only if the data of
+    any of these models changed (see CountStore.calc_all); counters without
+    declarations are always recalculated.
+
+    Use below the @counter or @cases decorator.
+    """
+    def decorator(func):
+        if isinstance(func, StoreObject):
+            func.dependencies = models
+        else:
+            func.depends_on = models
+        return func
+    return decorator
 
 
 def compose_name(name: str, value) -> str:
@@ -1,15 +1,35 @@
 import re
+from collections.abc import Mapping
 from functools import partial
+from threading import Lock
+from typing import Callable
 from warnings import warn
 
+from sqlalchemy import func
 from tqdm import tqdm
 
-from database import get_or_create, db
-from models import Count
+from database import db
+from helpers.parallel import database_safe_pool
+from models import Count, DataVersion
 
 from .objects import StoreObject, Counter, CaseGenerator
 
 
+# the store of the worker process (set by the pool initializer)
+_worker_store = None
+_worker_counters = None
+
+
+def _set_worker_store(store):
+    global _worker_store, _worker_counters
+    _worker_store = store
+    _worker_counters = store.counters
+
+
+def _calculate_in_worker(name):
+    return name, _worker_counters[name](_worker_store)
+
+
 class CountStore:
 
     storage_model = Count
@@ -24,7 +44,7 @@ class CountStore:
 
     def __init__(self):
         for name, case_generator in self.case_generators.items():
-            counter = partial(Counter, static=case_generator.static)
+            counter = partial(Counter, static=case_generator.static, depends_on=case_generator.dependencies)
             for case_name, new_counter in case_generator.generate(case_wrapper=counter):
                 full_name = name + ('_' + case_name if case_name else '')
                 self.register(new_counter, name=full_name)
@@ -59,14 +79,52 @@ class CountStore:
             if isinstance(value, CaseGenerator)
         }
 
-    def calc_all(self, limit_to=None):
+    def version_name(self, counter_name):
+        return f'{type(self).__name__}:{counter_name}'
+
+    def data_versions(self, counters: dict) -> dict:
+        """Fingerprint the data which each of the counters depends on.
+
+        The count and the highest id reflect insertions and deletions,
+        while the revision reflects in-place updates (see DataVersion.bump).
+
+        Returns:
+            mapping: counter name -> version (or None if dependencies are not declared)
+        """
+        fingerprints = {}
+        revisions = DataVersion.revisions({
+            model
+            for counter in counters.values()
+            for model in (counter.dependencies or [])
+        })
+
+        def fingerprint(model):
+            if model not in fingerprints:
+                count, highest_id = db.session.query(func.count(model.id), func.max(model.id)).one()
+                fingerprints[model] = f'{model.__tablename__}:{count}:{highest_id}:{revisions[model]}'
+            return fingerprints[model]
+
+        return {
+            name: (
+                ';'.join(sorted(fingerprint(model) for model in counter.dependencies))
+                if counter.dependencies is not None else
+                None
+            )
+            for name, counter in counters.items()
+        }
+
+    def calc_all(self, limit_to=None, processes=1, only_stale=False):
         """Calculate all counts and save calculated values into database.
 
         Already existing values will be updated.
 
         Args:
             limit_to: regular expression for limiting which counters should be executed
+            processes: number of worker processes to calculate the counters in
+            only_stale: skip counters with declared dependencies if the data
+                of these did not change since the stored value was calculated
         """
+        model = self.storage_model
 
         counters = {
             name: counter
@@ -74,25 +132,82 @@ class CountStore:
             if not limit_to or re.match(limit_to, name)
         }
 
-        for name, counter in tqdm(counters.items(), total=len(counters)):
+        versions = self.data_versions(counters)
 
-            count, new = get_or_create(self.storage_model, name=name)
+        stored_counts = {
+            count.name: count
+            for count in model.query.filter(model.name.in_(counters.keys()))
+        }
+        stored_versions = {
+            data_version.name: data_version
+            for data_version in DataVersion.query.filter(
+                DataVersion.name.in_([self.version_name(name) for name in counters])
+            )
+        }
 
-            value = counter(self)
+        def is_stale(name):
+            version = versions[name]
+            stored_version = stored_versions.get(self.version_name(name))
+            return (
+                version is None or name not in stored_counts or
+                not stored_version or stored_version.version != version
+            )
+
+        if only_stale:
+            fresh = [name for name in counters if not is_stale(name)]
+            if fresh:
+                print(f'Skipping {len(fresh)} counters with unchanged data')
+            counters = {
+                name: counter
+                for name, counter in counters.items()
+                if name not in fresh
+            }
+
+        for name, value in self._calculate(counters, processes):
+
+            count = stored_counts.get(name)
+            if not count:
+                count = model(name=name)
+                db.session.add(count)
             count.value = value
 
             print(name, value)
 
-            if new:
-                db.session.add(count)
+            version = versions[name]
+            if version is not None:
+                version_name = self.version_name(name)
+                data_version = stored_versions.get(version_name)
+                if not data_version:
+                    data_version = DataVersion(name=version_name)
+                    db.session.add(data_version)
+                data_version.version = version
 
-    def get_all(self):
+    def _calculate(self, counters: dict, processes=1):
+        if processes == 1:
+            for name, counter in tqdm(counters.items(), total=len(counters)):
+                yield name, counter(self)
+            return
+
+        print(f'Calculating with {processes} processes')
 
+        with database_safe_pool(processes, initializer=_set_worker_store, initargs=(self,)) as pool:
+            results = pool.imap_unordered(_calculate_in_worker, counters)
+            yield from tqdm(results, total=len(counters))
+
+    def get_all(self):
+        """Retrieve values of all counters of this store (with a single query)."""
         model = self.storage_model
 
+        names = self.counters.keys()
+
+        stored_values = dict(
+            db.session.query(model.name, model.value)
+            .filter(model.name.in_(names))
+        )
+
         counts = {
-            counter_name: db.session.query(model.value).filter(model.name == counter_name).scalar()
-            for counter_name in self.counters.keys()
+            name: stored_values.get(name)
+            for name in names
         }
 
         counts = {
@@ -101,3 +216,31 @@ class CountStore:
         }
 
         return counts
+
+
+class LazyStore(Mapping):
+    """Read-only mapping loaded on the first access and cached for the lifetime of the process.
+
+    Processes forked after the loading (e.g. pre-forked web workers)
+    inherit the loaded values.
+    """
+
+    def __init__(self, load: Callable[[], Mapping]):
+        self._load = load
+        self._values = None
+        self._lock = Lock()
+
+    def preload(self):
+        with self._lock:
+            if self._values is None:
+                self._values = self._load()
+        return self._values
+
+    def __getitem__(self, key):
+        return self.preload()[key]
+
+    def __iter__(self):
+        return iter(self.preload())
+
+    def __len__(self):
+        return len(self.preload())
@@ -1,17 +1,22 @@
 from collections import defaultdict
-from typing import Iterable, Dict, Callable
+from typing import Iterable, Dict, Callable, Set
 
-from sqlalchemy import distinct, and_
+from numpy import array, count_nonzero, empty, int64, isin, ndarray, searchsorted, sort
+from sqlalchemy import distinct, and_, or_
 from tqdm import tqdm
 
 import models
 from database import db
-from models import Mutation, Protein, Site
+from models import Mutation, Protein, Site, SiteType
 from models import confirmed_mutation_sources as mutation_sources, ensure_mutations_are_precomputed
 
 
+# site positions (as returned by load_site_positions), keyed by the query parameters
 PROTEINS_CACHE = {}
 
+# mutations up to 7 residues away from a site are considered to affect it
+SITE_PROXIMITY = 7
+
 
 def count_mutations_in_sites(
     site_types: Iterable[models.SiteType] = tuple(), models=None,
@@ -20,20 +25,7 @@ def count_mutations_in_sites(
     custom_joins=None
 ):
     def counter(mutations, sites):
-        count = 0
-        positions_of_matched_sites = [
-            site.position for site in sites
-        ]
-        for mutation in mutations:
-            mutation_position = mutation.position
-            affects_any_site = False
-            for site_position in positions_of_matched_sites:
-                if abs(mutation_position - site_position) < 8:
-                    affects_any_site = True
-                    break
-            if affects_any_site:
-                count += 1
-        return count
+        return count_close(mutations, sites, SITE_PROXIMITY)
 
     return count_ptm(
         site_types=site_types, models=models, only_primary=only_primary,
@@ -49,18 +41,7 @@ def count_mutated_sites(
     custom_joins=None
 ):
     def counter(mutations, sites):
-        count = 0
-        mutation_positions = {
-            mutation.position
-            for mutation in mutations
-        }
-        for site in sites:
-            site_position = site.position
-            for mutation_position in mutation_positions:
-                if abs(mutation_position - site_position) < 8:
-                    count += 1
-                    break
-        return count
+        return count_close(sites, mutations, SITE_PROXIMITY)
 
     return count_ptm(
         site_types=site_types, models=models, only_primary=only_primary,
@@ -78,13 +59,14 @@ def count_sites(
 
     return count_ptm(
         counter=counter,
-        site_types=site_types, only_primary=only_primary
+        site_types=site_types, only_primary=only_primary,
+        with_mutations=False
     )
 
 
 def count_mutations(**kwargs):
     def counter(mutations, sites):
-        return len(list(mutations))
+        return len(mutations)
 
     return count_ptm(
         counter=counter,
@@ -92,83 +74,132 @@ def count_mutations(**kwargs):
     )
 
 
-def count_ptm(
-    counter, site_types: Iterable[models.SiteType] = tuple(), models=None,
-    only_primary=False, site_mode='any',
-    custom_filters=None,
-    custom_joins=None
-):
-    assert site_mode in {'any', 'all', 'none'}
+def count_close(positions, other_positions, distance) -> int:
+    """Count `positions` having any of the `other_positions` within ±distance.
 
-    from sqlalchemy.orm import load_only, subqueryload
+    Both arguments are sorted arrays of positions encoded with `encode_positions`
+    (using the same stride), so that positions from different proteins are never
+    considered close to each other.
+    """
+    left = searchsorted(other_positions, positions - distance, side='left')
+    right = searchsorted(other_positions, positions + distance, side='right')
+    return int(count_nonzero(right > left))
 
-    site_types = set(site_types)
 
-    if only_primary in PROTEINS_CACHE:
-        print('Reusing cached proteins...')
-        proteins = PROTEINS_CACHE[only_primary]
-    else:
-        print('Retrieving and caching proteins...')
-        proteins = Protein.query.options(
-            load_only('id'),
-            subqueryload(Protein.sites)
-        )
-        print(proteins)
-        if only_primary:
-            proteins = proteins.filter(Protein.is_preferred_isoform)
-        proteins = proteins.all()
-        PROTEINS_CACHE[only_primary] = proteins
+def encode_positions(positions: ndarray, stride: int) -> ndarray:
+    """Encode (protein_id, position) rows as sorted, globally unique positions.
+
+    The stride has to exceed the longest protein by more than the distance used
+    in the subsequent searches.
+    """
+    if not len(positions):
+        return empty(0, dtype=int64)
+    return sort(positions[:, 0] * stride + positions[:, 1])
+
 
-    count = 0
+def as_positions_array(rows) -> ndarray:
+    return array(rows, dtype=int64).reshape(-1, 2)
+
+
+def load_site_positions(site_types: Set[models.SiteType], site_mode: str, only_primary: bool) -> ndarray:
+    """Retrieve (protein_id, position) of all sites of given types in a single query."""
+    query = db.session.query(Site.protein_id, Site.position)
 
     is_any_site_type = len(site_types) == 1 and next(iter(site_types)).name == ''
 
-    mutation_query_base = (
-        Mutation.query
-        .options(load_only('position'))
-    )
+    if not is_any_site_type:
+        types_ids = [site_type.id for site_type in site_types]
+        if site_mode == 'any':
+            query = query.filter(Site.types.any(SiteType.id.in_(types_ids)))
+        else:
+            query = query.filter(and_(*[
+                Site.types.any(SiteType.id == type_id)
+                for type_id in types_ids
+            ]))
+
+    if only_primary:
+        query = query.join(Protein).filter(Protein.is_preferred_isoform)
+
+    return as_positions_array(query.all())
+
+
+def load_mutation_positions(models=None, only_primary=False, custom_filters=None, custom_joins=None) -> ndarray:
+    """Retrieve (protein_id, position) of all matching mutations in a single query."""
+    query = db.session.query(Mutation.id, Mutation.protein_id, Mutation.position).select_from(Mutation)
 
     if custom_joins:
         for join in custom_joins:
-            mutation_query_base = mutation_query_base.join(join)
+            query = query.join(join)
 
     if custom_filters:
         for filter in custom_filters:
-            mutation_query_base = mutation_query_base.filter(filter)
+            query = query.filter(filter)
 
-    any_site_mode = site_mode == 'any'
-    none_site_mode = site_mode == 'none'
+    if models:
+        query = query.filter(Mutation.in_sources(*models, conjunction=or_))
 
-    for protein in tqdm(proteins):
-        if none_site_mode:
-            sites = None
-        else:
-            if is_any_site_type:
-                sites = list(protein.sites)
-            elif any_site_mode:
-                sites = [
-                    site for site in protein.sites
-                    # if any in intersection
-                    if site_types & site.types
-                ]
-            else:
-                sites = [
-                    site for site in protein.sites
-                    # if all site_types are present in site.types
-                    if not site_types - site.types
-                ]
-            if not sites:
-                continue
-        from sqlalchemy import or_
-        mutations = (
-            mutation_query_base
-            .filter(Mutation.protein==protein)
+    if only_primary:
+        query = query.join(Protein, Mutation.protein_id == Protein.id).filter(Protein.is_preferred_isoform)
+
+    # joins with (managed) details may repeat mutations; each should be counted once
+    return as_positions_array([
+        (protein_id, position)
+        for mutation_id, protein_id, position in query.distinct()
+    ])
+
+
+def count_ptm(
+    counter, site_types: Iterable[models.SiteType] = tuple(), models=None,
+    only_primary=False, site_mode='any',
+    custom_filters=None,
+    custom_joins=None,
+    with_mutations=True
+):
+    """Count mutations and/or sites with given counter.
+
+    Positions of all the mutations and all the sites are retrieved with two
+    bulk queries; the counter receives two sorted arrays of encoded positions
+    (see encode_positions): of the mutations and of the sites (or None if
+    site_mode is 'none'). Unless site_mode is 'none', only the mutations
+    in proteins with at least one of the requested sites are passed.
+
+    Counters which do not use the mutations should set with_mutations=False
+    so that the mutations are not loaded at all (the counter gets None).
+    """
+    assert site_mode in {'any', 'all', 'none'}
+    assert with_mutations or site_mode != 'none'
+
+    site_types = set(site_types)
+
+    if with_mutations:
+        mutations = load_mutation_positions(models, only_primary, custom_filters, custom_joins)
+    else:
+        mutations = None
+
+    if site_mode == 'none':
+        sites = None
+        longest = mutations[:, 1].max(initial=0)
+    else:
+        key = (
+            only_primary, site_mode,
+            frozenset((site_type.id, site_type.name) for site_type in site_types)
         )
-        if models:
-            mutations = mutations.filter(Mutation.in_sources(*models, conjunction=or_))
-        count += counter(mutations, sites)
+        if key not in PROTEINS_CACHE:
+            PROTEINS_CACHE[key] = load_site_positions(site_types, site_mode, only_primary)
+        sites = PROTEINS_CACHE[key]
+
+        longest = sites[:, 1].max(initial=0)
+
+        if mutations is not None:
+            mutations = mutations[isin(mutations[:, 0], sites[:, 0])]
+            longest = max(mutations[:, 1].max(initial=0), longest)
 
-    return count
+    stride = int(longest) + 2 * SITE_PROXIMITY + 1
+
+    return counter(
+        encode_positions(mutations, stride) if mutations is not None else None,
+        encode_positions(sites, stride) if sites is not None else None
+    )
 
 
 TableChunk = Dict[str, Dict[str, int]]
@@ -209,7 +240,6 @@ def source_specific_proteins_with_ptm_mutations() -> TableChunk:
 
 def source_specific_nucleotide_mappings() -> TableChunk:
     from database import bdb
-    from genomic_mappings import decode_csv
     from models import Mutation
     from tqdm import tqdm
     from gc import collect
@@ -249,8 +279,8 @@ def source_specific_nucleotide_mappings() -> TableChunk:
     collect()
 
     def iterate_known_muts_sources():
-        for value in tqdm(bdb.values(), total=len(bdb.db)):
-            for item in map(decode_csv, value):
+        for items in tqdm(bdb.decoded_values(), total=len(bdb.db)):
+            for item in items:
                 sources = mutations.get(str(item['protein_id']) + item['alt'] + str(item['pos']))
                 if sources:
                     yield sources
@@ -1,10 +1,13 @@
 from functools import partial
 from itertools import combinations
 
+from numpy import array, bincount, bitwise_or, concatenate, full, int64, unique, zeros
+
+from database import db
 from models import VennDiagram, Site, Protein, SiteType, SiteSource, Mutation, confirmed_mutation_sources
 
 from .store import CountStore, counter
-from .table import count_mutated_sites
+from .table import SITE_PROXIMITY
 
 
 def all_combinations(items, min_length=1):
@@ -13,14 +16,72 @@ def all_combinations(items, min_length=1):
             yield combination
 
 
-def venn_diagram(cases=None, model=None, name=None):
+def membership_masks(members_queries) -> array:
+    """Pack memberships of entities into integer bitmasks.
+
+    Args:
+        members_queries: one query per set, each returning ids of the entities
+            belonging to the set; the i-th set will be represented by the i-th bit
+
+    Returns:
+        an array with one bitmask for each of the entities belonging to at least one set
+    """
+    members = [
+        array([entity_id for entity_id, in query], dtype=int64)
+        for query in members_queries
+    ]
+    if not members:
+        return zeros(0, dtype=int64)
+
+    bits = concatenate([
+        full(len(set_members), 1 << i, dtype=int64)
+        for i, set_members in enumerate(members)
+    ])
+    entities, entity_indices = unique(concatenate(members), return_inverse=True)
+
+    masks = zeros(len(entities), dtype=int64)
+    bitwise_or.at(masks, entity_indices, bits)
+    return masks
+
+
+def intersections_sizes(masks, sets_count: int) -> array:
+    """Count entities belonging to (at least) each combination of sets.
+
+    Returns:
+        an array where the value at index `m` is the number of entities
+        belonging to all the sets encoded by the bits of `m`
+    """
+    # the number of entities belonging to exactly the sets of given mask...
+    sizes = bincount(masks, minlength=1 << sets_count)
+
+    # ...summed over all masks being supersets of the given mask
+    for bit in range(sets_count):
+        step = 1 << bit
+        sizes_by_bit = sizes.reshape(-1, 2, step)
+        sizes_by_bit[:, 0, :] += sizes_by_bit[:, 1, :]
+
+    return sizes
+
+
+def venn_diagram(cases=None, model=None, name=None, dependencies=None, mode='combinations'):
+    """Create a counter of sizes of all intersections of the sets (cases or instances of a model).
+
+    In the 'combinations' mode the decorated function is called for each
+    combination of the sets and returns the size of their intersection.
+
+    In the 'bitmask' mode, the decorated function is called once for each
+    of the sets and returns a query of ids of the entities belonging to
+    the set; the sizes of all the intersections are then computed at once
+    from bitmasks of memberships of the entities.
+    """
     assert cases or model
+    assert mode in {'combinations', 'bitmask'}
 
-    def decorator(combination_counter):
+    def decorator(func):
         nonlocal name
 
         if not name:
-            name = combination_counter.__name__
+            name = func.__name__
 
         def subset_generator(self, *args, **kwargs):
             nonlocal cases
@@ -28,41 +89,57 @@ def venn_diagram(cases=None, model=None, name=None):
             if model:
                 cases = model.query.all()
 
+            cases = list(cases)
+
+            if mode == 'bitmask':
+                masks = membership_masks(func(case, *args, **kwargs) for case in cases)
+                sizes = intersections_sizes(masks, len(cases))
+
+                def combination_counter(combination):
+                    mask = sum(1 << cases.index(case) for case in combination)
+                    return int(sizes[mask])
+            else:
+                def combination_counter(combination):
+                    return func(combination, *args, **kwargs)
+
             results = []
 
             for combination in all_combinations(cases):
                 result = {
                     'sets': [c.name for c in combination],
-                    'size': combination_counter(combination, *args, **kwargs)
+                    'size': combination_counter(combination)
                 }
                 results.append(result)
             return results
 
-        return counter(subset_generator, name=name)
+        return counter(subset_generator, name=name, depends_on=dependencies)
     return decorator
 
 
-def sites_by_type(combination, only_primary=True):
-    query = Site.query
-
-    for site_type in combination:
-        query = query.filter(Site.types.contains(site_type))
+def sites_of_type(site_type, only_primary=True):
+    query = db.session.query(Site.id).filter(Site.types.contains(site_type))
 
     if only_primary:
         query = query.join(Protein).filter(Protein.is_preferred_isoform)
 
-    return query.count()
-
+    return query
 
-def mutation_by_source(combination, site_type=None, only_within_ptm_sites=False, only_primary=False):
 
-    query = (
-        Mutation.query
-        .filter(Mutation.in_sources(*combination))
+def mutated_sites_of_type(site_type, mutations_source, only_primary=False):
+    """Sites of given type with a mutation from given source up to SITE_PROXIMITY residues away."""
+    close_mutations = (
+        db.session.query(Mutation.id)
+        .filter(Mutation.protein_id == Site.protein_id)
+        .filter(Mutation.position.between(Site.position - SITE_PROXIMITY, Site.position + SITE_PROXIMITY))
+        .filter(Mutation.in_sources(mutations_source))
     )
+    return sites_of_type(site_type, only_primary=only_primary).filter(close_mutations.exists())
+
+
+def mutations_of_source(source, site_type=None, only_within_ptm_sites=False, only_primary=False):
+    query = db.session.query(Mutation.id).filter(Mutation.in_sources(source))
 
     if only_within_ptm_sites:
-        # query = query.filter(Mutation.is_ptm_distal == True)
         query = query.filter(Mutation.precomputed_is_ptm)
 
     if site_type:
@@ -71,14 +148,11 @@ def mutation_by_source(combination, site_type=None, only_within_ptm_sites=False,
     if only_primary:
         query = query.join(Protein).filter(Protein.is_preferred_isoform)
 
-    return query.count()
-
+    return query
 
-def sites_by_source(combination, site_type=None, only_primary=False):
-    query = Site.query
 
-    for source in combination:
-        query = query.filter(Site.sources.any(source.id == SiteSource.id))
+def sites_of_source(source, site_type=None, only_primary=False):
+    query = db.session.query(Site.id).filter(Site.sources.any(SiteSource.id == source.id))
 
     if site_type:
         query = query.filter(Site.types.contains(site_type))
@@ -86,7 +160,7 @@ def sites_by_source(combination, site_type=None, only_primary=False):
     if only_primary:
         query = query.join(Protein).filter(Protein.is_preferred_isoform)
 
-    return query.count()
+    return query
 
 
 class VennDiagrams(CountStore):
@@ -98,39 +172,51 @@ class VennDiagrams(CountStore):
         # generate venn diagrams of mutated sites percentage
         for name, mutations_source in confirmed_mutation_sources().items():
 
-            count_mutated = partial(count_mutated_sites, model=mutations_source)
-            sites_mutated = venn_diagram(model=SiteType, name=f'sites_mutated_{name}')(count_mutated)
+            mutated_sites = partial(mutated_sites_of_type, mutations_source=mutations_source)
+            sites_mutated = venn_diagram(
+                model=SiteType, name=f'sites_mutated_{name}',
+                dependencies=[Site, SiteType, Mutation, mutations_source],
+                mode='bitmask'
+            )(mutated_sites)
 
             self.register(sites_mutated)
 
         for site_type in SiteType.query:
 
-            count_mutations_affecting_ptms = partial(
-                mutation_by_source, site_type=site_type
+            mutations_affecting_ptms = partial(
+                mutations_of_source, site_type=site_type
             )
             ptm_mutations_by_mutation_source = venn_diagram(
                 cases=confirmed_mutation_sources().values(),
-                name=f'{site_type.name}_mutations_by_source'
-            )(count_mutations_affecting_ptms)
+                name=f'{site_type.name}_mutations_by_source',
+                dependencies=[Site, Mutation, *confirmed_mutation_sources().values()],
+                mode='bitmask'
+            )(mutations_affecting_ptms)
 
             self.register(ptm_mutations_by_mutation_source)
 
-            count_sites = partial(
-                sites_by_source,
+            sites = partial(
+                sites_of_source,
                 site_type=site_type
             )
             ptm_sites_by_source = venn_diagram(
                 model=SiteSource,
-                name=f'{site_type.name}_sites_by_source'
-            )(count_sites)
+                name=f'{site_type.name}_sites_by_source',
+                dependencies=[Site, SiteSource],
+                mode='bitmask'
+            )(sites)
             self.register(ptm_sites_by_source)
 
-    venn_sites_by_type = venn_diagram(model=SiteType)(sites_by_type)
+    venn_sites_by_type = venn_diagram(
+        model=SiteType, dependencies=[Site, SiteType], mode='bitmask'
+    )(sites_of_type)
 
-    @venn_diagram(model=SiteSource)
-    def sites_by_source(combination, only_primary=False):
-        return sites_by_source(combination, only_primary=only_primary)
+    @venn_diagram(model=SiteSource, dependencies=[Site, SiteSource], mode='bitmask')
+    def sites_by_source(source, only_primary=False):
+        return sites_of_source(source, only_primary=only_primary)
 
-    @venn_diagram(cases=confirmed_mutation_sources().values())
-    def mutation_by_source(combination):
-        return mutation_by_source(combination)
+    @venn_diagram(cases=confirmed_mutation_sources().values(), dependencies=[
+        Mutation, *confirmed_mutation_sources().values()
+    ], mode='bitmask')
+    def mutation_by_source(source):
+        return mutations_of_source(source)
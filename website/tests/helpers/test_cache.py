@@ -70,3 +70,51 @@ def test_cache(tmpdir):
     assert calc() == 25
     assert calc(a=1) == 5
     assert calc(a=2) == 1
+
+
+def test_tiered_cache(tmpdir):
+    from helpers.cache import TieredCache
+
+    cache = TieredCache(max_size=2, directory=tmpdir)
+
+    for i in range(3):
+        cache.set(i, str(i))
+
+    # the least recently used key was evicted from memory...
+    assert 0 not in cache.memory
+    assert len(cache) == 2
+
+    # ...but it is still available from the disk
+    assert cache.get(0) == '0'
+    assert list(cache.memory) == [2, 0]
+
+    calls = []
+
+    def create():
+        calls.append(1)
+        return 'x'
+
+    assert cache.get_or_create('x', create) == 'x'
+    assert cache.get_or_create('x', create) == 'x'
+    assert len(calls) == 1
+
+    memory_only = TieredCache(max_size=1)
+    memory_only.set('a', 1)
+    memory_only.set('b', 2)
+    assert memory_only.get('a') is None
+    assert memory_only.get('b') == 2
+
+    cache.clear()
+    assert 0 not in cache
+
+
+def test_tiered_cache_expiry():
+    from time import sleep
+    from helpers.cache import TieredCache
+
+    cache = TieredCache(ttl=0.05)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    sleep(0.1)
+    assert cache.get('a') is None
+    assert 'a' not in cache
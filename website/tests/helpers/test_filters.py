@@ -235,3 +235,51 @@ def test_update_request():
 
         assert manager.get_value('Model.shape') == 'rectangle:or:circle'
         assert manager.url_string() == 'Model.shape:eq:rectangle:or:circle'
+
+
+def test_compiled_apply():
+
+    class Item:
+        def __init__(self, size, kinds):
+            self.size = size
+            self.kinds = kinds
+
+    items = [
+        Item(size, kinds)
+        for size in [1, 5, 10, None]
+        for kinds in [[], ['a'], ['a', 'b']]
+    ]
+
+    size_filter = filters.Filter(Item, 'size', comparators=['ge', 'lt'])
+    kinds_filter = filters.Filter(Item, 'kinds', comparators=['in'], multiple='any')
+    manager = filters.FilterManager([size_filter, kinds_filter])
+
+    def expected():
+        # reference result: chained application of filters
+        elements = items
+        for filter_ in [size_filter, kinds_filter]:
+            elements = filter_.apply(elements)
+        return list(elements)
+
+    for size_comparator, size, kinds in [('ge', 5, ['a']), ('lt', 10, ['b']), ('ge', 5.5, ['b', 'c'])]:
+        size_filter.update(size, size_comparator)
+        kinds_filter.update(kinds)
+
+        assert manager.apply(items) == expected()
+        assert manager.apply(items, column_wise=True) == expected()
+
+    # the predicates are cached per state of the filters
+    manager.apply(items)
+    assert len(manager._compiled_predicates) == 3
+
+    # column-wise comparison of numeric values is vectorised
+    size_filter.update(5, 'ge')
+    numeric = [Item(size, []) for size in range(10)]
+    passed = size_filter.test_column(numeric)
+    assert list(passed) == [size >= 5 for size in range(10)]
+    assert type(passed).__module__ == 'numpy'
+
+    # item-getters are supported
+    pairs = [(item, None) for item in numeric]
+    assert manager.apply(pairs, [size_filter], itemgetter=lambda pair: pair[0]) == pairs[5:]
+    assert manager.apply(pairs, [size_filter], itemgetter=lambda pair: pair[0], column_wise=True) == pairs[5:]
@@ -1,9 +1,38 @@
-from analyses.enrichment import most_mutated_sites
+from analyses import enrichment
+from analyses.enrichment import most_mutated_sites, merge_intervals, position_in_regions, sample_sums
 from database import db
 from models import Mutation, Site, Protein, InheritedMutation, MC3Mutation, ClinicalData, Gene, SiteType
 from database_testing import DatabaseTest
 
 
+def test_merge_intervals():
+    starts, ends = merge_intervals([20, 0, 8, 30], [27, 7, 15, 37])
+    # disjoint intervals are only sorted
+    assert starts.tolist() == [0, 8, 20, 30]
+    assert ends.tolist() == [7, 15, 27, 37]
+
+    # regions are concatenated: [0, 7] has length 7, [8, 15] follows it
+    assert position_in_regions(3, starts, ends) == 2
+    assert position_in_regions(10, starts, ends) == 7 + 1
+
+    # touching and overlapping intervals are merged
+    starts, ends = merge_intervals([7, 0, 12, 30], [14, 7, 20, 37])
+    assert starts.tolist() == [0, 30]
+    assert ends.tolist() == [20, 37]
+
+
+def test_sample_sums():
+    values = [0, 0, 1, 0, 2]
+
+    sums = sample_sums(values, sample_size=10, repeats=2500, seed=0, chunk_size=1000)
+    assert len(sums) == 2500
+    assert 0 <= sums.min() and sums.max() <= 20
+    # the expected value is 10 * 3 / 5
+    assert abs(sums.mean() - 6) < 0.2
+
+    assert (sample_sums(values, 10, 2500, seed=0, processes=2, chunk_size=1000) == sums).all()
+
+
 class MutationTest(DatabaseTest):
 
     def test_mutated_sites(self):
@@ -67,3 +96,29 @@ class MutationTest(DatabaseTest):
 
         glyco_sites_with_mc3 = most_mutated_sites([MC3Mutation], site_type=glycosylation).all()
         assert glyco_sites_with_mc3 == [(sites['U'], 3)]
+
+    def test_enrichment_of_ptm_mutations(self):
+        p = Protein(refseq='NM_007', sequence='ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+
+        # 10 reference mutations, 2 of them PTM-associated
+        for position in range(1, 11):
+            db.session.add(Mutation(position=position, alt='X', protein=p, precomputed_is_ptm=position <= 2))
+        db.session.commit()
+
+        reference = Mutation.query
+
+        result = enrichment.test_enrichment_of_ptm_mutations_among_mutations_subset(
+            None, reference, iterations_count=1000, subset_size=5, subset_ptms=2, seed=0
+        )
+        assert len(result.enriched_ptm_muts_in_iterations) == 1000
+        assert set(result.enriched_ptm_muts_in_iterations) <= {0, 1, 2}
+        assert result.observed_ptm_muts == 2
+        # P(X < 2) = 1 - C(8,3) / C(10,5) = 7/9
+        assert abs(result.p_value - 7 / 9) < 0.05
+        assert result.p_value == result.p_value_percentage
+
+        # the results are reproducible, also when using multiple processes
+        same_result = enrichment.test_enrichment_of_ptm_mutations_among_mutations_subset(
+            None, reference, iterations_count=1000, subset_size=5, subset_ptms=2, seed=0, processes=2
+        )
+        assert same_result == result
@@ -2,6 +2,7 @@ from analyses.motifs import (
     mutate_sequence,
     select_sites_with_motifs,
     MotifsCounter,
+    MotifsEngine,
 )
 from database import db
 from models import Mutation, Protein, Site, SiteType
@@ -77,3 +78,38 @@ class MotifAnalysisTest(DatabaseTest):
 
         assert data.sites_with_broken_motif['canonical'] == {canonical_sites[0], canonical_sites[1]}
         assert data.sites_with_motif['canonical'] == set(canonical_sites)
+
+    def test_engine(self):
+
+        p = Protein(refseq='NM_007', id=1, sequence='ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+        sites = [
+            Site(protein=p, position=1, residue='A'),
+            Site(protein=p, position=11, residue='K'),
+            Site(protein=p, position=26, residue='Z'),
+        ]
+        db.session.add(p)
+        db.session.commit()
+
+        engine = MotifsEngine({'after_j': 'JK', 'start': '^-+A'}, chunk_size=2)
+        engine.load_sites(sites)
+
+        # sequences retrieved in bulk are the same as computed for each site separately
+        for site in sites:
+            assert engine.sequence(site) == site.sequence
+
+        with_motifs = engine.sites_with_motifs(sites)
+        assert with_motifs['after_j'] == {sites[1]}
+        assert with_motifs['start'] == {sites[0]}
+
+        mutations = [
+            Mutation(protein=p, position=10, alt='X'),
+            Mutation(protein=p, position=12, alt='X'),
+        ]
+        sequences = [engine.mutated_sequence(sites[1], mutation) for mutation in mutations]
+        assert sequences == [mutate_sequence(sites[1], mutation, offset=7) for mutation in mutations]
+
+        assert engine.search(sequences) == {'after_j': [False, True], 'start': [False, False]}
+
+        # the results do not depend on the number of processes
+        engine.processes = 2
+        assert engine.search(sequences * 2) == {'after_j': [False, True] * 2, 'start': [False] * 4}
@@ -1,7 +1,8 @@
 import genomic_mappings
-from database import db
+from database import db, stream_objects
 from database_testing import DatabaseTest
-from models import Model, ScalarSet
+from models import Model, ScalarSet, Cancer
+from database.bulk import bulk_native_insert, to_tsv_field
 
 
 def test_make_snv_key():
@@ -38,6 +39,25 @@ def test_decode_csv():
         assert result == dict(zip(keys, correct_result))
 
 
+def test_to_tsv_field():
+    assert to_tsv_field(None) == '\\N'
+    assert to_tsv_field(True) == '1'
+    assert to_tsv_field(0.5) == '0.5'
+    assert to_tsv_field('a\tb\nc\\') == 'a\\tb\\nc\\\\'
+
+
+class TestBulkInsert(DatabaseTest):
+
+    def test_native_insert(self):
+        bulk_native_insert(
+            Cancer, ('code', 'name'),
+            [('BRCA', 'Breast invasive carcinoma'), ('KIRC', 'Kidney renal clear cell carcinoma')]
+        )
+        db.session.commit()
+
+        assert {cancer.code for cancer in Cancer.query.all()} == {'BRCA', 'KIRC'}
+
+
 class TestTypes(DatabaseTest):
 
     def test_scalar_set(self):
@@ -73,3 +93,24 @@ class TestTypes(DatabaseTest):
 
         # test load of empty set:
         assert b_loaded.citations == set()
+
+
+class TestStreamObjects(DatabaseTest):
+
+    def test_stream_objects(self):
+        codes = ['C%s' % i for i in range(10)]
+        db.session.add_all([Cancer(code=code, name=code) for code in codes])
+        db.session.commit()
+
+        # batches do not need to align with the number of objects
+        for batch_size in [1, 3, 10, 20]:
+            streamed = stream_objects(Cancer.query, batch_size=batch_size)
+            assert [cancer.code for cancer in streamed] == codes
+
+        # filters are preserved
+        query = Cancer.query.filter(Cancer.code.in_(['C1', 'C5', 'C7']))
+        assert [cancer.code for cancer in stream_objects(query, batch_size=2)] == ['C1', 'C5', 'C7']
+
+        # queries of multiple entities are supported too
+        query = db.session.query(Cancer, Cancer.code)
+        assert [code for cancer, code in stream_objects(query, batch_size=4)] == codes
@@ -0,0 +1,91 @@
+from sqlalchemy.orm.attributes import set_committed_value
+
+from database_testing import DatabaseTest
+from database import db, bdb
+from models import Protein, Mutation
+from genomic_mappings import encode_csv, decode_csv, encode_csv_binary, decode_csv_binary
+from genomic_mappings import decode_value, is_binary, make_snv_key
+
+
+def test_binary_encoding():
+    fields = ('-', 'R', 'W', 1000, 'exon12', 70000, True)
+
+    text = decode_csv(encode_csv(*fields))
+    binary = decode_csv_binary(encode_csv_binary(*fields))
+
+    assert binary == dict(text, exon='12')
+    assert binary['pos'] == 334
+
+
+class GenomicMappingsTest(DatabaseTest):
+
+    def test_get_genomic_muts_many(self):
+        p = Protein(refseq='NM_007', id=1, sequence='A' * 20)
+        known = Mutation(protein=p, position=13, alt='V')
+
+        db.session.add_all([p, known])
+        db.session.commit()
+
+        # the novel mutation must stay out of the session (setting the relationship
+        # directly would cascade it to the session through the backref)
+        novel = Mutation(protein_id=p.id, position=15, alt='V')
+        set_committed_value(novel, 'protein', p)
+
+        bdb.add_genomic_mut('20', 14370, 'G', 'A', known)
+        bdb.add_genomic_mut('20', 14376, 'G', 'A', novel)
+
+        snvs = [
+            ('20', '14370', 'G', 'A'),
+            ('20', '14376', 'G', 'A'),
+            ('20', '14380', 'G', 'A')
+        ]
+        results = bdb.get_genomic_muts_many(snvs)
+
+        assert set(results) == set(snvs)
+
+        known_result, = results['20', '14370', 'G', 'A']
+        assert known_result.mutation is known
+        assert not known_result.is_mutation_novel
+        assert known_result.protein is p
+
+        novel_result, = results['20', '14376', 'G', 'A']
+        assert novel_result.is_mutation_novel
+        assert novel_result.mutation.position == 15
+
+        assert results['20', '14380', 'G', 'A'] == []
+
+        # should agree with the single-snv implementation
+        for snv, snv_results in results.items():
+            single = bdb.get_genomic_muts(*snv)
+            assert [(r.mutation.position, r.mutation.alt) for r in single] == [
+                (r.mutation.position, r.mutation.alt) for r in snv_results
+            ]
+
+    def test_migrate_to_binary(self):
+        p = Protein(refseq='NM_007', id=1, sequence='A' * 20)
+        mutations = [Mutation(protein=p, position=position, alt='V') for position in (13, 15)]
+
+        for mutation in mutations:
+            bdb.add_genomic_mut('20', 14370, 'G', 'A', mutation, exon='2', is_ptm=True)
+        bdb.add_genomic_mut('20', 14376, 'G', 'A', mutations[0], exon='3')
+
+        before = sorted(map(decode_value, bdb.db.get_many([
+            make_snv_key('20', 14370, 'G', 'A').encode(),
+            make_snv_key('20', 14376, 'G', 'A').encode()
+        ]).values()), key=len)
+
+        assert bdb.migrate_to_binary(batch_size=1) == 2
+        # already converted values should be skipped
+        assert bdb.migrate_to_binary() == 0
+
+        raw_values = [value for key, value in bdb.db.items()]
+        assert all(is_binary(value) for value in raw_values)
+
+        after = sorted(map(decode_value, raw_values), key=len)
+        assert [sorted(items, key=str) for items in before] == [sorted(items, key=str) for items in after]
+
+        # adding to a binary value should keep the binary format
+        bdb.add_genomic_mut('20', 14376, 'G', 'A', mutations[1], exon='3')
+        value = bdb.db.get(make_snv_key('20', 14376, 'G', 'A').encode())
+        assert is_binary(value)
+        assert len(decode_value(value)) == 2
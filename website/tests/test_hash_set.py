@@ -52,3 +52,16 @@ def test_hash_set(tmpdir):
     # values of bhs return iterator [per key] of iterators [per set item] (!)
     assert are_the_same(bhs.values(), expected_representation.values(), value_as_set)
     assert are_the_same(bhs.items(), expected_representation.items(), item_with_set)
+
+
+def test_get_many(tmpdir):
+    bhs = HashSet(tmpdir)
+
+    bhs['tp53'] = {'tumour', 'p53'}
+    bhs['brca2'] = {'cancer'}
+
+    retrieved = bhs.get_many(['tp53', 'brca2', 'kras'])
+
+    assert set(retrieved['tp53']) == {'tumour', 'p53'}
+    assert retrieved['brca2'] == ['cancer']
+    assert retrieved['kras'] == []
@@ -1,3 +1,5 @@
+from unittest.mock import patch
+
 import pytest
 
 from database_testing import DatabaseTest
@@ -434,6 +436,47 @@ class TestImport(DatabaseTest):
         mutations = ExomeSequencingMutation.query.all()
         assert len(mutations) == 2
 
+    def test_import_with_preloaded_mutations(self):
+
+        muts_filename = make_named_gz_file(esp_mutations)
+        proteins = create_proteins(tp53)
+
+        self.run_importer('load', 'esp6500', proteins, muts_filename)
+        mutations_count = Mutation.query.count()
+        details_count = ExomeSequencingMutation.query.count()
+
+        # the mutations are already in the database; the importer should
+        # re-use them rather than create duplicates
+        with self.app.app_context():
+            # proteins created above belong to the outer session
+            proteins = {protein.refseq: protein for protein in Protein.query}
+            muts_import_manager.perform(
+                'load', proteins, ['esp6500'], {'esp6500': muts_filename},
+                preload_mutations=True
+            )
+
+        assert Mutation.query.count() == mutations_count
+        assert ExomeSequencingMutation.query.count() == 2 * details_count
+
+    def test_mutations_index(self):
+        from imports.mutations.mutation_importer.base_importer import MutationsIndex
+
+        proteins = create_proteins(tp53)
+        protein = proteins['NM_000546']
+        mutation = Mutation(protein=protein, position=72, alt='R')
+        db.session.add(mutation)
+        db.session.commit()
+
+        index = MutationsIndex()
+        index.load([protein.id])
+        assert index.get(72, protein.id, 'R') == mutation.id
+        assert index.get(72, protein.id, 'P') is None
+
+        # shards are loaded lazily for proteins which were not preloaded
+        lazy_index = MutationsIndex()
+        assert lazy_index.get(72, protein.id, 'R') == mutation.id
+        assert protein.id in lazy_index.shards
+
     def test_mimp_import(self):
 
         from imports.mutations.mimp import MIMPImporter
@@ -469,7 +512,41 @@ class TestImport(DatabaseTest):
         # MIMP mutations are always affecting some PTM site (by definition)
         assert all(mimp.mutation.is_ptm for mimp in mutations)
 
+    def test_parallel_mimp_import(self):
+
+        from imports.mutations.mimp import MIMPImporter
+
+        muts_filename = make_named_temp_file(data=mimp_mutations)
+        proteins = create_proteins(tp53)
+        phosphorylation = SiteType(name='phosphorylation')
+
+        sites = [
+            Site(protein=proteins['NM_000546'], position=site_pos, types={phosphorylation})
+            for site_pos in [20, 215, 315, 106]
+        ]
+        db.session.add(phosphorylation)
+        db.session.add_all(sites)
+        db.session.commit()
+
+        # split the file into several chunks, to be parsed by different processes
+        with self.app.app_context(), patch.object(MIMPImporter, 'chunk_size', 2):
+            muts_import_manager.perform(
+                'load', proteins, ['mimp'], {'mimp': muts_filename},
+                processes=2
+            )
+
+        mutations = MIMPMutation.query.all()
+        assert len(mutations) == 4
+        assert len({mimp.mutation_id for mimp in mutations}) == len({
+            (mimp.mutation.position, mimp.mutation.alt) for mimp in mutations
+        })
+        assert all(mimp.mutation.is_ptm for mimp in mutations)
+
     def test_thousand_genomes_import(self):
+        from imports.mutations.thousand_genomes import The1000GenomesImporter
+
+        # both the mutations and their details are inserted natively
+        assert The1000GenomesImporter.native_bulk_insert
 
         muts_filename = make_named_gz_file(thousand_genomes_mutations)
         protein_data = tp53
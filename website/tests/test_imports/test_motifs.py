@@ -1,8 +1,11 @@
+from unittest.mock import patch
+
 from database import db
-from imports.protein_data import sites_motifs
+from imports.protein_data import sites_motifs, precompute_affected_motifs
 from database_testing import DatabaseTest
 from models.bio.sites import SiteMotif
 from models.bio import SiteType
+from models import Protein, Site, Mutation, MC3Mutation
 
 
 class TestImport(DatabaseTest):
@@ -25,3 +28,48 @@ class TestImport(DatabaseTest):
         assert n_motif.name == 'N-linked Typical Motif'
         assert n_motif.site_type == n_glycosylation
         assert n_motif.pattern == '.{7}N[^P][ST].{5}'
+
+    def test_precompute_affected_motifs(self):
+        n_glycosylation = SiteType(name='N-glycosylation')
+        motif = SiteMotif(name='N-linked', pattern='.{7}N[^P][ST].{5}', site_type=n_glycosylation)
+
+        protein = Protein(refseq='NM_0001', sequence='MAAAAAAANAS' + 'A' * 30)
+        site = Site(protein=protein, position=9, residue='N', types={n_glycosylation})
+
+        mutations = {
+            'breaking': Mutation(protein=protein, position=10, alt='P', precomputed_is_ptm=True),
+            'neutral': Mutation(protein=protein, position=11, alt='T', precomputed_is_ptm=True),
+            'distant': Mutation(protein=protein, position=30, alt='C', precomputed_is_ptm=False),
+        }
+        for mutation in mutations.values():
+            MC3Mutation(mutation=mutation)
+
+        db.session.add_all([motif, site, *mutations.values()])
+        db.session.commit()
+
+        assert precompute_affected_motifs.load(processes=2, chunk_size=1) == []
+        db.session.expire_all()
+
+        for mutation in mutations.values():
+            assert mutation.were_affected_motifs_precomputed
+
+        affected, = mutations['breaking'].precomputed_affected_motifs
+        assert affected.motif == motif and affected.site == site
+        assert not mutations['neutral'].precomputed_affected_motifs
+        assert not mutations['distant'].precomputed_affected_motifs
+
+        # the stored rows are returned (with the positions), without matching the motifs again
+        with patch('analyses.motifs.compile_motif', side_effect=AssertionError):
+            assert mutations['breaking'].affected_motifs() == [(motif, 8)]
+            assert mutations['breaking'].affected_motifs([site]) == [(motif, 8)]
+            assert mutations['neutral'].affected_motifs() == []
+
+        # motifs of mutations which are no longer PTM-proximal are removed on re-run
+        mutations['breaking'].precomputed_is_ptm = False
+        db.session.commit()
+
+        assert precompute_affected_motifs.load() == []
+        db.session.expire_all()
+
+        assert not mutations['breaking'].precomputed_affected_motifs
+        assert mutations['breaking'].affected_motifs() == []
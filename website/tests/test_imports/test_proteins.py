@@ -10,10 +10,13 @@ from imports.protein_data import disorder as disorder_importer
 from imports.protein_data import conservation as conservation_importer
 from imports.protein_data import full_gene_names as full_gene_names_importer
 from imports.protein_data import protein_summaries
+from imports.protein_data import precompute_ptm_mutations
+from imports import ImportManager, BioImporter, MutationImporter
 from database_testing import DatabaseTest
 from miscellaneous import make_named_temp_file
 from database import db
 from models import Protein, ProteinReferences, UniprotEntry
+from models import Site, Mutation, MC3Mutation
 from models import Gene
 
 
@@ -298,3 +301,48 @@ class TestImport(DatabaseTest):
 
         # NM_1 should become a preferred isoform of gene (in place of NM_3)
         assert gene.preferred_refseq == 'NM_1'
+
+    def test_precompute_ptm_mutations(self):
+
+        proteins = [Protein(id=i, refseq=f'NM_{i}', sequence='A' * 30) for i in range(1, 4)]
+        sites = [Site(protein=proteins[0], position=10), Site(protein=proteins[1], position=3)]
+
+        mutations = {
+            # (protein, position, previously precomputed value): expected value
+            (1, 17, None): True,
+            (1, 18, True): False,
+            (2, 10, False): True,
+            (2, 11, True): False,
+            (3, 5, None): False,
+        }
+        for protein_id, position, precomputed in mutations:
+            mutation = Mutation(
+                protein=proteins[protein_id - 1], position=position, alt='C', precomputed_is_ptm=precomputed
+            )
+            MC3Mutation(mutation=mutation)
+            db.session.add(mutation)
+
+        db.session.add_all(proteins + sites)
+        db.session.commit()
+
+        def precomputed_values():
+            return {
+                (mutation.protein_id, mutation.position): mutation.precomputed_is_ptm
+                for mutation in Mutation.query
+            }
+
+        # only the given range of proteins is updated (passed as from the command line)
+        manager = ImportManager(BioImporter, ignore=MutationImporter.subclassess)
+        manager.import_selected(
+            ['precompute_ptm_mutations'],
+            first_protein_id=2, last_protein_id=2, processes=None
+        )
+        values = precomputed_values()
+        assert values[1, 17] is None and values[1, 18] is True
+        assert values[2, 10] is True and values[2, 11] is False
+
+        precompute_ptm_mutations.load(chunk_size=1, processes=2)
+        assert precomputed_values() == {
+            (protein_id, position): expected
+            for (protein_id, position, _), expected in mutations.items()
+        }
@@ -22,3 +22,55 @@ def test_basic_interface(tmpdir):
 
     assert b'x' in db
     assert b'z' not in db
+
+
+def test_get_many(tmpdir):
+    db = LightningInterface(tmpdir)
+    db[b'x'] = b'2'
+    db[b'y'] = b'3'
+
+    assert db.get_many([b'x', b'y', b'z']) == {b'x': b'2', b'y': b'3', b'z': None}
+    assert db.get_many([b'z'], default=b'') == {b'z': b''}
+
+
+def test_persistent_reads(tmpdir):
+    from threading import Thread
+
+    db = LightningInterface(tmpdir)
+    db[b'x'] = b'2'
+    db[b'y'] = b'3'
+    db.close()
+
+    db = LightningInterface(tmpdir, readonly=True)
+    assert db.persistent_reads
+
+    assert db[b'x'] == b'2'
+    assert b'y' in db
+    assert b'z' not in db
+    assert len(db) == 2
+    assert dict(db.items()) == {b'x': b'2', b'y': b'3'}
+
+    # the same transaction should be re-used within a thread
+    assert db._read_transaction() is db._read_transaction()
+
+    buffer = db.get(b'x', buffers=True)
+    assert isinstance(buffer, memoryview)
+    assert bytes(buffer) == b'2'
+    assert {k: bytes(v) for k, v in db.get_many([b'x', b'y'], buffers=True).items()} == {b'x': b'2', b'y': b'3'}
+
+    # but each thread should get its own transaction
+    transactions = []
+    results = []
+
+    def lookup():
+        transactions.append(db._read_transaction())
+        results.append(db[b'y'])
+
+    threads = [Thread(target=lookup) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [b'3'] * 3
+    assert len(set(map(id, transactions))) == 3
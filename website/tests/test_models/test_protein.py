@@ -1,6 +1,9 @@
+from math import isnan
+
 from database import db
+from database.migrate import migrate_protein_tracks_to_binary
 from .model_testing import ModelTest
-from models import Protein, Site, Gene, Mutation, KinaseGroup, Kinase
+from models import Protein, Site, Gene, Mutation, KinaseGroup, Kinase, DataVersion
 
 
 class ProteinTest(ModelTest):
@@ -34,6 +37,35 @@ class ProteinTest(ModelTest):
             result = protein.would_affect_any_sites(mutation_position)
             assert result == expected_result
 
+    def test_sites_index(self):
+        protein = Protein(
+            refseq='NM_0001',
+            sites=[Site(position=pos) for pos in (57, 10, 15, 14)]
+        )
+        db.session.add(protein)
+        db.session.commit()
+
+        index = protein.sites_index
+        assert list(index.positions) == [10, 14, 15, 57]
+
+        # batch queries
+        assert list(index.are_close([0, 5, 12, 57, 100], 2, 2)) == [False, False, True, True, False]
+        close_sites = index.close_sites_many([0, 12, 57], 2, 2)
+        assert [[site.position for site in sites] for sites in close_sites] == [[], [10, 14], [57]]
+
+        # the index is re-built after new sites are added
+        protein.sites.append(Site(position=100))
+        db.session.commit()
+        assert protein.has_sites_in_range(95, 105)
+        assert protein.sites_index.is_close(100, 0, 0)
+
+        # sites inserted by other processes are announced with a revision bump
+        db.session.execute(Site.__table__.insert(), [{'protein_id': protein.id, 'position': 200, 'residue': 'S'}])
+        assert not protein.sites_index.is_close(200, 0, 0)
+        DataVersion.bump(Site)
+        db.session.commit()
+        assert protein.sites_index.is_close(200, 0, 0)
+
     def test_is_preferred_isoform(self):
 
         proteins = [Protein(refseq=f'NM_{i}') for i in range(5)]
@@ -64,6 +96,35 @@ class ProteinTest(ModelTest):
 
             assert protein.mutations_count == count
 
+    def test_binary_tracks(self):
+
+        protein = Protein(
+            refseq='NM_0001', sequence='MARTEK',
+            disorder_map='110111', conservation='3.47;-.09;;nan;8.99;-2.18'
+        )
+        db.session.add(protein)
+        db.session.commit()
+
+        assert protein.disorder_regions == [[1, 2], [4, 3]]
+        assert protein.disorder_length == 5
+
+        scores = protein.conservation_scores.tolist()
+        assert isnan(scores.pop(3))
+        assert [round(score, 2) for score in scores] == [3.47, -0.09, 0, 8.99, -2.18]
+
+        # proteins created before the binary tracks were introduced
+        protein.disorder_track = None
+        protein.conservation_track = None
+        db.session.commit()
+
+        assert migrate_protein_tracks_to_binary() == 1
+        assert migrate_protein_tracks_to_binary() == 0
+
+        db.session.expunge_all()
+        protein = Protein.query.one()
+        assert protein.disorder_regions == [[1, 2], [4, 3]]
+        assert len(protein.conservation_scores) == 6
+
     def test_models_repr(self):
 
         group = KinaseGroup(name='Group 1')
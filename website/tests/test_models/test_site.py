@@ -73,6 +73,7 @@ class SiteTest(ModelTest):
         data = {
             0: '-------ABCDEFGH',
             10: 'DEFGHIJKLMNOPQR',
+            19: 'MNOPQRSTUVWXYZ-',
             25: 'STUVWXYZ-------'
         }
 
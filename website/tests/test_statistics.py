@@ -161,6 +161,57 @@ class StatisticsTest(DatabaseTest):
         assert kinase_groups_covered == len(u_kinase_groups_covered)
         assert proteins_covered == len(u_proteins_covered)
 
+    def test_only_stale(self):
+        from stats import Statistics
+        from models import Count, DataVersion
+
+        db.session.add(Protein(refseq='NM_0001'))
+
+        Statistics().calc_all(limit_to='proteins$')
+        db.session.commit()
+        assert Statistics().get_all()['proteins'] == 1
+
+        # pretend that the value was calculated differently to detect recalculation
+        count = Count.query.filter_by(name='proteins').one()
+        count.value = 100
+        db.session.commit()
+
+        Statistics().calc_all(limit_to='proteins$', only_stale=True)
+        assert Statistics().get_all()['proteins'] == 100
+
+        db.session.add(Protein(refseq='NM_0002'))
+        db.session.commit()
+
+        Statistics().calc_all(limit_to='proteins$', only_stale=True)
+        assert Statistics().get_all()['proteins'] == 2
+
+        # in-place updates (which keep the count and identifiers) are announced with a bump
+        count.value = 100
+        db.session.commit()
+
+        Statistics().calc_all(limit_to='proteins$', only_stale=True)
+        assert Statistics().get_all()['proteins'] == 100
+
+        DataVersion.bump(Protein)
+        db.session.commit()
+
+        Statistics().calc_all(limit_to='proteins$', only_stale=True)
+        assert Statistics().get_all()['proteins'] == 2
+
+    def test_parallel_calculation(self):
+        db.session.add_all([Protein(refseq='NM_0001'), Protein(refseq='NM_0002')])
+
+        counts = self.exposed_stats(limit_to='(proteins|genes)$')
+        assert counts['proteins'] == 2
+
+        from stats import Statistics
+        Statistics().calc_all(limit_to='(proteins|genes)$', processes=2)
+        db.session.commit()
+
+        counts = Statistics().get_all()
+        assert counts['proteins'] == 2
+        assert counts['genes'] == 0
+
     def test_table_generation(self):
         from stats.table import generate_source_specific_summary_table
 
@@ -381,3 +432,128 @@ class StatisticsTest(DatabaseTest):
             assert sites_affected.loc['phosphorylation', 'MC3'] == 0
             assert sites_affected.loc['hydroxylation', 'ClinVar'] == 0
             assert sites_affected.loc['hydroxylation', 'Any mutation'] == affected_sites
+
+    def test_count_ptm_across_proteins(self):
+        from stats.table import count_mutations_in_sites, count_mutated_sites
+        from stats.table import PROTEINS_CACHE
+
+        PROTEINS_CACHE.clear()
+
+        phosphorylation = SiteType(name='phosphorylation')
+
+        # the last position of the first protein is next to the first position of the second
+        first = Protein(refseq='NM_0001', sequence='MSSSGTPDLP')
+        second = Protein(refseq='NM_0002', sequence='MSSSGTPDLP')
+        first.sites = [Site(position=10, residue='P', types={phosphorylation})]
+        # Protein.mutations is a dynamic relationship - keep the lists to reuse them
+        first_mutations = [Mutation(position=1, alt='X')]
+        second_mutations = [Mutation(position=1, alt='X'), Mutation(position=2, alt='X')]
+        first.mutations = first_mutations
+        second.mutations = second_mutations
+        db.session.add_all([first, second])
+        db.session.add_all([
+            MC3Mutation(mutation=mutation, count=1)
+            for mutation in first_mutations + second_mutations
+        ])
+        db.session.commit()
+
+        # mutations from the second protein are not counted - these have no sites at all
+        assert count_mutations_in_sites([phosphorylation], models=[MC3Mutation]) == 0
+        assert count_mutated_sites([phosphorylation], models=[MC3Mutation]) == 0
+
+        third = Mutation(position=3, alt='X')
+        first.mutations.append(third)
+        db.session.add(MC3Mutation(mutation=third, count=1))
+        db.session.commit()
+
+        assert count_mutations_in_sites([phosphorylation], models=[MC3Mutation]) == 1
+        assert count_mutated_sites([phosphorylation], models=[MC3Mutation]) == 1
+
+    def test_venn_sites_by_type(self):
+        from stats import VennDiagrams
+
+        phosphorylation = SiteType(name='phosphorylation')
+        glycosylation = SiteType(name='glycosylation')
+        acetylation = SiteType(name='acetylation')
+
+        protein = Protein(refseq='NM_0001', sequence='MSSSGTPDLP')
+        protein.sites = [
+            Site(position=2, types={phosphorylation, glycosylation}),
+            Site(position=3, types={phosphorylation, glycosylation, acetylation}),
+            Site(position=4, types={phosphorylation}),
+            Site(position=5, types={acetylation}),
+        ]
+        # only sites of the preferred isoforms are counted
+        other_isoform = Protein(refseq='NM_0002', sequence='MSSSGTPDLP')
+        other_isoform.sites = [Site(position=2, types={phosphorylation})]
+        gene = models.Gene(name='A', isoforms=[protein, other_isoform], preferred_isoform=protein)
+        db.session.add(gene)
+        db.session.commit()
+
+        venn = VennDiagrams()
+        sizes = {
+            frozenset(subset['sets']): subset['size']
+            for subset in venn.venn_sites_by_type(venn)
+        }
+
+        assert len(sizes) == 2 ** 3 - 1
+        assert sizes[frozenset({'phosphorylation'})] == 3
+        assert sizes[frozenset({'acetylation'})] == 2
+        assert sizes[frozenset({'phosphorylation', 'glycosylation'})] == 2
+        assert sizes[frozenset({'phosphorylation', 'acetylation'})] == 1
+        assert sizes[frozenset({'phosphorylation', 'glycosylation', 'acetylation'})] == 1
+
+    def test_venn_sites_mutated(self):
+        from stats import VennDiagrams
+
+        phosphorylation = SiteType(name='phosphorylation')
+        glycosylation = SiteType(name='glycosylation')
+
+        protein = Protein(refseq='NM_0001', sequence='MSSSGTPDLP' * 5)
+        protein.sites = [
+            Site(position=10, types={phosphorylation, glycosylation}),
+            Site(position=30, types={phosphorylation}),
+            Site(position=50, types={glycosylation}),
+        ]
+        mutations = [
+            # seven residues away from the first site
+            Mutation(position=17, alt='X'),
+            # not in MC3
+            Mutation(position=30, alt='X'),
+            Mutation(position=45, alt='X'),
+        ]
+        protein.mutations = mutations
+        db.session.add(protein)
+        db.session.add_all([MC3Mutation(mutation=mutations[0], count=1), MC3Mutation(mutation=mutations[2], count=1)])
+        db.session.commit()
+
+        venn = VennDiagrams()
+        sizes = {
+            frozenset(subset['sets']): subset['size']
+            for subset in venn.sites_mutated_MC3(venn)
+        }
+
+        assert len(sizes) == 2 ** 2 - 1
+        assert sizes[frozenset({'phosphorylation'})] == 1
+        assert sizes[frozenset({'glycosylation'})] == 2
+        assert sizes[frozenset({'phosphorylation', 'glycosylation'})] == 1
+
+    def test_lazy_store(self):
+        from stats import Statistics, lazy_store
+
+        db.session.add(Protein(refseq='NM_0001'))
+        Statistics().calc_all(limit_to='proteins$')
+        db.session.commit()
+
+        store = lazy_store(Statistics)
+        assert store._values is None
+
+        assert store['proteins'] == 1
+        assert 'muts' in store
+
+        # the values are cached after the first access
+        db.session.add(Protein(refseq='NM_0002'))
+        Statistics().calc_all(limit_to='proteins$')
+        db.session.commit()
+        assert store['proteins'] == 1
+        assert lazy_store(Statistics)['proteins'] == 2
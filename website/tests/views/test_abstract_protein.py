@@ -54,3 +54,37 @@ class TestAbstractProteinView(ViewTest):
                 'filters': "TestModel.property:in:Value1,Value2,'Value2, corrected'"
             })
             TestViewFilters(test_request)
+
+    def test_count_raw_mutations(self):
+        from database import db
+        from models import Protein, Mutation
+        from website.views.abstract_protein import count_raw_mutations, get_raw_mutations
+        from website.views.filters import common_filters
+        from helpers.filters import FilterManager
+
+        proteins = [
+            Protein(refseq=f'NM_000{i}', sequence='X' * 20, mutations=[
+                Mutation(position=position, alt='Y')
+                for position in range(1, i + 1)
+            ])
+            for i in range(4)
+        ]
+        db.session.add_all(proteins)
+        db.session.commit()
+
+        filter_manager = FilterManager(common_filters(None, default_source=None, source_nullable=True))
+
+        counts = count_raw_mutations(proteins, filter_manager)
+
+        # proteins without any mutations are included
+        assert counts == {protein.id: i for i, protein in enumerate(proteins)}
+
+        for protein in proteins:
+            assert counts[protein.id] == get_raw_mutations(protein, filter_manager, count=True)
+
+        grouped = filter_manager.query_count_grouped(
+            Mutation,
+            group_by=Mutation.protein_id,
+            restrict_to=[proteins[1].id, proteins[3].id]
+        )
+        assert grouped == {proteins[1].id: 1, proteins[3].id: 3}
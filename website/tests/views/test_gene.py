@@ -92,3 +92,34 @@ class TestGeneView(ViewTest):
         assert response.status_code == 200
 
         assert response.json['total'] == len(genes)
+
+    def test_browse_pagination(self):
+        from helpers.views import page_boundaries, totals_cache
+
+        names = ['ABL1', 'AKT1', 'BRCA1', 'BRCA2', 'EGFR', 'KRAS', 'TP53']
+        # duplicated full names, to be placed in order by gene id
+        full_names = ['kinase', 'kinase', 'DNA repair', 'DNA repair', 'receptor', 'GTPase', 'kinase']
+        genes = []
+        for i, (name, full_name) in enumerate(zip(names, full_names)):
+            p = Protein(refseq=f'NM_000{i}')
+            genes.append(Gene(name=name, full_name=full_name, isoforms=[p], preferred_isoform=p))
+        db.session.add_all(genes)
+        db.session.commit()
+        genes = [(gene.full_name, gene.id, gene.name) for gene in genes]
+
+        for order in ['asc', 'desc']:
+            served = []
+            for offset in range(0, 7, 3):
+                response = self.client.get(f'/gene/browse_data/?sort=full_name&order={order}&limit=3&offset={offset}')
+                assert response.json['total'] == 7
+                served.extend(row['name'] for row in response.json['rows'])
+
+            # after the first page, the following pages were retrieved by seeking
+            expected = sorted(genes, reverse=(order == 'desc'))
+            assert served == [name for full_name, gene_id, name in expected]
+
+        # the id is used only for seeking, it is not served
+        assert 'id' not in response.json['rows'][0]
+
+        assert len(page_boundaries) == 6
+        assert len(totals_cache) == 1
@@ -1,5 +1,5 @@
 from view_testing import ViewTest, relative_location
-from models import Protein, SiteType
+from models import Protein, SiteType, Gene
 from models import Site
 from database import db
 from test_sequence import test_protein_data, create_test_mutations
@@ -85,3 +85,43 @@ class TestProteinView(ViewTest):
         response = self.client.get('/protein/known_mutations/NM_000123')
         muts = response.json
         assert len(muts) == 4
+
+    def test_known_mutations_queries(self):
+        from sqlalchemy import event
+        from models import Mutation, MC3Mutation, MIMPMutation, Cancer, Kinase
+
+        p = Protein(refseq='NM_000123', sequence='MART' * 20, gene=Gene(name='SomeGene'))
+        site = Site(position=10, residue='R', types={SiteType(name='phosphorylation')}, kinases={Kinase(name='AKT1')})
+        p.sites = [site]
+        cancer = Cancer(name='Ovarian', code='OV')
+        p.mutations = [
+            Mutation(
+                position=i,
+                alt='K',
+                meta_MC3=[MC3Mutation(cancer=cancer, count=1)],
+                meta_MIMP=[MIMPMutation(site=site, probability=0.5, effect='gain', pwm='AKT1')]
+            )
+            for i in range(1, 41)
+        ]
+        db.session.add(p)
+        db.session.commit()
+
+        queries = []
+
+        def count_query(*args):
+            queries.append(args)
+
+        event.listen(db.engine, 'before_cursor_execute', count_query)
+        try:
+            response = self.client.get('/protein/known_mutations/NM_000123')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count_query)
+
+        assert response.status_code == 200
+        assert len(response.json) == 40
+        needle = response.json[9]
+        assert needle['closest_sites'] == ['10 R']
+        assert needle['in_datasets']['MIMP']['gain'][0]['pwm'] == 'AKT1'
+
+        # the number of queries should not grow with the number of mutations
+        assert len(queries) < 40
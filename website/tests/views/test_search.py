@@ -196,6 +196,33 @@ class TestSearchView(ViewTest):
         assert response.status_code == 200
         assert b'NM_007' in response.data
 
+    def test_chunked_vcf_search(self):
+        from search.mutation import MutationSearch
+        from search.filters import SearchViewFilters
+        from database import bdb
+
+        s = Site(position=13, types={SiteType(name='methylation')})
+        p = Protein(refseq='NM_007', id=7, sites=[s], sequence='XXXXXXXXXXXXVXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXK')
+
+        m_in_site = Mutation(protein=p, position=13, alt='V')
+        m_out_site = Mutation(protein=p, position=50, alt='K')
+
+        db.session.add(p)
+
+        bdb.add_genomic_mut('20', 14370, 'G', 'A', m_in_site, is_ptm=True)
+        bdb.add_genomic_mut('20', 1110696, 'A', 'G', m_out_site)
+        bdb.add_genomic_mut('20', 1110696, 'A', 'T', m_in_site, is_ptm=True)
+
+        vcf_lines = VCF_FILE_CONTENT.decode().splitlines()
+
+        for chunk_size in [1, 2, 100]:
+            search = MutationSearch(vcf_lines, filter_manager=SearchViewFilters(), vcf_chunk_size=chunk_size)
+
+            assert set(search.results) == {'chr20 14370 G A\n', 'chr20 1110696 A T\n'}
+            assert search.hidden_results_cnt == 1
+            assert 'chr20 17330 T A\n' in search.without_mutations
+            assert search.query.startswith('chr20 14370 G A\n')
+
     def test_autocomplete_all_proteins(self):
         # MC3 GeneList is required as a target (a href for links) where users will be pointed
         # after clicking of cancer autocomplete suggestion
@@ -8,6 +8,7 @@ from models import InheritedMutation
 from models import ClinicalData
 from models import The1000GenomesMutation
 from models import ExomeSequencingMutation
+from models import DataVersion
 from database import db
 
 
@@ -191,3 +192,43 @@ class TestSequenceView(ViewTest):
 
         response = self.client.get(uri + '?filters=Mutation.sources:in:ESP6500;Mutation.populations_ESP6500:in:European American')
         assert response.json['muts_count'] == 1
+
+    def test_representation_cache(self):
+        from website.views.sequence import get_representation_cache, data_version
+
+        p = Protein(**test_protein_data())
+        p.mutations = create_test_mutations()
+        db.session.add(p)
+        db.session.commit()
+
+        from website.views.filters import cached_queries
+        cached_queries.reload()
+
+        cache = get_representation_cache()
+        uri = '/sequence/representation_data/NM_000123'
+
+        response = self.client.get(uri)
+        assert len(cache) == 1
+        cached_mutations = response.json['content']['mutations']
+        assert len(cached_mutations) == 1
+
+        # the same filters, given in a different order, share the cache entry
+        self.client.get(uri + '?filters=Mutation.sources:in:ClinVar;Mutation.sig_code:in:5,4,2')
+        self.client.get(uri + '?filters=Mutation.sig_code:in:2,4,5;Mutation.sources:in:ClinVar')
+        assert len(cache) == 2
+
+        response = self.client.get(uri)
+        assert response.json['content']['mutations'] == cached_mutations
+        assert len(cache) == 2
+
+        # new data (announced by the importers) invalidate the cached representations
+        p.mutations.append(
+            Mutation(position=3, alt='W', meta_MC3=[MC3Mutation(cancer=Cancer.query.filter_by(code='OV').one(), count=1)])
+        )
+        version = data_version()
+        DataVersion.bump(Mutation, MC3Mutation)
+        db.session.commit()
+        assert data_version() != version
+
+        response = self.client.get(uri)
+        assert len(response.json['content']['mutations']) == 2
@@ -8,9 +8,10 @@ from models import Gene
 from models.bio.drug import Drug, DrugTarget
 
 
-def represent_mutation(mutation, data_filter, representation_type=dict):
+def represent_mutation(mutation, data_filter, representation_type=dict, affected_sites=None):
 
-    affected_sites = mutation.get_affected_ptm_sites(data_filter)
+    if affected_sites is None:
+        affected_sites = mutation.get_affected_ptm_sites(data_filter)
 
     return representation_type(
         (
@@ -28,6 +29,7 @@ def represent_mutation(mutation, data_filter, representation_type=dict):
 
 def drugs_interacting_with_kinases(filter_manager, kinases) -> Dict[Gene, Set[DrugTarget]]:
     from sqlalchemy import and_
+    from sqlalchemy.orm import selectinload
 
     kinase_gene_ids = [kinase.protein.gene_id for kinase in kinases if kinase.protein]
     drugs = filter_manager.query_all(
@@ -36,7 +38,10 @@ def drugs_interacting_with_kinases(filter_manager, kinases) -> Dict[Gene, Set[Dr
             q,
             Gene.id.in_(kinase_gene_ids)
         ),
-        lambda query: query.join(DrugTarget)
+        lambda query: query.join(DrugTarget).options(
+            selectinload(Drug.targets).joinedload(DrugTarget.gene),
+            selectinload(Drug.groups)
+        )
     )
     targets_by_kinase = defaultdict(set)
     for drug in drugs:
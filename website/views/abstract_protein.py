@@ -1,4 +1,5 @@
 from itertools import chain
+from typing import Dict
 from warnings import warn
 
 import flask
@@ -93,22 +94,31 @@ class AbstractProteinView(FlaskView):
         return protein, filter_manager
 
 
-def get_raw_mutations(protein, filter_manager, count=False):
+def user_mutations_filters(filter_manager):
+    """Restrict mutations to these in user's dataset (if one was chosen)."""
 
     custom_dataset = filter_manager.get_value('UserMutations.sources')
 
-    mutation_filters = [Mutation.protein == protein]
+    if not custom_dataset:
+        return []
 
-    if custom_dataset:
-        dataset = UsersMutationsDataset.query.filter_by(
-            uri=custom_dataset
-        ).one()
+    dataset = UsersMutationsDataset.query.filter_by(
+        uri=custom_dataset
+    ).one()
 
-        filter_manager.filters['Mutation.sources']._value = 'user'
+    filter_manager.filters['Mutation.sources']._value = 'user'
 
-        mutation_filters.append(
-            Mutation.id.in_([m.id for m in dataset.mutations])
-        )
+    return [
+        Mutation.id.in_([m.id for m in dataset.mutations])
+    ]
+
+
+def get_raw_mutations(protein, filter_manager, count=False):
+
+    mutation_filters = [
+        Mutation.protein == protein,
+        *user_mutations_filters(filter_manager)
+    ]
 
     getter = filter_manager.query_count if count else filter_manager.query_all
 
@@ -120,6 +130,29 @@ def get_raw_mutations(protein, filter_manager, count=False):
     return raw_mutations
 
 
+def count_raw_mutations(proteins, filter_manager) -> Dict[int, int]:
+    """Count mutations (as in get_raw_mutations) of each of given proteins at once.
+
+    Returns:
+        dict: protein id -> count of mutations
+    """
+    mutation_filters = user_mutations_filters(filter_manager)
+
+    proteins_ids = [protein.id for protein in proteins]
+
+    counts = filter_manager.query_count_grouped(
+        Mutation,
+        group_by=Mutation.protein_id,
+        restrict_to=proteins_ids,
+        custom_filter=lambda q: and_(q, *mutation_filters)
+    )
+
+    return {
+        protein_id: counts.get(protein_id, 0)
+        for protein_id in proteins_ids
+    }
+
+
 class ProteinRepresentation:
 
     def __init__(self, protein, filter_manager, include_kinases_from_groups=False):
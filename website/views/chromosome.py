@@ -2,13 +2,90 @@ from flask import request
 from flask_classful import FlaskView
 from flask import jsonify
 
+from sqlalchemy.orm import joinedload, selectinload
+
 from database import bdb
-from models import source_manager
+from models import (
+    source_manager, Mutation, Protein, Site, SitesIndex, Kinase, ClinicalData,
+    CancerMutation, InheritedMutation, MIMPMutation
+)
 from helpers.filters.manager import FilterManager
 from .filters import common_filters
 from ._commons import represent_mutation
 from operator import attrgetter
-from collections import OrderedDict
+from collections import OrderedDict, defaultdict
+from typing import Dict, List
+
+
+def kinases_loader(path):
+    """Load kinases with refseq of their proteins (but without proteins' sites)."""
+    return [
+        path.joinedload(Kinase.protein).load_only('refseq'),
+        path.joinedload(Kinase.protein).lazyload(Protein.sites)
+    ]
+
+
+def prefetch_mutations_data(mutations, chunk_size=500):
+    """Eager-load the data needed to represent given mutations.
+
+    Details of all sources (including MIMP predictions), proteins with genes
+    and sites of the proteins (with types and kinases) are loaded with a fixed
+    number of queries per chunk of mutations and attached to the objects
+    already present in the session, so the per-mutation lazy loads are avoided.
+    """
+    mutations_ids = [mutation.id for mutation in mutations if mutation.id is not None]
+    proteins_ids = list({mutation.protein_id for mutation in mutations if mutation.protein_id is not None})
+
+    options = [joinedload(Mutation.protein).joinedload(Protein.gene)]
+
+    for source, relationship in source_manager.class_relation_map.items():
+        details = selectinload(relationship)
+        if issubclass(source, CancerMutation):
+            options.append(details.joinedload(source.cancer))
+        elif source is InheritedMutation:
+            options.append(details.selectinload(InheritedMutation.clin_data).joinedload(ClinicalData.disease))
+        elif source is MIMPMutation:
+            options.extend([
+                details.joinedload(MIMPMutation.site),
+                details.joinedload(MIMPMutation.kinase_group),
+                *kinases_loader(details.joinedload(MIMPMutation.kinase))
+            ])
+        else:
+            options.append(details)
+
+    for i in range(0, len(mutations_ids), chunk_size):
+        Mutation.query.filter(
+            Mutation.id.in_(mutations_ids[i:i + chunk_size])
+        ).options(*options).all()
+
+    for i in range(0, len(proteins_ids), chunk_size):
+        Site.query.filter(
+            Site.protein_id.in_(proteins_ids[i:i + chunk_size])
+        ).options(
+            selectinload(Site.types),
+            selectinload(Site.kinase_groups),
+            *kinases_loader(selectinload(Site.kinases))
+        ).all()
+
+
+def affected_sites_of_mutations(mutations, data_filter) -> Dict[Mutation, List[Site]]:
+    """Find (filtered) PTM sites affected by each of mutations.
+
+    Sites of each protein are filtered only once, then all positions
+    of mutations in the protein are looked up in a single batch query.
+    """
+    by_protein = defaultdict(list)
+    for mutation in mutations:
+        by_protein[mutation.protein].append(mutation)
+
+    affected_sites = {}
+
+    for protein, protein_mutations in by_protein.items():
+        index = SitesIndex.from_sites(data_filter(protein.sites))
+        positions = [mutation.position for mutation in protein_mutations]
+        affected_sites.update(zip(protein_mutations, index.close_sites_many(positions, 7, 7)))
+
+    return affected_sites
 
 
 def represent_mutations(mutations, filter_manager):
@@ -22,14 +99,20 @@ def represent_mutations(mutations, filter_manager):
 
     data_filter = filter_manager.apply
 
+    prefetch_mutations_data(mutations)
+    affected_sites = affected_sites_of_mutations(mutations, data_filter)
+
     response = []
 
     for mutation in mutations:
 
+        sites = affected_sites[mutation]
+
         needle = represent_mutation(
             mutation,
             data_filter,
-            representation_type=OrderedDict
+            representation_type=OrderedDict,
+            affected_sites=sites
         )
 
         needle['protein'] = mutation.protein.refseq
@@ -39,7 +122,7 @@ def represent_mutations(mutations, filter_manager):
         needle.move_to_end('protein', last=False)
         needle.move_to_end('gene', last=False)
 
-        needle['ptm_impact'] = mutation.impact_on_ptm(data_filter)
+        needle['ptm_impact'] = mutation.impact_on_ptm(affected_sites=sites)
 
         if source_name:
             field = get_source_data(mutation)
@@ -17,7 +17,7 @@ from sqlalchemy import distinct
 from sqlalchemy import case
 from sqlalchemy import literal_column
 from database import db
-from helpers.views import AjaxTableView
+from helpers.views import AjaxTableView, Keyset
 from helpers.filters.manager import joined_query, FilterManager
 from helpers.filters import Filter
 from helpers.widgets import FilterWidget
@@ -238,6 +238,7 @@ def ajax_query(sql_filters, joins):
     textutal_filters = select_textual_filters(sql_filters)
     query = (
         db.session.query(
+            Gene.id,
             Gene.name,
             Gene.full_name,
             muts,
@@ -253,6 +254,28 @@ def ajax_query(sql_filters, joins):
     return query
 
 
+# expressions by which the browse table can be sorted (by the names of the fields);
+# the aggregates are referred to by their labels (see prepare_subqueries)
+browse_sort_columns = {
+    'name': Gene.name,
+    'full_name': Gene.full_name,
+    'muts_cnt': literal_column('muts_cnt'),
+    'ptm_muts_cnt': literal_column('ptm_muts_cnt'),
+    'ptm_sites_cnt': literal_column('ptm_sites_cnt')
+}
+
+
+def prepare_browse_sorting(query, sort_name):
+    return query, browse_sort_columns.get(sort_name)
+
+
+def browse_row(row):
+    data = row._asdict()
+    # the id is selected only to seek through the pages (see Keyset)
+    del data['id']
+    return data
+
+
 def ajax_query_count(sql_filters, joins):
 
     muts, ptm_muts, sites = prepare_subqueries(sql_filters, joins)
@@ -398,10 +421,17 @@ class GeneView(FlaskView):
     browse_data = route('browse_data')(
         AjaxTableView.from_query(
             query=ajax_query,
-            results_mapper=lambda row: row._asdict(),
+            results_mapper=browse_row,
             filters_class=GeneViewFilters,
             search_filter=lambda q: Gene.name.like(q + '%'),
             count_query=ajax_query_count,
+            prepare_for_sorting=prepare_browse_sorting,
+            keyset=Keyset(
+                id_column=Gene.id,
+                get_id=lambda row: row.id,
+                get_value=getattr,
+                aggregated=True
+            ),
             sort='name'
         )
     )
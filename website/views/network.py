@@ -11,7 +11,7 @@ from helpers.filters import Filter
 from helpers.widgets import FilterWidget
 from models import Mutation
 from views._commons import drugs_interacting_with_kinases, compress
-from views.abstract_protein import AbstractProteinView, get_raw_mutations, GracefulFilterManager, ProteinRepresentation
+from views.abstract_protein import AbstractProteinView, count_raw_mutations, GracefulFilterManager, ProteinRepresentation
 from .filters import common_filters, ProteinFiltersData
 from .filters import create_widgets
 
@@ -79,16 +79,19 @@ class NetworkRepresentation(ProteinRepresentation):
 
         sites, kinases, kinase_groups = self.get_sites_and_kinases()
 
-        kinases_counts = dict()
-        for kinase in kinases:
-            if kinase.protein:
+        # KINASES NOT MAPPED TO PROTEINS ARE NOT SHOWN
+        mapped_kinases = [kinase for kinase in kinases if kinase.protein]
 
-                count = get_raw_mutations(kinase.protein, filter_manager, count=True)
-
-                # related discussion: #72
-                kinases_counts[kinase] = count
+        # related discussion: #72
+        counts = count_raw_mutations(
+            [kinase.protein for kinase in mapped_kinases],
+            filter_manager
+        )
 
-                # KINASES NOT MAPPED TO PROTEINS ARE NOT SHOWN
+        kinases_counts = {
+            kinase: counts[kinase.protein.id]
+            for kinase in mapped_kinases
+        }
 
         protein_kinases_names = [kinase.name for kinase in kinases]
 
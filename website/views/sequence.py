@@ -2,6 +2,7 @@ from functools import lru_cache
 from operator import attrgetter
 from typing import Iterable
 
+from flask import current_app
 from flask import jsonify
 from flask import redirect
 from flask import render_template as template
@@ -10,13 +11,15 @@ from flask import url_for
 from flask_login import current_user
 from sqlalchemy import and_
 
+from helpers.cache import TieredCache
 from helpers.tracks import DomainsTrack
 from helpers.tracks import MutationsTrack
 from helpers.tracks import SequenceTrack
 from helpers.tracks import Track
 from helpers.tracks import TrackElement
-from models import Domain, source_manager, SiteType, Site
+from models import Domain, source_manager, SiteType, Site, Protein
 from models import Mutation
+from models import DataVersion
 from .abstract_protein import AbstractProteinView, GracefulFilterManager, ProteinRepresentation
 from ._commons import represent_mutation, compress
 from .filters import common_filters, ProteinFiltersData
@@ -43,11 +46,9 @@ def prepare_tracks(protein, raw_mutations):
             'conservation',
             (
                 ''.join([
-                    f'<i v="{score or 0}">&nbsp;</i>'
-                    for score in protein.conservation.split(';')
+                    f'<i v="{score:g}">&nbsp;</i>'
+                    for score in protein.conservation_scores.tolist()
                 ])
-                if protein.conservation else
-                ''
             )
         ),
         MutationsTrack(raw_mutations)
@@ -150,6 +151,66 @@ class SequenceRepresentation(ProteinRepresentation):
         return response
 
 
+def sequence_representation(protein, filter_manager) -> dict:
+    """Prepare needleplot data, tracks and mutations table of given protein."""
+    data = SequenceRepresentation(protein, filter_manager).as_json()
+
+    data['mutation_table'] = template(
+        'protein/mutation_table.html',
+        mutations=data['mutations'],
+        filters=filter_manager,
+        protein=protein,
+        value_type=data['value_type']
+    )
+    data['tracks'] = template(
+        'protein/tracks.html',
+        tracks=data['tracks']
+    )
+    return data
+
+
+def data_version():
+    """Fingerprint of the biological data, changing with each import or removal.
+
+    Composed of the revisions which the importers (and removals of
+    the data) bump, see DataVersion.bump; the revisions are re-read
+    from the database at most every few seconds by each process.
+    """
+    return DataVersion.current_revisions([Protein, Site, Mutation, *source_manager.class_relation_map])
+
+
+def get_representation_cache() -> TieredCache:
+    global representation_cache
+    if representation_cache is None:
+        config = current_app.config
+        representation_cache = TieredCache(
+            max_size=config.get('REPRESENTATION_CACHE_SIZE', 256),
+            directory=config.get('REPRESENTATION_CACHE_PATH', None)
+        )
+    return representation_cache
+
+
+representation_cache = None
+
+
+def cached_sequence_representation(protein, filter_manager) -> dict:
+    """Get the sequence representation from the cache (or create it).
+
+    The representations are keyed by protein, state of the filters and
+    the version of the data; representations of user-uploaded mutations
+    are never cached.
+    """
+    if filter_manager.get_value('UserMutations.sources'):
+        return sequence_representation(protein, filter_manager)
+
+    key = (protein.refseq, filter_manager.state(), data_version())
+
+    return get_representation_cache().get_or_create(
+        key,
+        lambda: sequence_representation(protein, filter_manager)
+    )
+
+
 class SequenceViewFilters(GracefulFilterManager):
 
     def __init__(self, protein, **kwargs):
@@ -212,22 +273,8 @@ class SequenceView(AbstractProteinView):
 
         protein, filter_manager = self.get_protein_and_manager(refseq)
 
-        data = SequenceRepresentation(protein, filter_manager).as_json()
-
-        data['mutation_table'] = template(
-            'protein/mutation_table.html',
-            mutations=data['mutations'],
-            filters=filter_manager,
-            protein=protein,
-            value_type=data['value_type']
-        )
-        data['tracks'] = template(
-            'protein/tracks.html',
-            tracks=data['tracks']
-        )
-
         response = {
-            'content': data,
+            'content': cached_sequence_representation(protein, filter_manager),
             'filters': ProteinFiltersData(filter_manager, protein).to_json()
         }
 